@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the account lookup in activity_hourly
+
+Compares resolving every account of a synthetic day through
+list.index (the former lookup) with AccountIndex, and times a full
+activity_hourly call on the same day.
+
+    python benchmarks/bench_account_index.py [--accounts N] [--messages N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rndao_analyzer"))
+
+from analysis.activity_hourly import AccountIndex, activity_hourly
+
+
+def make_day(num_accounts, num_messages, seed=0):
+    """
+    Synthetic day of prepared messages over num_accounts accounts
+    """
+    rng = random.Random(seed)
+    accounts = ["acc{}".format(i) for i in range(num_accounts)]
+    messages = []
+    for _ in range(num_messages):
+        is_reply = rng.random() < 0.3
+        messages.append({
+            "datetime": "2023-01-01 {:02d}:00:00".format(rng.randrange(24)),
+            "channel": rng.choice(["general", "dev", "random"]),
+            "author": rng.choice(accounts),
+            "replied_user": rng.choice(accounts) if is_reply else "",
+            "user_mentions": rng.sample(accounts, rng.randrange(3)),
+            "reactions": [",".join(rng.sample(accounts, rng.randrange(1, 4)) + [":+1:"])],
+            "thread": rng.random() < 0.2,
+            "mess_type": "REPLY" if is_reply else "DEFAULT",
+        })
+    return accounts, messages
+
+
+def day_lookups(messages):
+    """
+    Account names resolved by activity_hourly for the messages
+    """
+    names = []
+    for mess in messages:
+        names.append(mess["author"])
+        if mess["replied_user"]:
+            names.append(mess["replied_user"])
+        names.extend(mess["user_mentions"])
+        for reaction in mess["reactions"]:
+            names.extend(reaction.split(",")[:-1])
+    return names
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    accounts, messages = make_day(args.accounts, args.messages)
+    names = day_lookups(messages)
+    acc_names = accounts + ["remainder"]
+
+    list_time = best_of(args.repeat, lambda: [acc_names.index(x) for x in names])
+
+    def index_lookups():
+        acc_index = AccountIndex(acc_names)
+        return [acc_index.index(x) for x in names]
+
+    index_time = best_of(args.repeat, index_lookups)
+    day_time = best_of(args.repeat, lambda: activity_hourly(messages, acc_names=list(accounts)))
+
+    print(f"{args.accounts} accounts, {args.messages} messages, {len(names)} lookups")
+    print(f"list.index    {list_time:10.4f} s")
+    print(f"AccountIndex  {index_time:10.4f} s  ({list_time / index_time:.0f}x)")
+    print(f"activity_hourly (whole day) {day_time:10.4f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark of projected rawinfos fetches against a local mongod
+
+Loads a synthetic corpus into a scratch database and fetches every day
+with RawInfoModel.get_day_entries, once with full documents and once
+with the HEATMAP_FIELDS projection. Reports documents, BSON bytes
+received and time per variant. The scratch database is dropped at
+the end.
+
+    python benchmarks/bench_rawinfos_projection.py [--uri mongodb://localhost:27017]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rndao_analyzer"))
+
+from models.RawInfoModel import HEATMAP_FIELDS, RawInfoModel
+
+
+def make_corpus(num_days, per_day, content_size, seed=0):
+    """
+    Synthetic rawinfos documents with a content field of about
+    content_size characters
+    """
+    rng = random.Random(seed)
+    accounts = ["acc{}".format(i) for i in range(500)]
+    first_day = datetime(2023, 1, 1)
+    for d in range(num_days):
+        for _ in range(per_day):
+            time_sent = first_day + timedelta(days=d, seconds=rng.randrange(86400))
+            yield {
+                "datetime": time_sent.strftime("%Y-%m-%d %H:%M:%S"),
+                "channelId": rng.choice(["general", "dev", "random"]),
+                "author": rng.choice(accounts),
+                "replied_user": "",
+                "user_mentions": [",".join(rng.sample(accounts, rng.randrange(3)))],
+                "reactions": [],
+                "thread": False,
+                "type": "DEFAULT",
+                "content": "x" * rng.randrange(content_size // 2, content_size * 3 // 2),
+            }
+
+
+def fetch_all_days(rawinfo_c, num_days, projection):
+    num_docs = 0
+    num_bytes = 0
+    start = time.perf_counter()
+    for d in range(num_days):
+        entries = rawinfo_c.get_day_entries(datetime(2023, 1, 1) + timedelta(days=d), projection)
+        num_docs += len(entries)
+        num_bytes += sum(len(bson.encode(x)) for x in entries)
+    return num_docs, num_bytes, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="bench_rawinfos_projection")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--per-day", type=int, default=5000)
+    parser.add_argument("--content-size", type=int, default=400)
+    parser.add_argument("--migrate", action="store_true",
+                        help="fetch through the created_at index instead of the datetime regex")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.database)
+    database = client[args.database]
+    try:
+        database["rawinfos"].insert_many(make_corpus(args.days, args.per_day, args.content_size))
+        rawinfo_c = RawInfoModel(database)
+        if args.migrate:
+            rawinfo_c.migrate_created_at()
+
+        # warm the cache of the server before timing
+        fetch_all_days(rawinfo_c, args.days, None)
+
+        for name, projection in [("full documents", None), ("HEATMAP_FIELDS", HEATMAP_FIELDS)]:
+            num_docs, num_bytes, seconds = fetch_all_days(rawinfo_c, args.days, projection)
+            print(f"{name:<16} {num_docs} docs  {num_bytes / 2 ** 20:8.1f} MiB  "
+                  f"{seconds:7.2f} s  ({num_docs / seconds:.0f} docs/s)")
+    finally:
+        client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the heatmap update latency of the daemon mode against a local mongod
+
+Inserts synthetic messages of the current day into a scratch database
+one batch at a time and applies them to the provisional heatmaps the
+way RnDaoAnalyzer.run_daemon does. The latency of a message is the
+time from its insert until its counts are written. A replica set is
+tailed with a change stream, a standalone mongod (or --poll) is polled.
+The scratch database is dropped at the end.
+
+    python benchmarks/bench_realtime_updates.py [--uri mongodb://localhost:27017] [--batch N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rndao_analyzer"))
+
+from analyzer import RnDaoAnalyzer
+from models.HeatMapModel import HeatMapModel
+from models.RawInfoModel import HEATMAP_FIELDS, RawInfoModel
+
+
+def make_messages(num_messages, num_accounts, seed=0):
+    """
+    Synthetic rawinfos documents sent today, in time order
+    """
+    rng = random.Random(seed)
+    accounts = ["acc{}".format(i) for i in range(num_accounts)]
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    times = sorted(rng.randrange(86400) for _ in range(num_messages))
+    for seconds in times:
+        is_reply = rng.random() < 0.3
+        reactors = rng.sample(accounts, rng.randrange(3))
+        yield {
+            "datetime": (today + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S"),
+            "channelId": rng.choice(["general", "dev", "random"]),
+            "author": rng.choice(accounts),
+            "replied_user": rng.choice(accounts) if is_reply else "",
+            "user_mentions": [",".join(rng.sample(accounts, rng.randrange(3)))],
+            "reactions": [",".join(reactors + [":+1:"])] if reactors else [],
+            "thread": rng.random() < 0.2,
+            "type": "REPLY" if is_reply else "DEFAULT",
+        }
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="bench_realtime_updates")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=1,
+                        help="messages inserted at once before the heatmaps are updated")
+    parser.add_argument("--poll", action="store_true",
+                        help="poll rawinfos even if change streams are available")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.database)
+    database = client[args.database]
+    try:
+        database.create_collection("heatmaps")
+        heatmap_c = HeatMapModel(database)
+        heatmap_c.create_key_index()
+        # the days before today were analyzed by the daily run
+        heatmap_c.set_watermark(datetime.now() - timedelta(days=1))
+
+        analyzer = RnDaoAnalyzer()
+        analyzer.db_client = client
+        analyzer.poll_interval = 0
+        stream = None if args.poll else RawInfoModel(database).watch_inserts(HEATMAP_FIELDS)
+        tail = {"stream": stream, "accounts": {}}
+        tail["last_id"] = analyzer.realtime_catch_up(args.database, tail)
+
+        messages = list(make_messages(args.messages, args.accounts))
+        latencies = []
+        start_time = time.perf_counter()
+        for i in range(0, len(messages), args.batch):
+            batch = messages[i:i + args.batch]
+            start = time.perf_counter()
+            database["rawinfos"].insert_many(batch)
+            applied = 0
+            while applied < len(batch):
+                applied += analyzer.realtime_poll(args.database, tail)
+            latencies.extend([time.perf_counter() - start] * len(batch))
+        total_time = time.perf_counter() - start_time
+
+        if stream is not None:
+            stream.close()
+        print(f"{len(messages)} messages in batches of {args.batch}, "
+              f"{'change stream' if stream is not None else 'polling'}, "
+              f"{database['heatmaps'].count_documents({})} heatmap documents")
+        print(f"latency median {statistics.median(latencies) * 1000:8.2f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:8.2f} ms  "
+              f"max {max(latencies) * 1000:8.2f} ms")
+        print(f"throughput     {len(messages) / total_time:8.0f} messages/s")
+    finally:
+        client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,16 @@
 # # # # # import libraries # # # # #
 
 import json
+import logging
+import functools
 import numpy as np
 
+# dtype of the hourly counts, wide enough for bot-heavy channels
+COUNT_DTYPE = np.int32
+
+# number of accounts from which the sparse count backend is used
+SPARSE_MIN_ACCOUNTS = 2000
+
 
 def parse_reaction(s):
     result = []
@@ -26,7 +34,7 @@ def parse_reaction(s):
 
 
 def activity_hourly(json_file, out_file_name=None, acc_names=[],
-                    mess_substring=None, emoji_types=None):
+                    mess_substring=None, emoji_types=None, sparse=None):
     """
     Counts activity per hour from json_file and stores in out_file_name
 
@@ -40,6 +48,9 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
         considered if set to None (default = None)
     emoji_types - [str]: only emojis in this list are considered. all
         emojis are considered if set to None (default = None)
+    sparse - bool: store counts with SparseCounts instead of dense
+        arrays. used if acc_names has at least SPARSE_MIN_ACCOUNTS
+        accounts when set to None (default = None)
 
     Output:
     warning_count - [int]: list of counts for the different possible
@@ -61,16 +72,58 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
 
     Notes:
     The results are saved as JSON objects based on out_file_name
+    warning_count is a WarningCounter, which also keeps samples of the
+    account names that raised each warning
+    """
+
+    warning_count, all_day_activity_obj = activity_hourly_objects(
+        json_file, acc_names, mess_substring, emoji_types, sparse)
+
+    # # # store results    # # #
+    # json_out_file = store_results_json([i.asdict() for i in \
+    #     all_day_activity_obj], out_file_name)
+    return (warning_count, [i.asdict() for i in all_day_activity_obj])
+
+# # #
+
+
+def activity_hourly_objects(json_file, acc_names=[], mess_substring=None,
+                            emoji_types=None, sparse=None):
+    """
+    Counts activity per hour from json_file into DayActivity objects
+
+    Same as activity_hourly, but returns the DayActivity objects
+    instead of their dictionaries, so that callers can read the count
+    arrays without converting every account row to lists
+
+    Output:
+    warning_count - WarningCounter: counts per warning type, see
+        activity_hourly
+    all_day_activity_obj - [obj]: DayActivity object for each
+        date-channel combination
     """
 
-    # initiate array with zeros for counting error occurences
-    warning_count = [0]*7
+    # initiate counter for error occurences (a list of 7 counts)
+    warning_count = WarningCounter()
+    sample_reacter = functools.partial(warning_count.sample, 4)
+    sample_mentioned = functools.partial(warning_count.sample, 5)
 
     # initiate empty result array for DayActivity objects all_day_activity_obj = []
 
     # add remainder category to acc_names
     acc_names.append("remainder")
+
+    # index account names once, shared by all counting helpers
+    acc_index = AccountIndex(acc_names)
+
+    # choose count backend based on the number of accounts
+    if sparse is None:
+        sparse = len(acc_names) >= SPARSE_MIN_ACCOUNTS
     all_day_activity_obj = []
+
+    # look up DayActivity objects by (date, channel)
+    obj_registry = DayActivityRegistry(all_day_activity_obj)
+
     # for each message
     for mess in json_file:
 
@@ -92,22 +145,19 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
 
             try:
                 # obtain index of author in acc_names
-                auth_i = acc_names.index(mess_auth)
+                auth_i = acc_index.index(mess_auth)
             except:
                 # if author is not in acc_names, raise warning and add counts to remainder
-                print("WARNING: author name {} not found in acc_names".format(mess_auth))
-                warning_count[0] += 1
+                raise_warning(warning_count, 0, mess_auth)
                 auth_i = -1
 
             if len(rep_auth) > 0:
                 try:
                     # obtain index of reply author in acc_names
-                    rep_i = acc_names.index(rep_auth)
+                    rep_i = acc_index.index(rep_auth)
                 except:
                     # if author is not in acc_names, raise warning and add counts to remainder
-                    print(
-                        "WARNING: author name {} not found in acc_names".format(rep_auth))
-                    warning_count[6] += 1
+                    raise_warning(warning_count, 6, rep_auth)
                     rep_i = -1
             else:
                 rep_i = None
@@ -116,7 +166,8 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
 
             # see if an object exists with corresponding date and channel
             all_day_activity_obj, obj_list_i, warning_count = get_obj_list_i(
-                all_day_activity_obj, mess_date, mess_chan, acc_names, warning_count)
+                all_day_activity_obj, mess_date, mess_chan, acc_names, warning_count,
+                obj_registry=obj_registry, sparse=sparse)
 
 
             # # # count activity per hour # # #
@@ -132,7 +183,7 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                 for r_a in reacting_accs:
 
                     # add reacting accounts
-                    all_day_activity_obj[obj_list_i].reacted_per_acc[auth_i].append(r_a)
+                    all_day_activity_obj[obj_list_i].reacted_per_acc.add(auth_i, r_a)
 
 
             # add n_reac to hour of message that received the emoji
@@ -140,8 +191,9 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                                                      mess_hour] += int(n_reac)
 
             # count raised warnings
-            warning_count[4] += count_from_list(reacting_accs, acc_names,
-                                                all_day_activity_obj[obj_list_i].reacter, mess_hour)
+            warning_count[4] += count_from_list(reacting_accs, acc_index,
+                                                all_day_activity_obj[obj_list_i].reacter, mess_hour,
+                                                on_missing=sample_reacter)
 
             # count mentions
             n_men, n_rep_men, mentioned_accs, warning_count = count_mentions(mess["user_mentions"],
@@ -154,7 +206,7 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                 for m_a in mentioned_accs:
 
                     # add mentioned accounts
-                    all_day_activity_obj[obj_list_i].mentioner_per_acc[auth_i].append(m_a)
+                    all_day_activity_obj[obj_list_i].mentioner_per_acc.add(auth_i, m_a)
 
 
             # if message was not sent in thread
@@ -172,14 +224,15 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                                                                mess_hour] += int(n_men)
 
                     # count raised warnings
-                    warning_count[5] += count_from_list(mentioned_accs, acc_names,
-                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour)
+                    warning_count[5] += count_from_list(mentioned_accs, acc_index,
+                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour,
+                                                        on_missing=sample_mentioned)
 
                 # if message is reply
                 elif mess["mess_type"] == "REPLY":
 
                     # store account name that replied for author of message that was replied to
-                    all_day_activity_obj[obj_list_i].replied_per_acc[rep_i].append(mess_auth)
+                    all_day_activity_obj[obj_list_i].replied_per_acc.add(rep_i, mess_auth)
 
 
                     # add 1 to hour of message for replier
@@ -195,8 +248,9 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                                                                mess_hour] += int(n_men)
 
                     # count raised warnings
-                    warning_count[5] += count_from_list(mentioned_accs, acc_names,
-                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour)
+                    warning_count[5] += count_from_list(mentioned_accs, acc_index,
+                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour,
+                                                        on_missing=sample_mentioned)
 
                     # add n_rep_men to hour of message
                     all_day_activity_obj[obj_list_i].rep_mentioner[auth_i,
@@ -206,9 +260,7 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
 
                     # if reply is to unknown account and this account got mentioned in the reply
                     if n_rep_men > 0 and rep_i == -1:
-                        print(
-                            "WARNING: acc name {} not found in acc_names".format(rep_auth))
-                        warning_count[5] += 1
+                        raise_warning(warning_count, 5, rep_auth)
 
             # if message was sent in thread
             else:
@@ -223,13 +275,14 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                                                                mess_hour] += int(n_men)
 
                     # count raised warnings
-                    warning_count[5] += count_from_list(mentioned_accs, acc_names,
-                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour)
+                    warning_count[5] += count_from_list(mentioned_accs, acc_index,
+                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour,
+                                                        on_missing=sample_mentioned)
                 # if message is reply
                 elif mess["mess_type"] == "REPLY":
 
                     # store account name that replied for author of message that was replied to
-                    all_day_activity_obj[obj_list_i].replied_per_acc[rep_i].append(mess_auth)
+                    all_day_activity_obj[obj_list_i].replied_per_acc.add(rep_i, mess_auth)
 
 
                     # add 1 to hour of message for replier
@@ -245,8 +298,9 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
                                                                mess_hour] += int(n_men)
 
                     # count raised warnings
-                    warning_count[5] += count_from_list(mentioned_accs, acc_names,
-                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour)
+                    warning_count[5] += count_from_list(mentioned_accs, acc_index,
+                                                        all_day_activity_obj[obj_list_i].mentioned, mess_hour,
+                                                        on_missing=sample_mentioned)
 
                     # add n_rep_men to hour of message
                     all_day_activity_obj[obj_list_i].rep_mentioner[auth_i,
@@ -256,18 +310,26 @@ def activity_hourly(json_file, out_file_name=None, acc_names=[],
 
                     # if reply is to unknown account and this account got mentioned in the reply
                     if n_rep_men > 0 and rep_i == -1:
-                        print(
-                            "WARNING: acc name {} not found in acc_names".format(rep_auth))
-                        warning_count[5] += 1
+                        raise_warning(warning_count, 5, rep_auth)
 
-    # # # store results    # # #
-    # json_out_file = store_results_json([i.asdict() for i in \
-    #     all_day_activity_obj], out_file_name)
-    return (warning_count, [i.asdict() for i in all_day_activity_obj])
+    # log one summary of the raised warnings
+    warning_count.log_summary()
+
+    # report memory used for the counts
+    logging.info("activity_hourly: {} channel-day objects, {} counts, {:.1f} KiB".format(
+        len(all_day_activity_obj), "sparse" if sparse else "dense",
+        sum(obj.nbytes() for obj in all_day_activity_obj) / 1024))
+
+    return warning_count, all_day_activity_obj
 
 
 # # # # # classes # # # # #
 
+# names of the hourly count attributes of DayActivity
+COUNT_FIELDS = ['lone_messages', 'thr_messages', 'replier', 'replied',
+                'mentioner', 'mentioned', 'rep_mentioner', 'rep_mentioned',
+                'reacter', 'reacted']
+
 class DayActivity:
 
     # define constructor
@@ -295,11 +357,11 @@ class DayActivity:
         self.reacter = reacter
         # number of reactions received per hour per account
         self.reacted = reacted
-        # list of account names from which reactions are received per account (duplicates = multiple reactions)
+        # PairCounts of account names from which reactions are received per account
         self.reacted_per_acc = reacted_per_acc
-        # list of account names that are mentioned by account per account (duplicates = multiple mentions)
+        # PairCounts of account names that are mentioned by account per account
         self.mentioner_per_acc = mentioner_per_acc
-        # list of account names from which replies are received per account (duplicates = multiple replies)
+        # PairCounts of account names from which replies are received per account
         self.replied_per_acc = replied_per_acc
         # account names (corresponds to row index of activity types)
         self.acc_names = acc_names
@@ -315,15 +377,233 @@ class DayActivity:
                 'replied': self.replied.tolist(), 'mentioner': self.mentioner.tolist(),
                 'mentioned': self.mentioned.tolist(), 'rep_mentioner': self.rep_mentioner.tolist(),
                 'rep_mentioned': self.rep_mentioned.tolist(), 'reacter': self.reacter.tolist(),
-                'reacted': self.reacted.tolist(),  'reacted_per_acc': self.reacted_per_acc,
-                'mentioner_per_acc': self.mentioner_per_acc, 'replied_per_acc': self.replied_per_acc,
+                'reacted': self.reacted.tolist(),  'reacted_per_acc': self.reacted_per_acc.tolist(),
+                'mentioner_per_acc': self.mentioner_per_acc.tolist(),
+                'replied_per_acc': self.replied_per_acc.tolist(),
                 'acc_names': self.acc_names}
 
+    # number of bytes used by the hourly counts
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in COUNT_FIELDS)
+
+    # row indices of accounts with at least one count in fields
+    def active_rows(self, fields=COUNT_FIELDS):
+        row_sums = np.zeros(len(self.acc_names), dtype=np.int64)
+        for field in fields:
+            counts = getattr(self, field)
+            if isinstance(counts, SparseCounts):
+                for row, hourly in counts.rows.items():
+                    row_sums[row] += hourly.sum()
+            else:
+                row_sums += counts.sum(axis=1)
+        return np.flatnonzero(row_sums)
+
+    # 24 hourly counts summed over all accounts for each of fields
+    def hourly_totals(self, fields=COUNT_FIELDS):
+        totals = {}
+        for field in fields:
+            counts = getattr(self, field)
+            if isinstance(counts, SparseCounts):
+                totals[field] = np.zeros(24, dtype=np.int64)
+                for hourly in counts.rows.values():
+                    totals[field] += hourly
+            else:
+                totals[field] = counts.sum(axis=0, dtype=np.int64)
+        return totals
+
+
+
+class AccountIndex:
+    """
+    Maps account names to their row index in the count arrays
+
+    A dictionary is built once from acc_names, so every lookup is
+    constant time instead of a scan through acc_names. When a name
+    occurs more than once the first index is used, like list.index.
+    New names can be added, which makes it an ordered set of accounts
+    """
+
+    # define constructor
+    def __init__(self, acc_names):
+
+        self.acc_names = acc_names    # account names (row order)
+        self.rows = {}                # account name -> row index
+
+        for i, acc in enumerate(acc_names):
+            self.rows.setdefault(acc, i)
+
+    # obtain row index of account, raises ValueError if not present
+    def index(self, acc):
+        try:
+            return self.rows[acc]
+        except (KeyError, TypeError):
+            raise ValueError("{} is not in acc_names".format(acc))
+
+    # add acc as last row if it is not present, returns its row index
+    def add(self, acc):
+        if acc not in self.rows:
+            self.rows[acc] = len(self.acc_names)
+            self.acc_names.append(acc)
+        return self.rows[acc]
+
+    def __contains__(self, acc):
+        return acc in self.rows
+
+    def __len__(self):
+        return len(self.acc_names)
+
+
+class PairCounts:
+    """
+    Number of interactions per (account row, account name) pair
+
+    Stores the per account interactions of DayActivity as counts from
+    the moment they are recorded, instead of a list with one name per
+    interaction. Only rows with interactions are stored and names keep
+    the order in which they were first recorded
+    """
+
+    # define constructor
+    def __init__(self, num_rows):
+
+        self.num_rows = num_rows      # number of account rows
+        self.rows = {}                # row index -> {account name: count}
+
+    # add count interactions with acc to row (negative rows included)
+    def add(self, row, acc, count=1):
+        counts = self.rows.setdefault(row % self.num_rows, {})
+        counts[acc] = counts.get(acc, 0) + count
+
+    # {account name: count} of row
+    def get(self, row):
+        return self.rows.get(row % self.num_rows, {})
+
+    # list with a {account name: count} dictionary per row
+    def tolist(self):
+        return [dict(self.rows.get(row, {})) for row in range(self.num_rows)]
+
+
+class DayActivityRegistry:
+    """
+    Dictionary of DayActivity list indices keyed by (date, channel)
+
+    Replaces a scan over all DayActivity objects per message by a
+    constant time lookup. The first object of a (date, channel)
+    combination is used, later duplicates are remembered so that
+    get_obj_list_i can still warn about them
+    """
+
+    # define constructor
+    def __init__(self, all_day_activity_obj):
+
+        self.obj_i = {}               # (date, channel) -> list index
+        self.duplicates = set()       # (date, channel) with >1 object
+
+        for i, obj in enumerate(all_day_activity_obj):
+            obj_key = (obj.date[0], obj.channel[0])
+            if obj_key in self.obj_i:
+                self.duplicates.add(obj_key)
+            else:
+                self.obj_i[obj_key] = i
+
+
+class SparseCounts:
+    """
+    Hourly counts that only store rows of active accounts
+
+    Replaces a dense (num_rows, 24) array in DayActivity for guilds
+    with many idle accounts. Rows are created on the first count and
+    support counts[row, hour] indexing (negative rows included), so
+    the counting code is the same for both backends
+    """
+
+    # define constructor
+    def __init__(self, num_rows, dtype=COUNT_DTYPE):
+
+        self.shape = (num_rows, 24)   # shape of the dense equivalent
+        self.dtype = dtype            # dtype of the count rows
+        self.rows = {}                # row index -> 24 hourly counts
+
+    def __getitem__(self, key):
+        # counts[row] gives the 24 hourly counts of row
+        if not isinstance(key, tuple):
+            counts = self.rows.get(key % self.shape[0])
+            return np.zeros(24, dtype=self.dtype) if counts is None else counts
+        row, hour = key
+        counts = self.rows.get(row % self.shape[0])
+        if counts is None:
+            return self.dtype(0)
+        return counts[hour]
+
+    def __setitem__(self, key, value):
+        row, hour = key
+        row = row % self.shape[0]
+        if row not in self.rows:
+            self.rows[row] = np.zeros(24, dtype=self.dtype)
+        self.rows[row][hour] = value
+
+    @property
+    def nbytes(self):
+        return sum(counts.nbytes for counts in self.rows.values())
+
+    # dense array with the counts of all rows
+    def toarray(self):
+        dense = np.zeros(self.shape, dtype=self.dtype)
+        for row, counts in self.rows.items():
+            dense[row] = counts
+        return dense
+
+    def tolist(self):
+        return self.toarray().tolist()
+
+
+class WarningCounter(list):
+    """
+    warning_count list with a capped sample of names per warning
+
+    Behaves as the list of 7 warning counts described in
+    activity_hourly. Instead of printing every warning, the first
+    max_samples distinct account names of each warning type are kept
+    and log_summary logs all warnings of a call at once
+    """
+
+    # description of each warning type (list index)
+    TYPES = ["author not in acc_names", "duplicate DayActivity object",
+             "self mention", "self reaction", "reacter not in acc_names",
+             "mentioned account not in acc_names", "replied account not in acc_names"]
+
+    # define constructor
+    def __init__(self, max_samples=5):
+
+        super().__init__([0] * len(self.TYPES))
+        self.max_samples = max_samples                  # samples per type
+        self.samples = [[] for _ in self.TYPES]        # names per type
+
+    # count a warning of type warning_i raised by acc
+    def add(self, warning_i, acc=None):
+        self[warning_i] += 1
+        self.sample(warning_i, acc)
+
+    # keep acc as sample of warning type warning_i without counting
+    def sample(self, warning_i, acc):
+        samples = self.samples[warning_i]
+        if acc is not None and len(samples) < self.max_samples and acc not in samples:
+            samples.append(acc)
+
+    def summary(self):
+        return "; ".join("{}: {} ({})".format(self.TYPES[i], count, ", ".join(map(str, self.samples[i])))
+                         for i, count in enumerate(self) if count > 0)
+
+    # log all warnings in one message
+    def log_summary(self, name="activity_hourly"):
+        if any(self):
+            logging.warning("{} warnings: {}".format(name, self.summary()))
 
 
 # # # # # functions # # # # #
 
-def get_obj_list_i(all_day_activity_obj, mess_date, mess_chan, acc_names, warning_count):
+def get_obj_list_i(all_day_activity_obj, mess_date, mess_chan, acc_names, warning_count,
+                   obj_registry=None, sparse=False):
     """
     Assesses index of DayActivity object
 
@@ -332,6 +612,11 @@ def get_obj_list_i(all_day_activity_obj, mess_date, mess_chan, acc_names, warnin
     mess_date - str: date in which message was sent yyyy-mm-dd
     mess_chan - str: name of channel in which message was sent
     num_rows - int: number of rows for count arrays in DayActivity
+    obj_registry - DayActivityRegistry: (date, channel) lookup for
+        all_day_activity_obj. built from all_day_activity_obj if None
+        (default = None)
+    sparse - bool: create new objects with SparseCounts instead of
+        dense arrays (default = False)
 
     Output:
     all_day_activity_obj - [obj]: updated list of DayActivity objects
@@ -343,47 +628,82 @@ def get_obj_list_i(all_day_activity_obj, mess_date, mess_chan, acc_names, warnin
     all_day_activity_obj, a new DayActivity object is appended
     """
 
+    # index existing objects if no registry is given
+    if obj_registry is None:
+        obj_registry = DayActivityRegistry(all_day_activity_obj)
+
     # check if DayActivity object corresponding to mess_date and mess_chan exists
-    obj_overlap = [all([getattr(obj, 'date', 'Attribute does not exist')[0] == mess_date,
-                        getattr(obj, 'channel', 'Attribute does not exist')[0] == mess_chan])
-                   for obj in all_day_activity_obj]
+    obj_key = (mess_date, mess_chan)
 
     # if there is no object for the channel date combination
-    if not any(obj_overlap):
+    if obj_key not in obj_registry.obj_i:
 
         # create DayActivity object and add it to the list
-        all_day_activity_obj.append(DayActivity([mess_date], [mess_chan],
-                                                np.zeros((len(acc_names), 24), dtype=np.int16), np.zeros(
-                                                    (len(acc_names), 24), dtype=np.int16),
-                                                np.zeros((len(acc_names), 24), dtype=np.int16), np.zeros(
-                                                    (len(acc_names), 24), dtype=np.int16),
-                                                np.zeros((len(acc_names), 24), dtype=np.int16), np.zeros(
-            (len(acc_names), 24), dtype=np.int16),
-            np.zeros((len(acc_names), 24), dtype=np.int16), np.zeros(
-                (len(acc_names), 24), dtype=np.int16),
-            np.zeros((len(acc_names), 24), dtype=np.int16), np.zeros(
-                (len(acc_names), 24), dtype=np.int16),
-            [[] for _ in range(len(acc_names))], [[] for _ in range(len(acc_names))], [[] for _ in range(len(acc_names))],
+        counts = [new_counts(len(acc_names), sparse) for _ in COUNT_FIELDS]
+        all_day_activity_obj.append(DayActivity([mess_date], [mess_chan], *counts,
+            PairCounts(len(acc_names)), PairCounts(len(acc_names)), PairCounts(len(acc_names)),
             acc_names))
 
+        # register the new object
+        obj_registry.obj_i[obj_key] = len(all_day_activity_obj) - 1
+
         # set list index for message
         obj_list_i = int(-1)
 
     else:
 
         # set list index for message
-        obj_list_i = int(obj_overlap.index(True))
+        obj_list_i = int(obj_registry.obj_i[obj_key])
 
         # see if object only occurs once and raise error if more than once
-        if sum(obj_overlap) > 1:
-            print("WARNING: duplicate DayActivity object, first entry in list is used")
-            warning_count[1] += 1
+        if obj_key in obj_registry.duplicates:
+            raise_warning(warning_count, 1, "{} {}".format(mess_date, mess_chan))
 
     return all_day_activity_obj, obj_list_i, warning_count
 
 # # #
 
 
+def raise_warning(warning_count, warning_i, acc=None):
+    """
+    Counts a warning, with acc as sample if warning_count is a WarningCounter
+
+    Input:
+    warning_count - [int] or WarningCounter: list with counts for
+        warning types
+    warning_i - int: index of the warning type
+    acc - str: account name that raised the warning (default = None)
+    """
+
+    if isinstance(warning_count, WarningCounter):
+        warning_count.add(warning_i, acc)
+    else:
+        warning_count[warning_i] += 1
+
+# # #
+
+
+def new_counts(num_rows, sparse=False):
+    """
+    Creates empty hourly counts for num_rows accounts
+
+    Input:
+    num_rows - int: number of accounts (rows)
+    sparse - bool: whether SparseCounts is used instead of a dense
+        array (default = False)
+
+    Output:
+    counts - np array or SparseCounts: zero counts of shape (num_rows, 24)
+    """
+
+    if sparse:
+        return SparseCounts(num_rows)
+
+    return np.zeros((num_rows, 24), dtype=COUNT_DTYPE)
+
+# # #
+
+
 def count_mentions(mess_mentions, replied_user, mess_auth, warning_count):
     """
     Counts number of user mentions in a message
@@ -419,10 +739,8 @@ def count_mentions(mess_mentions, replied_user, mess_auth, warning_count):
             # if mentioned account is the same as message author
             if mentioned == mess_auth:
 
-                # print error and skip
-                print(
-                    "WARNING: {} mentioned themselves. This is not counted".format(mess_auth))
-                warning_count[2] += 1
+                # raise warning and skip
+                raise_warning(warning_count, 2, mess_auth)
 
             else:
 
@@ -486,10 +804,8 @@ def count_reactions(mess_reactions, emoji_types, mess_auth, warning_count):
                 # if the message author posted the emoji
                 if reactor == mess_auth:
 
-                    # print error and skip
-                    print(
-                        "WARNING: {} reacted to themselves. This is not counted".format(mess_auth))
-                    warning_count[3] += 1
+                    # raise warning and skip
+                    raise_warning(warning_count, 3, mess_auth)
 
                 # if the reactor is not empty
                 elif len(reactor) > 0:
@@ -505,7 +821,7 @@ def count_reactions(mess_reactions, emoji_types, mess_auth, warning_count):
 # # #
 
 
-def count_from_list(acc_list, acc_names, to_count, mess_hour):
+def count_from_list(acc_list, acc_names, to_count, mess_hour, on_missing=None):
     """
     Adds counts per hour to accounts from list
 
@@ -513,10 +829,12 @@ def count_from_list(acc_list, acc_names, to_count, mess_hour):
     acc_list - [str]: all account names that should be counted (the
         account is counted for each time it is in the list, allowing for
         duplicates)
-    acc_names - [str]: account names for which activity should be
-        counted separately
+    acc_names - [str] or AccountIndex: account names for which activity
+        should be counted separately
     to_count - [[int]]: activity type to be counted
     mess_hour - int: hour at which message with activity was sent
+    on_missing - function: called with each account name that is not
+        in acc_names (default = None)
 
     Output:
     warning_count - int: number of times warning was raised
@@ -528,6 +846,10 @@ def count_from_list(acc_list, acc_names, to_count, mess_hour):
     # initiate warning count at 0
     warning_count = 0
 
+    # index account names if a plain list is given
+    if not isinstance(acc_names, AccountIndex):
+        acc_names = AccountIndex(acc_names)
+
     # for each account
     for acc in acc_list:
 
@@ -538,8 +860,9 @@ def count_from_list(acc_list, acc_names, to_count, mess_hour):
         except:
 
             # if acc is not in acc_names, raise warning and add count to remainder
-            print("WARNING: acc name {} not found in acc_names".format(acc))
             warning_count += 1
+            if on_missing is not None:
+                on_missing(acc)
             acc_i = -1
 
         # add 1 to hour of message for acc
@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  activity_hourly_vectorized.py
+#
+#  Columnar NumPy engine for activity_hourly
+
+
+# # # # # import libraries # # # # #
+
+import logging
+import numpy as np
+
+from analysis.activity_hourly import (COUNT_DTYPE, SPARSE_MIN_ACCOUNTS,
+                                      AccountIndex, DayActivity, PairCounts,
+                                      SparseCounts, WarningCounter)
+
+# message type codes of MessageColumns.mess_type
+TYPE_OTHER = 0
+TYPE_DEFAULT = 1
+TYPE_REPLY = 2
+
+# # # # # main function # # # # #
+
+
+def activity_hourly_vectorized(json_file, out_file_name=None, acc_names=[],
+                               mess_substring=None, emoji_types=None, sparse=None):
+    """
+    Counts activity per hour from json_file with the columnar engine
+
+    Input and output are the same as for activity_hourly: the messages
+    are converted to MessageColumns in one pass, after which all counts
+    are computed by activity_hourly_columns
+
+    Input:
+    json_file - [JSON]: list of JSON objects with message data
+    out_file_name - str: not used, kept for the activity_hourly signature
+    acc_names - [str]: account names for which activity should be
+        counted separately (default = [])
+    mess_substring - [str]: only messages containing at least one
+        substring in this list are considered. all messages are
+        considered if set to None (default = None)
+    emoji_types - [str]: only emojis in this list are considered. all
+        emojis are considered if set to None (default = None)
+    sparse - bool: store counts with SparseCounts instead of dense
+        arrays, see activity_hourly (default = None)
+
+    Output:
+    warning_count - [int]: list of counts for the different possible
+        warnings, see activity_hourly
+    [dict]: DayActivity.asdict() for each date-channel combination
+    """
+
+    # add remainder category to acc_names
+    acc_names.append("remainder")
+
+    columns, warning_count = columns_from_messages(json_file, acc_names,
+                                                   mess_substring, emoji_types)
+
+    # log one summary of the raised warnings
+    warning_count.log_summary("activity_hourly_vectorized")
+
+    return (warning_count, [i.asdict() for i in activity_hourly_columns(columns, sparse)])
+
+
+# # # # # classes # # # # #
+
+class MessageColumns:
+    """
+    Columnar message data, the input of activity_hourly_columns
+
+    All per message and per entry values are NumPy integer arrays, so
+    callers that already hold their messages as arrays build it
+    directly. columns_from_messages converts JSON messages
+    """
+
+    # define constructor
+    def __init__(self, acc_names, buckets, names, mess_hour, mess_bucket,
+                 auth_i, rep_i, auth_name, mess_type, thread, n_men,
+                 n_rep_men, n_reac, men_mess, men_i, men_name, reac_mess,
+                 reac_i, reac_name):
+
+        # account names (row index of the count arrays, "remainder" last)
+        self.acc_names = acc_names
+        # [(date, channel)] per bucket id, in order of first message
+        self.buckets = buckets
+        # account names referenced by the *_name codes, for the per
+        # account counts of DayActivity
+        self.names = names
+        # per message: hour, bucket id, author row and replied row
+        # (-1 is the remainder row, replied row is -1 if not a reply)
+        # and author name code
+        self.mess_hour = mess_hour
+        self.mess_bucket = mess_bucket
+        self.auth_i = auth_i
+        self.rep_i = rep_i
+        self.auth_name = auth_name
+        # per message: type code (TYPE_*) and whether sent in a thread
+        self.mess_type = mess_type
+        self.thread = thread
+        # per message: number of mentions, reply mentions and reactions
+        self.n_men = n_men
+        self.n_rep_men = n_rep_men
+        self.n_reac = n_reac
+        # per counted mention: message index, mentioned row and name code
+        self.men_mess = men_mess
+        self.men_i = men_i
+        self.men_name = men_name
+        # per counted reaction: message index, reacting row and name code
+        self.reac_mess = reac_mess
+        self.reac_i = reac_i
+        self.reac_name = reac_name
+
+
+# # # # # functions # # # # #
+
+def columns_from_messages(json_file, acc_names, mess_substring=None, emoji_types=None):
+    """
+    Converts messages to MessageColumns
+
+    Input:
+    json_file - [JSON]: list of JSON objects with message data
+    acc_names - [str]: account names, including "remainder"
+    mess_substring - [str]: see activity_hourly
+    emoji_types - [str]: see activity_hourly
+
+    Output:
+    columns - MessageColumns: columnar message data
+    warning_count - [int]: list of counts for the different possible
+        warnings, equal to the counts of activity_hourly
+
+    Notes:
+    the messages are only read to flatten their fields into lists.
+    Mentions and reactions are filtered like count_mentions and
+    count_reactions of activity_hourly, and account rows are resolved
+    once per distinct name, on the flat arrays
+    """
+
+    # initiate counter for error occurences (a list of 7 counts)
+    warning_count = WarningCounter()
+
+    bucket_i = {}
+    mess_hour, mess_bucket, authors, replied, mess_type, thread = [], [], [], [], [], []
+    men_raw, men_mess = [], []
+    reac_raw, reac_emoji, reac_mess = [], [], []
+
+    # # # flatten messages # # #
+
+    for mess in json_file:
+
+        # if message contains specified substring (or None are specified)
+        if not ((mess_substring == None) or (any([ss in mess["message_content"] for ss in mess_substring]))):
+            continue
+
+        mess_i = len(mess_hour)
+        mess_date, mess_time = mess["datetime"].split(" ")
+
+        if mess["mess_type"] == "DEFAULT":
+            mess_type.append(TYPE_DEFAULT)
+        elif mess["mess_type"] == "REPLY":
+            if len(mess["replied_user"]) == 0:
+                raise TypeError("reply message without replied_user: {}".format(mess["datetime"]))
+            mess_type.append(TYPE_REPLY)
+        else:
+            mess_type.append(TYPE_OTHER)
+
+        mess_hour.append(int(mess_time.split(":")[0]))
+        # bucket id of the date-channel combination
+        mess_bucket.append(bucket_i.setdefault((mess_date, mess["channel"]), len(bucket_i)))
+        authors.append(mess["author"])
+        replied.append(mess["replied_user"])
+        thread.append(bool(mess["thread"]))
+
+        men_raw.extend(mess["user_mentions"])
+        men_mess.extend([mess_i] * len(mess["user_mentions"]))
+
+        # reactions are "account,...,account,emoji" strings
+        for reaction in mess["reactions"]:
+            items = reaction.split(",")
+            reac_raw.extend(items[:-1])
+            reac_emoji.extend([items[-1]] * (len(items) - 1))
+            reac_mess.extend([mess_i] * (len(items) - 1))
+
+    num_mess = len(mess_hour)
+    authors = np.array(authors, dtype=object)
+    replied = np.array(replied, dtype=object)
+    mess_type = np.array(mess_type, dtype=np.int8)
+    men_raw = np.array(men_raw, dtype=object)
+    men_mess = np.array(men_mess, dtype=np.int64)
+    reac_raw = np.array(reac_raw, dtype=object)
+    reac_mess = np.array(reac_mess, dtype=np.int64)
+
+    # # # filter mentions and reactions # # #
+
+    # mentions of the author are not counted, mentions of the replied
+    # account count as one reply mention per message
+    men_given = men_raw != ""
+    men_self = men_given & (men_raw == authors[men_mess])
+    men_rep = men_given & ~men_self & (men_raw == replied[men_mess])
+    men_kept = men_given & ~men_self & ~men_rep
+    add_warnings(warning_count, 2, authors[men_mess[men_self]])
+
+    # reactions of the author are not counted
+    if emoji_types == None:
+        reac_used = np.ones(len(reac_raw), dtype=bool)
+    else:
+        reac_used = np.isin(np.array(reac_emoji, dtype=object), list(emoji_types))
+    reac_self = reac_used & (reac_raw == authors[reac_mess])
+    reac_kept = reac_used & ~reac_self & (reac_raw != "")
+    add_warnings(warning_count, 3, authors[reac_mess[reac_self]])
+
+    n_men = np.bincount(men_mess[men_kept], minlength=num_mess)
+    n_rep_men = (np.bincount(men_mess[men_rep], minlength=num_mess) > 0).astype(np.int64)
+    n_reac = np.bincount(reac_mess[reac_kept], minlength=num_mess)
+    men_mess, men_raw = men_mess[men_kept], men_raw[men_kept]
+    reac_mess, reac_raw = reac_mess[reac_kept], reac_raw[reac_kept]
+
+    # # # resolve account rows # # #
+
+    # code every name once, the row of each distinct name is looked up
+    names, name_codes = np.unique(np.concatenate((authors, replied, men_raw, reac_raw)).astype(str),
+                                  return_inverse=True)
+    acc_index = AccountIndex(acc_names)
+    name_rows = np.array([acc_index.rows.get(name, -1) for name in names.tolist()], dtype=np.int64)
+    auth_name, rep_name, men_name, reac_name = np.split(
+        name_codes.ravel(), np.cumsum([num_mess, num_mess, len(men_raw)]))
+
+    auth_i = name_rows[auth_name]
+    has_rep = replied != ""
+    rep_i = np.where(has_rep, name_rows[rep_name], -1)
+    men_i = name_rows[men_name]
+    reac_i = name_rows[reac_name]
+
+    # # # count warnings of accounts that are not in acc_names # # #
+
+    is_counted = mess_type != TYPE_OTHER
+    add_warnings(warning_count, 0, authors[auth_i == -1])
+    add_warnings(warning_count, 6, replied[has_rep & (rep_i == -1)])
+    add_warnings(warning_count, 4, reac_raw[reac_i == -1])
+
+    # mentioned accounts of default messages and replies, followed per
+    # message by the replied account if it is mentioned
+    men_missing = np.flatnonzero(is_counted[men_mess] & (men_i == -1))
+    rep_missing = np.flatnonzero((mess_type == TYPE_REPLY) & (n_rep_men > 0) & (rep_i == -1))
+    order = np.argsort(np.concatenate((2 * men_mess[men_missing], 2 * rep_missing + 1)), kind="stable")
+    add_warnings(warning_count, 5, np.concatenate((men_raw[men_missing], replied[rep_missing]))[order])
+
+    columns = MessageColumns(acc_names, list(bucket_i.keys()), names.tolist(),
+                             np.array(mess_hour, dtype=np.int64), np.array(mess_bucket, dtype=np.int64),
+                             auth_i, rep_i, auth_name, mess_type, np.array(thread, dtype=bool),
+                             n_men, n_rep_men, n_reac, men_mess, men_i, men_name,
+                             reac_mess, reac_i, reac_name)
+
+    return columns, warning_count
+
+# # #
+
+
+def add_warnings(warning_count, warning_i, accs):
+    """
+    Counts a warning of type warning_i for every account in accs and
+    keeps the first distinct ones as samples, like WarningCounter.add
+    for each account in order
+    """
+    warning_count[warning_i] += len(accs)
+    if len(accs) == 0:
+        return
+
+    # distinct accounts in order of first occurence
+    _, first = np.unique(np.asarray(accs).astype(str), return_index=True)
+    for acc in np.asarray(accs)[np.sort(first)[:warning_count.max_samples]].tolist():
+        warning_count.sample(warning_i, acc)
+
+# # #
+
+
+def activity_hourly_columns(columns, sparse=None):
+    """
+    Computes DayActivity objects from MessageColumns
+
+    Input:
+    columns - MessageColumns: columnar message data
+    sparse - bool: store counts with SparseCounts instead of dense
+        arrays. used if acc_names has at least SPARSE_MIN_ACCOUNTS
+        accounts when set to None (default = None)
+
+    Output:
+    all_day_activity_obj - [obj]: DayActivity object for each
+        date-channel combination, in order of the first message
+
+    Notes:
+    counts are computed with np.bincount per (bucket, account) pair
+    with activity, never for all buckets times all accounts, and stored
+    as COUNT_DTYPE like activity_hourly
+    """
+
+    num_acc = len(columns.acc_names)
+    num_buckets = len(columns.buckets)
+    if sparse is None:
+        sparse = num_acc >= SPARSE_MIN_ACCOUNTS
+
+    # rows of the remainder category are stored as -1
+    auth_i = columns.auth_i % num_acc
+    rep_i = columns.rep_i % num_acc
+    men_i = columns.men_i % num_acc
+    reac_i = columns.reac_i % num_acc
+
+    is_default = columns.mess_type == TYPE_DEFAULT
+    is_reply = columns.mess_type == TYPE_REPLY
+    is_counted = is_default | is_reply
+    is_men_counted = is_counted[columns.men_mess]
+
+    # (message indices, account rows, weights) of each count field
+    mess = np.arange(len(columns.mess_hour))
+    fields = {
+        'lone_messages': (mess[is_default & ~columns.thread], auth_i[is_default & ~columns.thread], None),
+        'thr_messages': (mess[is_default & columns.thread], auth_i[is_default & columns.thread], None),
+        'replier': (mess[is_reply], auth_i[is_reply], None),
+        'replied': (mess[is_reply], rep_i[is_reply], None),
+        'mentioner': (mess[is_counted], auth_i[is_counted], columns.n_men[is_counted]),
+        'mentioned': (columns.men_mess[is_men_counted], men_i[is_men_counted], None),
+        'rep_mentioner': (mess[is_reply], auth_i[is_reply], columns.n_rep_men[is_reply]),
+        'rep_mentioned': (mess[is_reply], rep_i[is_reply], columns.n_rep_men[is_reply]),
+        'reacter': (columns.reac_mess, reac_i, None),
+        'reacted': (mess, auth_i, columns.n_reac),
+    }
+
+    # number the (bucket, account) pairs with entries, sorted by bucket
+    pair_keys = {field: columns.mess_bucket[mess_i] * num_acc + rows
+                 for field, (mess_i, rows, _) in fields.items()}
+    pairs = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] + list(pair_keys.values())))
+    pair_bucket = pairs // num_acc
+    pair_row = pairs % num_acc
+    bucket_start = np.searchsorted(pair_bucket, np.arange(num_buckets + 1))
+
+    # (pair, hour) counts of each field
+    counts = {}
+    for field, (mess_i, rows, weights) in fields.items():
+        cell = np.searchsorted(pairs, pair_keys[field]) * 24 + columns.mess_hour[mess_i]
+        counts[field] = np.bincount(cell, weights, minlength=len(pairs) * 24).astype(COUNT_DTYPE).reshape(-1, 24)
+
+    # per account counts of names, in message order
+    reacted_per_acc = pair_counts(columns, num_acc, columns.reac_mess, auth_i[columns.reac_mess],
+                                  columns.reac_name)
+    mentioner_per_acc = pair_counts(columns, num_acc, columns.men_mess, auth_i[columns.men_mess],
+                                    columns.men_name)
+    replied_per_acc = pair_counts(columns, num_acc, mess[is_reply], rep_i[is_reply],
+                                  columns.auth_name[is_reply])
+
+    all_day_activity_obj = []
+    for b, (mess_date, mess_chan) in enumerate(columns.buckets):
+        first, last = bucket_start[b], bucket_start[b + 1]
+        day_counts = {field: bucket_counts(field_counts[first:last], pair_row[first:last], num_acc, sparse)
+                      for field, field_counts in counts.items()}
+        all_day_activity_obj.append(DayActivity([mess_date], [mess_chan],
+                                                acc_names=columns.acc_names,
+                                                reacted_per_acc=reacted_per_acc[b],
+                                                mentioner_per_acc=mentioner_per_acc[b],
+                                                replied_per_acc=replied_per_acc[b],
+                                                **day_counts))
+
+    # report memory used for the counts
+    logging.info("activity_hourly_vectorized: {} channel-day objects, {} counts, {:.1f} KiB".format(
+        len(all_day_activity_obj), "sparse" if sparse else "dense",
+        sum(obj.nbytes() for obj in all_day_activity_obj) / 1024))
+
+    return all_day_activity_obj
+
+# # #
+
+
+def bucket_counts(pair_counts, rows, num_acc, sparse):
+    """
+    Hourly counts of one bucket from the counts of its (bucket, account)
+    pairs, as SparseCounts or as dense (num_acc, 24) array
+    """
+    if sparse:
+        counts = SparseCounts(num_acc)
+        counts.rows = dict(zip(rows.tolist(), pair_counts))
+        return counts
+
+    counts = np.zeros((num_acc, 24), dtype=COUNT_DTYPE)
+    counts[rows] = pair_counts
+    return counts
+
+# # #
+
+
+def pair_counts(columns, num_acc, mess_i, rows, name_codes):
+    """
+    PairCounts per bucket of the (account row, name) interactions of
+    messages mess_i, with names in order of first occurence
+    """
+    all_pair_counts = [PairCounts(num_acc) for _ in range(len(columns.buckets))]
+
+    # count each distinct (bucket, row, name) once
+    num_names = max(len(columns.names), 1)
+    keys = (columns.mess_bucket[mess_i] * num_acc + rows) * num_names + name_codes
+    unique_keys, first, n_pairs = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+
+    for key, count in zip(unique_keys[order].tolist(), n_pairs[order].tolist()):
+        bucket_row, name = divmod(key, num_names)
+        bucket, row = divmod(bucket_row, num_acc)
+        all_pair_counts[bucket].add(row, columns.names[name], count)
+
+    return all_pair_counts
@@ -1,37 +1,56 @@
 #!/usr/bin/env python3
+import argparse
 import logging
+import multiprocessing
 import os
 import sys
+import time
 
 from pymongo.errors import ConnectionFailure
-from pymongo import MongoClient
 from datetime import datetime, timedelta, timezone
 from dateutil import tz
-from collections import Counter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 # Database models
 from models.UserModel import UserModel
 from models.GuildModel import GuildModel
-from models.HeatMapModel import HeatMapModel
-from models.RawInfoModel import RawInfoModel
+from models.HeatMapModel import HeatMapModel, HEATMAP_KEY_FIELDS
+from models.RawInfoModel import RawInfoModel, HEATMAP_FIELDS
 from models.GuildsRnDaoModel import GuildsRnDaoModel
+from models.HeatMapRollupModel import HeatMapRollupModel, ROLLUP_KEY_FIELDS
+from connector.ConnectionManager import ConnectionManager, READ_PREFERENCES
+from pipeline import run_pipeline
 
 # Activity hourly
-from analysis.activity_hourly import activity_hourly
+from analysis.activity_hourly import AccountIndex, activity_hourly_objects
 from dotenv import load_dotenv
 
 
+# heatmap fields counted as actions, accounts without any get no heatmap
+ACTION_FIELDS = ["thr_messages", "lone_messages", "replier",
+                 "replied", "mentioned", "mentioner", "reacter", "reacted"]
+
+
 class RnDaoAnalyzer:
     """
     RnDaoAnalyzer
     class that handles database connection and data analysis
     """
 
+    # settings copied to the analyzers of the pool workers
+    WORKER_SETTINGS = ("testing", "backfill", "migrate", "batch_size",
+                       "day_workers", "chunk_days", "max_days", "pipeline",
+                       "prefetch", "pool_size",
+                       "compressors", "read_preference", "catalog_ttl")
+
     def __init__(self):
         """
         Class initiation function
         """
         """ MongoDB client """
         self.db_client = None
+        """ Connection manager sharing db_client and its cached catalogs"""
+        self.connection = None
         """ Database URL """
         self.db_url = ""
         self.db_host = ""
@@ -43,6 +62,42 @@ class RnDaoAnalyzer:
         self.db_password = ""
         """ Testing, prevents from data upload"""
         self.testing = False
+        """ Backfill, streams the whole date range with one cursor"""
+        self.backfill = False
+        """ Migrate rawinfos to the indexed created_at date field"""
+        self.migrate = False
+        """ Number of heatmap documents per insert_many"""
+        self.batch_size = 1000
+        """ Number of guilds analyzed in parallel"""
+        self.workers = 1
+        """ Worker pool type, "process" or "thread" """
+        self.pool = "process"
+        """ Creates the database client of a worker, database_connect if None"""
+        self.client_factory = None
+        """ Number of processes computing the days of one guild in parallel"""
+        self.day_workers = 1
+        """ Number of days per chunk handed to a day worker"""
+        self.chunk_days = 7
+        """ Maximum number of days analyzed per run, all days if None"""
+        self.max_days = None
+        """ Overlap fetch, compute and store of the chunks with run_pipeline"""
+        self.pipeline = False
+        """ Number of fetched chunks waiting for the compute stage of the pipeline"""
+        self.prefetch = 2
+        """ PipelineStats of the last pipelined guild"""
+        self.pipeline_stats = None
+        """ Seconds between two polls of rawinfos in daemon mode"""
+        self.poll_interval = 5
+        """ Tail rawinfos with a change stream in daemon mode, polling if False"""
+        self.change_stream = True
+        """ Maximum number of connections in the client pool"""
+        self.pool_size = 100
+        """ Wire protocol compressors in order of preference, e.g. ["zstd", "snappy"]"""
+        self.compressors = None
+        """ Read preference of the rawinfos reads, e.g. "secondaryPreferred" """
+        self.read_preference = "primary"
+        """ Seconds the database and collection names are cached"""
+        self.catalog_ttl = 60
 
     def set_database_info(self, db_host: str = "", db_url: str = "", db_user: str = "", db_password: str = "", db_port: str = ""):
         """
@@ -62,9 +117,23 @@ class RnDaoAnalyzer:
 
         CONNECTION_STRING = f"mongodb://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}"
 
-        self.db_client = MongoClient(CONNECTION_STRING,
-                                     serverSelectionTimeoutMS=10000,
-                                     connectTimeoutMS=200000)
+        self.connection = ConnectionManager(CONNECTION_STRING,
+                                            max_pool_size=self.pool_size,
+                                            compressors=self.compressors,
+                                            read_preference=self.read_preference,
+                                            catalog_ttl=self.catalog_ttl)
+        self.db_client = self.connection.connect()
+
+    def get_connection(self):
+        """
+        Returns the ConnectionManager of db_client, created for a
+        client that was set directly (e.g. by a client_factory)
+        """
+        if self.connection is None or self.connection.client is not self.db_client:
+            self.connection = ConnectionManager(client=self.db_client,
+                                                read_preference=self.read_preference,
+                                                catalog_ttl=self.catalog_ttl)
+        return self.connection
 
     def database_connection_test(self):
         """ Test database connection """
@@ -81,19 +150,75 @@ class RnDaoAnalyzer:
         guilds = guilds_c.get_connected_guilds(guildId)
 
         logging.info(f"Creating heatmaps for {guilds}")
-        for guild in guilds:
+        if self.workers > 1 and len(guilds) > 1:
+            results = self.run_parallel(guilds)
+        else:
+            results = [self.run_guild(guild) for guild in guilds]
+
+        log_guild_summary(results)
+        return results
+
+    def run_guild(self, guild):
+        """
+        Runs the analysis of one guild, a failure is logged and
+        reported in the result instead of stopping the other guilds
+        """
+        start_time = time.perf_counter()
+        status = "ok"
+        try:
             self.analysis_heatmap(guild)
+        except Exception as e:
+            logging.exception(f"Analysis of guild {guild} failed")
+            status = f"failed: {type(e).__name__}"
+
+        return {"guild": guild, "seconds": time.perf_counter() - start_time, "status": status}
+
+    def run_parallel(self, guilds):
+        """
+        Fans the guilds out over a pool of self.workers workers, each
+        guild is analyzed with its own database client
+        """
+        options = {
+            "db_info": {
+                "db_host": self.db_host,
+                "db_url": self.db_url,
+                "db_user": self.db_user,
+                "db_password": self.db_password,
+                "db_port": self.db_port,
+            },
+            "settings": {x: getattr(self, x) for x in self.WORKER_SETTINGS},
+        }
+
+        if self.pool == "thread":
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            # spawn, the parent's MongoClient is not fork safe
+            executor = ProcessPoolExecutor(max_workers=self.workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+
+        with executor:
+            futures = [executor.submit(run_guild_worker, options, guild, self.client_factory)
+                       for guild in guilds]
+            results = []
+            for guild, future in zip(guilds, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # the worker itself failed (connection, pickling, ...)
+                    logging.exception(f"Worker for guild {guild} failed")
+                    results.append({"guild": guild, "seconds": 0, "status": f"failed: {type(e).__name__}"})
+
+        return results
 
     def get_guilds(self):
         """Returns the list of all guilds"""
         logging.info(
             f"Listed guilds {rawinfo_c.database.list_collection_names()}")
 
-    def getNumberOfActions(self, heatmap):
+    @staticmethod
+    def getNumberOfActions(heatmap):
         sum_ac = 0
-        fields = ["thr_messages", "lone_messages", "replier",
-                  "replied", "mentioned", "mentioner", "reacter", "reacted"]
-        for field in fields:
+        for field in ACTION_FIELDS:
             for i in range(24):
                 sum_ac += heatmap[field][i]
         return sum_ac
@@ -103,17 +228,20 @@ class RnDaoAnalyzer:
         Based on the rawdata creates and stores the heatmap data
         """
         # activity_hourly()
-        if not guild in self.db_client.list_database_names():
+        connection = self.get_connection()
+        database_names = connection.database_names()
+        if not guild in database_names:
             logging.error(f"Database {guild} doesn't exist")
             logging.error(
-                f"Existing databases: {self.db_client.list_database_names()}")
+                f"Existing databases: {sorted(database_names)}")
             logging.info("Continuing")
             return
 
         # Collections involved in analysis
         # guild parameter is the name of the database
-        rawinfo_c = RawInfoModel(self.db_client[guild])
-        heatmap_c = HeatMapModel(self.db_client[guild])
+        rawinfo_c = connection.model(RawInfoModel, guild, analytic=True)
+        heatmap_c = connection.model(HeatMapModel, guild)
+        rollup_c = connection.model(HeatMapRollupModel, guild)
 
         # Testing if there are entries in the rawinfo collection
         if rawinfo_c.count() == 0:
@@ -128,7 +256,15 @@ class RnDaoAnalyzer:
             raise Exception(
                 f"Collection '{rawinfo_c.collection_name}' does not exist")
 
-        last_date = heatmap_c.get_last_date()
+        # once migrated, the new entries get their created_at field too
+        if self.migrate or rawinfo_c.has_created_at():
+            rawinfo_c.migrate_created_at()
+
+        # resume after the last day whose heatmaps were all written,
+        # guilds analyzed before the checkpoint resume after the last heatmap
+        last_date = heatmap_c.get_watermark()
+        if last_date == None:
+            last_date = heatmap_c.get_last_date()
 
         if last_date == None:
             # If no heatmap was created, than tha last date is the first
@@ -140,72 +276,412 @@ class RnDaoAnalyzer:
 
         # Generate heatmap for the days between the last_date and today
         # rawinfo_c.test_get()
+        num_days = 0
+        while (last_date + timedelta(days=num_days)).astimezone() < datetime.now().astimezone() - timedelta(days=1):
+            num_days += 1
+        if self.max_days is not None:
+            num_days = min(num_days, self.max_days)
+
+        if self.backfill:
+            day_entries = rawinfo_c.get_range_entries(last_date, num_days, HEATMAP_FIELDS)
+        else:
+            day_entries = ((last_date + timedelta(days=i),
+                            rawinfo_c.get_day_entries(last_date + timedelta(days=i), HEATMAP_FIELDS))
+                           for i in range(num_days))
+
+        # heatmaps are upserted, so rewriting a day after a crash does not
+        # duplicate them, and the checkpoint moves with every written day
+        on_commit = None
+        if not self.testing:
+            heatmap_c.create_key_index()
+            rollup_c.create_key_index()
+
+            def on_commit(day):
+                heatmap_c.set_watermark(day)
+                # what the daemon counted for these days is rewritten now,
+                # provisional documents left are of accounts without actions
+                heatmap_c.delete_provisional(day)
+
+        # the rollups of a day are written in the same flush as its heatmaps
+        with heatmap_c.bulk_writer(self.batch_size, HEATMAP_KEY_FIELDS, on_commit) as heatmap_writer, \
+                rollup_c.bulk_writer(self.batch_size, ROLLUP_KEY_FIELDS) as rollup_writer:
+            heatmap_writer.link(rollup_writer)
+            if self.pipeline:
+                self.analysis_heatmap_pipeline(day_entries, heatmap_writer, rollup_writer)
+                logging.info(f"Pipeline of guild {guild}\n{self.pipeline_stats.summary()}")
+            elif self.day_workers > 1:
+                self.analysis_heatmap_parallel(day_entries, heatmap_writer, rollup_writer)
+            else:
+                for day, entries in day_entries:
+                    if len(entries) > 0:
+                        self.analysis_heatmap_day(entries, heatmap_writer, rollup_writer)
+
+                    heatmap_writer.mark(day)
+
+    def run_daemon(self, guildId, max_polls=None):
+        """
+        Keeps the heatmaps of the days after the last analyzed day up to
+        date while messages come in. New rawinfos entries are tailed with
+        a change stream, or polled every self.poll_interval seconds when
+        change streams are unavailable, and their hourly counts are added
+        to the heatmap documents with apply_deltas
+        These documents are provisional, the daily analysis rewrites
+        them once the day is over
+        max_polls limits the number of polls, no limit if None
+        """
+        guilds_c = GuildsRnDaoModel(self.db_client["RnDAO"])
+        database_names = self.get_connection().database_names()
+        guilds = [x for x in guilds_c.get_connected_guilds(guildId) if x in database_names]
+        logging.info(f"Tailing rawinfos of {guilds}")
 
-        while last_date.astimezone() < datetime.now().astimezone() - timedelta(days=1):
-            entries = rawinfo_c.get_day_entries(last_date)
-            if len(entries) == 0:
-                # analyze next day
-                last_date = last_date + timedelta(days=1)
-                continue
-
-            prepared_list = []
-            account_list = []
-
-            for entry in entries:
-                entry["user_mentions"] = entry["user_mentions"][0].split(",")
-
-                prepared_list.append(
-                    {
-                        # .strftime('%Y-%m-%d %H:%M'),
-                        "datetime": entry["datetime"],
-                        "channel": entry["channelId"],
-                        "author": entry["author"],
-                        "replied_user": entry["replied_user"],
-                        "user_mentions": entry["user_mentions"],
-                        "reactions": entry["reactions"],
-                        "thread": entry["thread"],
-                        "mess_type": entry["type"],
-                    }
-                )
-                if not entry["author"] in account_list and entry["author"]:
-                    account_list.append(entry["author"])
-
-                if entry["user_mentions"] != None:
-                    for account in entry["user_mentions"]:
-                        if account not in account_list and account:
-                            account_list.append(account)
-
-            activity = activity_hourly(prepared_list, acc_names=account_list)
-            warnings = activity[0]
-            heatmap = activity[1][0]
-            # Parsing the activity_hourly into the dictionary
-            for heatmap in activity[1]:
-                for i in range(len(account_list)):
-                    heatmap_dict = {}
-                    heatmap_dict["date"] = heatmap["date"][0]
-                    heatmap_dict["channelId"] = heatmap["channel"][0]
-                    heatmap_dict["thr_messages"] = heatmap["thr_messages"][i]
-                    heatmap_dict["lone_messages"] = heatmap["lone_messages"][i]
-                    heatmap_dict["replier"] = heatmap["replier"][i]
-                    heatmap_dict["replied"] = heatmap["replied"][i]
-                    heatmap_dict["mentioner"] = heatmap["mentioner"][i]
-                    heatmap_dict["mentioned"] = heatmap["mentioned"][i]
-                    heatmap_dict["reacter"] = heatmap["reacter"][i]
-                    heatmap_dict["reacted"] = heatmap["reacted"][i]
-                    heatmap_dict["reacted_per_acc"] = store_counts_dict(dict(Counter(heatmap["reacted_per_acc"][i])))
-                    heatmap_dict["mentioner_per_acc"] = store_counts_dict(dict(Counter(heatmap["mentioner_per_acc"][i])))
-                    heatmap_dict["replied_per_acc"] = store_counts_dict(dict(Counter(heatmap["replied_per_acc"][i])))
-                    heatmap_dict["account_name"] = heatmap["acc_names"][i]
-                    sum_ac = self.getNumberOfActions(heatmap_dict)
-
-                    if not self.testing and sum_ac > 0:
-                        heatmap_c.insert_one(heatmap_dict)
-
-            # analyze next day
-            last_date = last_date + timedelta(days=1)
+        tails = {}
+        for guild in guilds:
+            tails[guild] = {"stream": None, "accounts": {}}
+            rawinfo_c, _ = self.realtime_models(guild, tails[guild])
+            # opened before the catch up, so no insert is missed in between
+            if self.change_stream:
+                tails[guild]["stream"] = rawinfo_c.watch_inserts(HEATMAP_FIELDS)
+            tails[guild]["last_id"] = self.realtime_catch_up(guild, tails[guild])
+
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            applied = 0
+            for guild, tail in tails.items():
+                applied += self.realtime_poll(guild, tail)
+            if applied == 0 and all(x["stream"] is None for x in tails.values()):
+                time.sleep(self.poll_interval)
+
+        for tail in tails.values():
+            if tail["stream"] is not None:
+                tail["stream"].close()
+
+    def realtime_models(self, guild, tail):
+        """
+        Returns the rawinfos and heatmaps models of guild, created once
+        per tail through the ConnectionManager and kept in tail
+        """
+        if "rawinfo_c" not in tail:
+            connection = self.get_connection()
+            tail["rawinfo_c"] = connection.model(RawInfoModel, guild, analytic=True)
+            tail["heatmap_c"] = connection.model(HeatMapModel, guild)
+        return tail["rawinfo_c"], tail["heatmap_c"]
+
+    def realtime_catch_up(self, guild, tail):
+        """
+        Rebuilds the provisional heatmaps of guild from the entries
+        inserted so far in the days after the last analyzed day, today
+        only if the guild was not analyzed yet
+        The last analyzed day is kept in tail["cutoff"]
+        Returns the _id of the last applied entry
+        """
+        rawinfo_c, heatmap_c = self.realtime_models(guild, tail)
+
+        last_id = rawinfo_c.get_latest_id()
+        cutoff = get_realtime_cutoff(heatmap_c)
+        tail["cutoff"] = cutoff
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        day = today if cutoff is None else cutoff + timedelta(days=1)
+
+        if not self.testing:
+            heatmap_c.delete_provisional(after_day=cutoff)
+        while day <= today and last_id is not None:
+            entries = [x for x in rawinfo_c.get_day_entries(day, HEATMAP_FIELDS)
+                       if x["_id"] <= last_id]
+            self.apply_realtime_entries(guild, entries, tail)
+            day += timedelta(days=1)
+        return last_id
+
+    def realtime_poll(self, guild, tail):
+        """
+        Applies the entries of guild inserted after tail["last_id"],
+        read from tail["stream"] if it is not None
+        Returns the number of new entries
+        """
+        if tail["stream"] is None:
+            rawinfo_c, _ = self.realtime_models(guild, tail)
+            entries = rawinfo_c.get_entries_after(tail["last_id"], HEATMAP_FIELDS, self.batch_size)
+        else:
+            entries = []
+            while len(entries) < self.batch_size:
+                change = tail["stream"].try_next()
+                if change is None:
+                    break
+                entry = change["fullDocument"]
+                # inserts between opening the stream and the catch up
+                if tail["last_id"] is None or entry["_id"] > tail["last_id"]:
+                    entries.append(entry)
+
+        if len(entries) == 0:
+            return 0
+        tail["last_id"] = entries[-1]["_id"]
+        self.apply_realtime_entries(guild, entries, tail)
+        return len(entries)
+
+    def apply_realtime_entries(self, guild, entries, tail):
+        """
+        Adds the counts of rawinfo entries to the heatmaps of guild,
+        entries of days that were already analyzed are skipped
+        tail["accounts"] maps the dates to an AccountIndex of the
+        accounts seen so far on that day. Accounts only reacting or
+        replied to before they are seen count in the remainder row until
+        the daily run
+        tail["cutoff"] is the last analyzed day. The daily run only
+        advances it to days that are over, so it is read again only for
+        entries of earlier days than today that are after it
+        Returns the number of updated heatmap documents
+        """
+        _, heatmap_c = self.realtime_models(guild, tail)
+        accounts = tail["accounts"]
+        if "cutoff" not in tail:
+            tail["cutoff"] = get_realtime_cutoff(heatmap_c)
+        cutoff_str = "" if tail["cutoff"] is None else tail["cutoff"].strftime("%Y-%m-%d")
+
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        if any(cutoff_str < x["datetime"][:10] < today_str for x in entries):
+            tail["cutoff"] = get_realtime_cutoff(heatmap_c)
+            cutoff_str = "" if tail["cutoff"] is None else tail["cutoff"].strftime("%Y-%m-%d")
+
+        day_entries = {}
+        late = 0
+        for entry in entries:
+            if entry["datetime"][:10] > cutoff_str:
+                day_entries.setdefault(entry["datetime"][:10], []).append(entry)
+            else:
+                late += 1
+        if late > 0:
+            logging.info(f"Skipped {late} entries of analyzed days in {guild}")
+        for date in [x for x in accounts if x <= cutoff_str]:
+            del accounts[date]
+
+        heatmap_docs = []
+        for date, entries in day_entries.items():
+            heatmap_docs.extend(iter_heatmap_docs(
+                entries, day_accounts=accounts.setdefault(date, AccountIndex([]))))
+        if not self.testing:
+            heatmap_c.apply_deltas(heatmap_docs)
+        return len(heatmap_docs)
+
+    def analysis_heatmap_day(self, entries, heatmap_writer, rollup_writer=None):
+        """
+        Creates and stores the heatmap data of one day of rawinfo entries,
+        and its rollups if rollup_writer is given
+        """
+        rollups = []
+        for heatmap_dict in iter_heatmap_docs(entries, rollups=rollups):
+            if not self.testing:
+                heatmap_writer.insert(heatmap_dict)
+        if not self.testing and rollup_writer is not None:
+            for rollup_dict in rollups:
+                rollup_writer.insert(rollup_dict)
+
+    def analysis_heatmap_parallel(self, day_entries, heatmap_writer, rollup_writer=None):
+        """
+        Computes chunks of self.chunk_days days in self.day_workers
+        processes and stores the results in day order
+        At most two chunks per worker are in flight, so the fetched
+        range is never held in memory as a whole
+        """
+        executor = ProcessPoolExecutor(max_workers=self.day_workers,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        with executor:
+            pending = deque()
+            for last_day, chunk in chunk_day_entries(day_entries, self.chunk_days):
+                future = executor.submit(compute_heatmap_chunk, chunk) if len(chunk) > 0 else None
+                pending.append((last_day, future))
+                if len(pending) >= 2 * self.day_workers:
+                    last_day, future = pending.popleft()
+                    self.store_heatmap_chunk(last_day, None if future is None else future.result(),
+                                             heatmap_writer, rollup_writer)
+            while len(pending) > 0:
+                last_day, future = pending.popleft()
+                self.store_heatmap_chunk(last_day, None if future is None else future.result(),
+                                         heatmap_writer, rollup_writer)
+
+    def analysis_heatmap_pipeline(self, day_entries, heatmap_writer, rollup_writer=None):
+        """
+        Runs the chunks of self.chunk_days days through run_pipeline:
+        the next chunks are fetched while one is computed, in
+        self.day_workers processes if more than one, and earlier ones
+        are written. At most self.prefetch fetched chunks wait
+        The PipelineStats are kept in self.pipeline_stats
+        """
+        if self.day_workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.day_workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+        else:
+            executor = ThreadPoolExecutor(max_workers=1)
+
+        def store(last_day, chunk_result):
+            self.store_heatmap_chunk(last_day, chunk_result, heatmap_writer, rollup_writer)
+
+        with executor:
+            self.pipeline_stats = run_pipeline(chunk_day_entries(day_entries, self.chunk_days),
+                                               compute_heatmap_chunk, store, executor,
+                                               self.prefetch, self.day_workers)
 
-# get guildId from command, if not given return None
-# python ./analyzer.py guildId
+    def store_heatmap_chunk(self, last_day, chunk_result, heatmap_writer, rollup_writer=None):
+        """
+        Stores the heatmap documents of a chunk computed by
+        compute_heatmap_chunk, None for chunks without entries, and its
+        rollups if rollup_writer is given, unless testing, and marks the
+        chunk's days as written
+        """
+        heatmap_docs, rollups = ([], []) if chunk_result is None else chunk_result
+        if not self.testing:
+            for heatmap_dict in heatmap_docs:
+                heatmap_writer.insert(heatmap_dict)
+            if rollup_writer is not None:
+                for rollup_dict in rollups:
+                    rollup_writer.insert(rollup_dict)
+        heatmap_writer.mark(last_day)
+
+
+def iter_heatmap_docs(entries, day_accounts=None, rollups=None):
+    """
+    Yields the heatmap documents of one day of rawinfo entries
+
+    Only the rows of accounts with at least one action are read from
+    the DayActivity count arrays, so the cost scales with the active
+    accounts instead of all accounts of the day
+    day_accounts is an AccountIndex with the accounts of earlier entries
+    of the same day, they keep their own row when they only react or
+    are replied to in entries. It is extended with the new accounts
+    The rollup documents of the day, see rollup_docs, are appended to
+    the list rollups if given
+    """
+    prepared_list = []
+    # accounts of the day in order of appearance
+    if day_accounts is None:
+        day_accounts = AccountIndex([])
+
+    for entry in entries:
+        entry["user_mentions"] = entry["user_mentions"][0].split(",")
+
+        prepared_list.append(
+            {
+                # .strftime('%Y-%m-%d %H:%M'),
+                "datetime": entry["datetime"],
+                "channel": entry["channelId"],
+                "author": entry["author"],
+                "replied_user": entry["replied_user"],
+                "user_mentions": entry["user_mentions"],
+                "reactions": entry["reactions"],
+                "thread": entry["thread"],
+                "mess_type": entry["type"],
+            }
+        )
+        if entry["author"]:
+            day_accounts.add(entry["author"])
+
+        if entry["user_mentions"] != None:
+            for account in entry["user_mentions"]:
+                if account:
+                    day_accounts.add(account)
+
+    account_list = day_accounts.acc_names
+
+    # activity_hourly_objects appends "remainder", day_accounts is kept as is
+    warnings, all_day_activity_obj = activity_hourly_objects(prepared_list, acc_names=list(account_list))
+    if rollups is not None:
+        rollups.extend(rollup_docs(all_day_activity_obj))
+    # Parsing the activity_hourly into the dictionary
+    for heatmap in all_day_activity_obj:
+        for i in heatmap.active_rows(ACTION_FIELDS).tolist():
+            heatmap_dict = {}
+            heatmap_dict["date"] = heatmap.date[0]
+            heatmap_dict["channelId"] = heatmap.channel[0]
+            heatmap_dict["thr_messages"] = heatmap.thr_messages[i].tolist()
+            heatmap_dict["lone_messages"] = heatmap.lone_messages[i].tolist()
+            heatmap_dict["replier"] = heatmap.replier[i].tolist()
+            heatmap_dict["replied"] = heatmap.replied[i].tolist()
+            heatmap_dict["mentioner"] = heatmap.mentioner[i].tolist()
+            heatmap_dict["mentioned"] = heatmap.mentioned[i].tolist()
+            heatmap_dict["reacter"] = heatmap.reacter[i].tolist()
+            heatmap_dict["reacted"] = heatmap.reacted[i].tolist()
+            heatmap_dict["reacted_per_acc"] = store_counts_dict(heatmap.reacted_per_acc.get(i))
+            heatmap_dict["mentioner_per_acc"] = store_counts_dict(heatmap.mentioner_per_acc.get(i))
+            heatmap_dict["replied_per_acc"] = store_counts_dict(heatmap.replied_per_acc.get(i))
+            heatmap_dict["account_name"] = heatmap.acc_names[i]
+            yield heatmap_dict
+
+def get_realtime_cutoff(heatmap_c):
+    """
+    Returns the last day whose heatmaps are written by the daily
+    analysis, None if the guild was not analyzed yet
+    """
+    cutoff = heatmap_c.get_watermark()
+    if cutoff is None:
+        cutoff = heatmap_c.get_last_date()
+    return cutoff
+
+def rollup_docs(all_day_activity_obj):
+    """
+    Returns the rollup documents of DayActivity objects: the hourly
+    totals over all accounts of the ACTION_FIELDS per date and channel,
+    and per date for the whole guild (channelId None), each with the
+    number of accounts that have a heatmap
+    """
+    day_totals = {}
+    rollups = []
+    for heatmap in all_day_activity_obj:
+        totals = heatmap.hourly_totals(ACTION_FIELDS)
+        active_rows = heatmap.active_rows(ACTION_FIELDS).tolist()
+        rollups.append(rollup_dict(heatmap.date[0], heatmap.channel[0], totals, len(active_rows)))
+
+        day_total, day_accounts = day_totals.setdefault(heatmap.date[0], ({}, set()))
+        for field, counts in totals.items():
+            day_total[field] = day_total[field] + counts if field in day_total else counts
+        day_accounts.update(heatmap.acc_names[i] for i in active_rows)
+
+    for date, (totals, accounts) in day_totals.items():
+        rollups.append(rollup_dict(date, None, totals, len(accounts)))
+    return rollups
+
+def rollup_dict(date, channel, totals, active_accounts):
+    rollup = {"date": date, "channelId": channel}
+    for field in ACTION_FIELDS:
+        rollup[field] = totals[field].tolist()
+    rollup["active_accounts"] = active_accounts
+    return rollup
+
+def compute_heatmap_chunk(chunk):
+    """
+    Computes the heatmap documents of a chunk of days in a day worker
+    chunk is a list with the rawinfo entries of each day
+    Returns the documents and the rollup documents
+    """
+    heatmap_docs = []
+    rollups = []
+    for entries in chunk:
+        heatmap_docs.extend(iter_heatmap_docs(entries, rollups=rollups))
+    return heatmap_docs, rollups
+
+def chunk_day_entries(day_entries, chunk_days):
+    """
+    Groups (day, entries) tuples into (last_day, chunk) tuples, chunk
+    is a list with the entries of at most chunk_days days, days without
+    entries are left out
+    """
+    chunk = []
+    last_day = None
+    for i, (day, entries) in enumerate(day_entries):
+        last_day = day
+        if len(entries) > 0:
+            chunk.append(entries)
+        if (i + 1) % chunk_days == 0:
+            yield last_day, chunk
+            chunk = []
+            last_day = None
+    if last_day is not None:
+        yield last_day, chunk
+
+# get guildId and options from command, guildId is None if not given
+# python ./analyzer.py [guildId] [--backfill] [--migrate] [--batch-size N] [--workers N]
+#                       [--day-workers N] [--chunk-days N] [--max-days N]
+#                       [--daemon] [--poll-interval S] [--pool-size N]
+#                       [--compressors zstd,snappy] [--read-preference MODE]
+#                       [--pipeline] [--prefetch N]
 
 
 class AccountCounts:
@@ -223,12 +699,74 @@ class AccountCounts:
     def asdict(self):
         return {'account': self.account, 'count': self.counts},
 
-def getGuildFromCmd():
-    args = sys.argv
-    guildId = None
-    if len(args) == 2:
-        guildId = args[1]
-    return guildId
+def run_guild_worker(options, guild, client_factory=None):
+    """
+    Analyzes one guild in a pool worker with its own database client
+    """
+    analyzer = RnDaoAnalyzer()
+    analyzer.set_database_info(**options["db_info"])
+    for key, value in options["settings"].items():
+        setattr(analyzer, key, value)
+
+    if client_factory is None:
+        analyzer.database_connect()
+    else:
+        analyzer.db_client = client_factory()
+
+    try:
+        return analyzer.run_guild(guild)
+    finally:
+        if client_factory is None:
+            analyzer.db_client.close()
+
+def log_guild_summary(results):
+    """
+    Logs a table with the time spent and the status per guild
+    """
+    if len(results) == 0:
+        return
+    width = max(len("Guild"), max(len(str(x["guild"])) for x in results))
+    lines = [f"{'Guild':<{width}}  {'Time (s)':>10}  Status"]
+    for result in results:
+        lines.append(f"{str(result['guild']):<{width}}  {result['seconds']:>10.2f}  {result['status']}")
+    lines.append(f"{'Total':<{width}}  {sum(x['seconds'] for x in results):>10.2f}")
+    logging.info("Guild summary\n" + "\n".join(lines))
+
+def getArgsFromCmd():
+    parser = argparse.ArgumentParser(description="RnDAO heatmap analyzer")
+    parser.add_argument("guildId", nargs="?", default=None,
+                        help="analyze only this guild (default: all connected guilds)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="stream the whole date range with one cursor instead of one query per day")
+    parser.add_argument("--migrate", action="store_true",
+                        help="add and index the created_at date field in rawinfos (opt-in migration)")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="number of heatmap documents per bulk insert (default: 1000)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of guilds analyzed in parallel (default: 1)")
+    parser.add_argument("--pool", choices=["process", "thread"], default="process",
+                        help="worker pool type for --workers (default: process)")
+    parser.add_argument("--day-workers", type=int, default=1,
+                        help="number of processes computing the days of one guild (default: 1)")
+    parser.add_argument("--chunk-days", type=int, default=7,
+                        help="number of days per chunk for --day-workers (default: 7)")
+    parser.add_argument("--max-days", type=int, default=None,
+                        help="analyze at most N days per run, later runs resume from the checkpoint")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="fetch, compute and write the chunks of --chunk-days days concurrently")
+    parser.add_argument("--prefetch", type=int, default=2,
+                        help="number of chunks fetched ahead with --pipeline (default: 2)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="after the analysis, keep the heatmaps of the current day up to date")
+    parser.add_argument("--poll-interval", type=float, default=5,
+                        help="seconds between polls of rawinfos when change streams are unavailable (default: 5)")
+    parser.add_argument("--pool-size", type=int, default=100,
+                        help="maximum number of connections in the client pool (default: 100)")
+    parser.add_argument("--compressors", type=lambda x: x.split(","), default=None,
+                        help="comma separated wire protocol compressors, e.g. zstd,snappy (default: none)")
+    parser.add_argument("--read-preference", choices=list(READ_PREFERENCES), default="primary",
+                        help="read preference of the rawinfos reads (default: primary)")
+    return parser.parse_args()
 
 def store_counts_obj(counts_dict):
 
@@ -245,16 +783,8 @@ def store_counts_obj(counts_dict):
 
 def store_counts_dict(counts_dict):
 
-    # make empty result array
-    obj_array = []
-
-    # for each account
-    for acc in counts_dict.keys():
-
-        # make dict and store in array
-        obj_array.append(AccountCounts(acc, counts_dict[acc]).asdict())
-
-    return obj_array
+    # one (dict,) per account, the same shape as AccountCounts.asdict()
+    return [({'account': acc, 'count': count},) for acc, count in counts_dict.items()]
 
 
 if __name__ == "__main__":
@@ -274,6 +804,22 @@ if __name__ == "__main__":
         db_user=user,
         db_port=port
     )
-    guildId = getGuildFromCmd()
+    args = getArgsFromCmd()
+    analyzer.backfill = args.backfill
+    analyzer.migrate = args.migrate
+    analyzer.batch_size = args.batch_size
+    analyzer.workers = args.workers
+    analyzer.pool = args.pool
+    analyzer.day_workers = args.day_workers
+    analyzer.chunk_days = args.chunk_days
+    analyzer.max_days = args.max_days
+    analyzer.pipeline = args.pipeline
+    analyzer.prefetch = args.prefetch
+    analyzer.poll_interval = args.poll_interval
+    analyzer.pool_size = args.pool_size
+    analyzer.compressors = args.compressors
+    analyzer.read_preference = args.read_preference
     analyzer.database_connect()
-    analyzer.run_once(guildId)
+    analyzer.run_once(args.guildId)
+    if args.daemon:
+        analyzer.run_daemon(args.guildId)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import logging
+import time
+
+from pymongo import MongoClient, ReadPreference
+
+# read preferences by their connection string name
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+class ConnectionManager():
+    """
+    Shares one MongoClient, and so one connection pool, between all
+    models of a run
+    The database and collection names are listed once and cached for
+    catalog_ttl seconds, the models created through model() take the
+    presence of their collection from this cache instead of listing
+    the collections of their database again
+    Analytic reads (rawinfos) can be sent to secondaries with
+    read_preference, the other models read from the primary
+    """
+
+    def __init__(self, connection_string=None, client=None, max_pool_size=100,
+                 min_pool_size=0, compressors=None, read_preference="primary",
+                 catalog_ttl=60):
+        if read_preference not in READ_PREFERENCES:
+            raise ValueError(
+                f"Unknown read preference {read_preference}, expected one of {list(READ_PREFERENCES)}")
+        self.connection_string = connection_string
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        # e.g. ["zstd", "snappy"], the server picks the first it supports
+        # pymongo skips the ones whose python module is not installed
+        self.compressors = compressors
+        self.read_preference = read_preference
+        self.catalog_ttl = catalog_ttl
+        self.client = client
+        # (time listed, names) of the database names and per database
+        # of the collection names
+        self.database_catalog = None
+        self.collection_catalogs = {}
+        # number of listings sent to the server
+        self.catalog_requests = 0
+
+    def connect(self):
+        """
+        Creates the client if it does not exist yet and returns it
+        """
+        if self.client is None:
+            options = {}
+            if self.compressors:
+                options["compressors"] = ",".join(self.compressors)
+            self.client = MongoClient(self.connection_string,
+                                      maxPoolSize=self.max_pool_size,
+                                      minPoolSize=self.min_pool_size,
+                                      serverSelectionTimeoutMS=10000,
+                                      connectTimeoutMS=200000,
+                                      **options)
+            logging.info(
+                f"Connected with a pool of {self.max_pool_size} connections, "
+                f"compressors {self.compressors}, analytic reads from {self.read_preference}")
+        return self.client
+
+    def close(self):
+        """
+        Closes the client and forgets the cached catalogs
+        """
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.invalidate()
+
+    def invalidate(self, database_name=None):
+        """
+        Forgets the cached catalogs, only the collection names of
+        database_name if given
+        """
+        if database_name is None:
+            self.database_catalog = None
+            self.collection_catalogs = {}
+        else:
+            self.collection_catalogs.pop(database_name, None)
+
+    def _fresh(self, entry):
+        return entry is not None and time.monotonic() - entry[0] < self.catalog_ttl
+
+    def database_names(self, refresh=False):
+        """
+        Returns the names of the databases, listed at most once per
+        catalog_ttl seconds unless refresh
+        """
+        if refresh or not self._fresh(self.database_catalog):
+            self.catalog_requests += 1
+            self.database_catalog = (time.monotonic(), set(self.connect().list_database_names()))
+        return self.database_catalog[1]
+
+    def collection_names(self, database_name, refresh=False):
+        """
+        Returns the names of the collections of database_name, listed at
+        most once per catalog_ttl seconds unless refresh
+        """
+        entry = self.collection_catalogs.get(database_name)
+        if refresh or not self._fresh(entry):
+            self.catalog_requests += 1
+            entry = (time.monotonic(), set(self.connect()[database_name].list_collection_names()))
+            self.collection_catalogs[database_name] = entry
+        return entry[1]
+
+    def database(self, database_name, analytic=False):
+        """
+        Returns the database database_name, with the analytic read
+        preference if analytic
+        """
+        database = self.connect()[database_name]
+        if analytic:
+            return database.with_options(read_preference=READ_PREFERENCES[self.read_preference])
+        return database
+
+    def model(self, model_class, database_name, analytic=False):
+        """
+        Creates a model_class model of database_name whose collection
+        presence is taken from the cached catalog
+        """
+        model = model_class(self.database(database_name, analytic))
+        model.exists_cache = model.collection_name in self.collection_names(database_name)
+        return model
@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 import logging
+import time
+
+import pymongo
+
+from pymongo import ReplaceOne
 
 
 class BaseModel():
@@ -12,17 +17,20 @@ class BaseModel():
         self.collection_name = collection_name
         self.database = database
         self.exists = False
+        # result of the last presence test, the collections of a
+        # database are listed once per model instead of once per insert
+        self.exists_cache = None
 
-    def collection_exists(self):
+    def collection_exists(self, refresh=False):
         """
         Collection presence test
         returns True if collection with this name exists in the
         database
+        The result is cached, refresh forces a new test
         """
-        if self.collection_name in self.database.list_collection_names():
-            return True
-        else:
-            return False
+        if self.exists_cache is None or refresh:
+            self.exists_cache = self.collection_name in self.database.list_collection_names()
+        return self.exists_cache
 
     def insert_one(self, obj_dict, create=False):
         """
@@ -38,11 +46,94 @@ class BaseModel():
                 f"Inserting guild object into the {self.collection_name} collection failed: Collection does not exist")
             return
         self.collection = self.database[self.collection_name]
-        logging.info(
+        logging.debug(
             f"Inserting guild object into the {self.collection_name} collection.")
 
         return self.collection.insert_one(obj_dict)
 
+    def insert_many(self, obj_dicts, ordered=False):
+        """
+        Inserts a list of documents into the defined collection
+        With ordered False the remaining documents are still inserted
+        when one of them fails
+        """
+        if not self.collection_exists():
+            logging.info(
+                f"Inserting {len(obj_dicts)} objects into the {self.collection_name} collection failed: Collection does not exist")
+            return
+        self.collection = self.database[self.collection_name]
+        logging.debug(
+            f"Inserting {len(obj_dicts)} objects into the {self.collection_name} collection.")
+
+        return self.collection.insert_many(obj_dicts, ordered=ordered)
+
+    def upsert_many(self, obj_dicts, key_fields, ordered=False):
+        """
+        Replaces the documents with the same key_fields values as the
+        given documents, inserting the ones that do not exist yet
+        Writing the same documents again does not create duplicates
+        """
+        if not self.collection_exists():
+            logging.info(
+                f"Upserting {len(obj_dicts)} objects into the {self.collection_name} collection failed: Collection does not exist")
+            return
+        self.collection = self.database[self.collection_name]
+        logging.debug(
+            f"Upserting {len(obj_dicts)} objects into the {self.collection_name} collection.")
+
+        return self.collection.bulk_write(
+            [ReplaceOne({key: obj_dict[key] for key in key_fields}, obj_dict, upsert=True)
+             for obj_dict in obj_dicts], ordered=ordered)
+
+    def create_unique_index(self, key_fields):
+        """
+        Creates a unique index on key_fields, if it does not exist yet,
+        which also creates the collection
+        If the collection holds duplicates (written before the index
+        existed) they are removed with remove_duplicates first, other
+        errors are raised, as the upserts would scan without the index
+        """
+        collection = self.database[self.collection_name]
+        index_name = "_1_".join(key_fields) + "_1"
+        if index_name not in collection.index_information():
+            keys = [(field, pymongo.ASCENDING) for field in key_fields]
+            try:
+                collection.create_index(keys, unique=True)
+            except pymongo.errors.DuplicateKeyError:
+                removed = self.remove_duplicates(key_fields)
+                logging.warning(
+                    f"Removed {removed} duplicates on {key_fields} from {self.database.name} | {self.collection_name}")
+                collection.create_index(keys, unique=True)
+        self.exists_cache = True
+
+    def remove_duplicates(self, key_fields, batch_size=1000):
+        """
+        Deletes all documents but the last inserted (highest _id) one of
+        each combination of key_fields values
+        Returns the number of deleted documents
+        """
+        collection = self.database[self.collection_name]
+        pipeline = [
+            {"$sort": {"_id": pymongo.ASCENDING}},
+            {"$group": {"_id": {field: "$" + field for field in key_fields},
+                        "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        duplicate_ids = []
+        for group in collection.aggregate(pipeline, allowDiskUse=True):
+            duplicate_ids.extend(group["ids"][:-1])
+
+        deleted = 0
+        for i in range(0, len(duplicate_ids), batch_size):
+            deleted += collection.delete_many({"_id": {"$in": duplicate_ids[i:i + batch_size]}}).deleted_count
+        return deleted
+
+    def bulk_writer(self, batch_size=1000, key_fields=None, on_commit=None):
+        """
+        Returns a BulkWriter that buffers documents for this collection
+        """
+        return BulkWriter(self, batch_size, key_fields, on_commit)
+
     def _create_collection_if_not_exists(self):
         """
         Creates the collection with specified name if it does not exist
@@ -59,23 +150,130 @@ class BaseModel():
             "collMod", self.collection_name, validator=self.validator)
         self.collection = self.database[self.collection_name]
         self.exists = True
+        self.exists_cache = True
 
-    def get_one(self):
+    def get_one(self, projection=None):
         """
         Gets one documents from the database,
         For testing purposes, no filtering is implemented.
+        projection limits the returned fields, all fields if None
         """
-        return self.database[self.collection_name].find_one()
+        return self.database[self.collection_name].find_one({}, projection)
 
-    def get_all(self):
+    def get_all(self, projection=None):
         """
         Gets all documents from the database
+        projection limits the returned fields, all fields if None
         """
 
-        return self.database[self.collection_name].find()
+        return self.database[self.collection_name].find({}, projection)
 
     def count(self):
         """
         Returns the number of entries in this collection
         """
         return self.database[self.collection_name].count_documents({})
+
+
+class BulkWriter():
+    """
+    Buffers documents for one model and inserts them with
+    insert_many(ordered=False) every batch_size documents, or upserts
+    them on key_fields if given
+    Used as a context manager the remaining documents are flushed
+    on exit, unless the block raised
+    mark(value) tags everything inserted so far; once those documents
+    are written on_commit(value) is called, e.g. to store a checkpoint
+    Writers of other collections added with link() are flushed with
+    every flush, so a mark covers their documents as well
+    """
+
+    def __init__(self, model, batch_size=1000, key_fields=None, on_commit=None):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.key_fields = key_fields
+        self.on_commit = on_commit
+        self.buffer = []
+        # writers flushed together with this one
+        self.linked = []
+        # last mark whose documents are not written yet
+        self.pending_mark = None
+        # statistics for the report on close
+        self.inserted = 0
+        self.flush_count = 0
+        self.flush_time = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif len(self.buffer) > 0:
+            logging.warning(
+                f"Dropped {len(self.buffer)} buffered documents for the {self.model.collection_name} collection")
+
+    def insert(self, obj_dict):
+        """
+        Adds one document to the buffer, flushes when it is full
+        """
+        self.buffer.append(obj_dict)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def link(self, writer):
+        """
+        Flushes writer whenever this writer flushes
+        """
+        self.linked.append(writer)
+
+    def buffered(self):
+        """
+        Returns the number of buffered documents, of the linked writers
+        included
+        """
+        return len(self.buffer) + sum(x.buffered() for x in self.linked)
+
+    def mark(self, value):
+        """
+        Marks the documents inserted so far with value, on_commit is
+        called with it once they are written
+        """
+        self.pending_mark = value
+        if self.buffered() == 0:
+            self._commit()
+
+    def _commit(self):
+        if self.pending_mark is not None and self.on_commit is not None:
+            self.on_commit(self.pending_mark)
+        self.pending_mark = None
+
+    def flush(self):
+        """
+        Inserts all buffered documents
+        """
+        for writer in self.linked:
+            writer.flush()
+        if len(self.buffer) == 0:
+            self._commit()
+            return
+        start_time = time.perf_counter()
+        if self.key_fields is None:
+            self.model.insert_many(self.buffer, ordered=False)
+        else:
+            self.model.upsert_many(self.buffer, self.key_fields, ordered=False)
+        self.flush_time += time.perf_counter() - start_time
+        self.flush_count += 1
+        self.inserted += len(self.buffer)
+        self.buffer = []
+        self._commit()
+
+    def close(self):
+        """
+        Flushes the remaining documents and reports the statistics
+        """
+        self.flush()
+        logging.info(
+            f"Inserted {self.inserted} documents into the {self.model.collection_name} collection "
+            f"in {self.flush_count} flushes ({self.flush_time:.2f}s, "
+            f"{self.flush_time / self.flush_count if self.flush_count > 0 else 0:.3f}s per flush)")
@@ -4,7 +4,18 @@ import pymongo
 
 from typing import TypedDict
 from datetime import datetime, timezone, timedelta
+from pymongo import UpdateOne
 from models.BaseModel import BaseModel
+from models.MetadataModel import MetadataModel
+
+# fields identifying a heatmap document, heatmaps are upserted on them
+HEATMAP_KEY_FIELDS = ["date", "channelId", "account_name"]
+# metadata key of the last day whose heatmaps are all written
+WATERMARK_KEY = "heatmaps_watermark"
+# hourly count arrays and per account lists of a heatmap document
+HOURLY_FIELDS = ["thr_messages", "lone_messages", "replier", "replied",
+                 "mentioner", "mentioned", "reacter", "reacted"]
+PER_ACC_FIELDS = ["reacted_per_acc", "mentioner_per_acc", "replied_per_acc"]
 
 
 class HeatMapModel(BaseModel):
@@ -15,6 +26,8 @@ class HeatMapModel(BaseModel):
         super().__init__(
             collection_name="heatmaps",
             database=database)
+        # checkpoint of the analysis
+        self.metadata = MetadataModel(database)
         self.validator = {
             "$jsonSchema": {
                 "bsonType": "object",
@@ -140,12 +153,86 @@ class HeatMapModel(BaseModel):
             }
         }
 
+    def get_watermark(self):
+        """
+        Gets the last day whose heatmaps were all written, None if the
+        analysis did not store a checkpoint yet
+        """
+        date_str = self.metadata.get_value(WATERMARK_KEY)
+        if date_str is None:
+            return None
+        return datetime.strptime(date_str, "%Y-%m-%d")
+
+    def set_watermark(self, day):
+        """
+        Stores day as the last day whose heatmaps are all written
+        """
+        self.metadata.set_value(WATERMARK_KEY, day.strftime("%Y-%m-%d"))
+
+    def create_key_index(self):
+        """
+        Creates the unique index on HEATMAP_KEY_FIELDS used by the
+        upserts, if it does not exist yet
+        Duplicate heatmaps are removed first, see create_unique_index
+        """
+        self.create_unique_index(HEATMAP_KEY_FIELDS)
+
+    def apply_deltas(self, heatmap_docs):
+        """
+        Adds the counts of heatmap_docs to the stored documents with the
+        same HEATMAP_KEY_FIELDS values with $inc, per account entries are
+        appended. Missing documents are created first with zero counts
+        and marked provisional, until the daily analysis rewrites the day
+        Returns the BulkWriteResult, None if there is nothing to apply
+        """
+        operations = []
+        for heatmap_dict in heatmap_docs:
+            key = {field: heatmap_dict[field] for field in HEATMAP_KEY_FIELDS}
+            empty = {field: [0] * 24 for field in HOURLY_FIELDS}
+            empty.update({field: [] for field in PER_ACC_FIELDS})
+            empty["provisional"] = True
+            operations.append(UpdateOne(key, {"$setOnInsert": empty}, upsert=True))
+
+            update = {}
+            increments = {f"{field}.{hour}": count for field in HOURLY_FIELDS
+                          for hour, count in enumerate(heatmap_dict[field]) if count != 0}
+            if len(increments) > 0:
+                update["$inc"] = increments
+            pushes = {field: {"$each": heatmap_dict[field]} for field in PER_ACC_FIELDS
+                      if len(heatmap_dict[field]) > 0}
+            if len(pushes) > 0:
+                update["$push"] = pushes
+            if len(update) > 0:
+                operations.append(UpdateOne(key, update))
+
+        if len(operations) == 0:
+            return None
+        # ordered, every document exists before its counts are added
+        return self.database[self.collection_name].bulk_write(operations, ordered=True)
+
+    def delete_provisional(self, until_day=None, after_day=None):
+        """
+        Deletes the provisional documents of the days after after_day up
+        to and including until_day, without bound if None
+        Returns the number of deleted documents
+        """
+        query = {"provisional": True}
+        if until_day is not None or after_day is not None:
+            query["date"] = {}
+        if until_day is not None:
+            query["date"]["$lte"] = until_day.strftime("%Y-%m-%d")
+        if after_day is not None:
+            query["date"]["$gt"] = after_day.strftime("%Y-%m-%d")
+        return self.database[self.collection_name].delete_many(query).deleted_count
+
     def get_last_date(self):
         """
-        Gets the date of the last document
+        Gets the date of the last document, provisional documents are
+        not taken into account
         """
         try:
-            date_str = self.database[self.collection_name].find().sort(
+            date_str = self.database[self.collection_name].find(
+                {"provisional": {"$ne": True}}, {"date": 1}).sort(
                 [("date", pymongo.DESCENDING)]).limit(1)[0]["date"]
             date_obj = datetime.strptime(date_str, "%Y-%m-%d")
 
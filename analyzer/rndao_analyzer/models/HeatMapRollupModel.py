@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import logging
+
+from models.BaseModel import BaseModel
+from models.HeatMapModel import HOURLY_FIELDS
+
+# fields identifying a rollup document, channelId is None for the
+# totals of the whole guild
+ROLLUP_KEY_FIELDS = ["date", "channelId"]
+
+
+class HeatMapRollupModel(BaseModel):
+    """
+    Hourly totals of the heatmaps over all accounts, per channel and
+    day and per day for the whole guild, so that guild wide charts
+    read one document per day instead of every account's heatmap
+    """
+
+    def __init__(self, database=None):
+        if database is None:
+            logging.exception("Database does not exist.")
+            raise Exception("Database should not be None")
+        super().__init__(
+            collection_name="heatmaprollups",
+            database=database)
+        hourly = {
+            "bsonType": "array",
+            "items": {
+                "bsonType": "int"
+            }
+        }
+        self.validator = {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ROLLUP_KEY_FIELDS,
+                "properties": {
+                    "date": {
+                        "bsonType": "string",
+                    },
+                    "channelId": {
+                        "bsonType": ["string", "null"],
+                    },
+                    "active_accounts": {
+                        "bsonType": "int",
+                    },
+                    **{field: hourly for field in HOURLY_FIELDS}
+                }
+            }
+        }
+
+    def create_key_index(self):
+        """
+        Creates the unique index on ROLLUP_KEY_FIELDS used by the
+        upserts, which also creates the collection
+        """
+        self.create_unique_index(ROLLUP_KEY_FIELDS)
+
+    def get_range(self, start_date, end_date, channel=None):
+        """
+        Gets the rollups of the days from start_date up to and including
+        end_date in date order, of the whole guild if channel is None
+        """
+        return list(self.database[self.collection_name].find(
+            {"date": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")},
+             "channelId": channel}, {"_id": 0}).sort("date", 1))
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import logging
+
+from datetime import datetime
+from models.BaseModel import BaseModel
+
+
+class MetadataModel(BaseModel):
+    """
+    Small key/value collection in the guild database in which the
+    analyzer keeps per guild state between runs
+    """
+
+    def __init__(self, database=None):
+        if database is None:
+            logging.exception("Database does not exist.")
+            raise Exception("Database should not be None")
+        super().__init__(
+            collection_name="analyzermetadata",
+            database=database)
+        self.validator = {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["_id", "value"],
+                "properties": {
+                    "_id": {
+                        "bsonType": "string",
+                    },
+                    "updatedAt": {
+                        "bsonType": "date",
+                    }
+                }
+            }
+        }
+
+    def get_value(self, key):
+        """
+        Returns the value stored under key, None if there is none
+        """
+        document = self.database[self.collection_name].find_one({"_id": key})
+        if document is None:
+            return None
+        return document["value"]
+
+    def set_value(self, key, value):
+        """
+        Stores value under key, replacing the previous value
+        """
+        self.database[self.collection_name].update_one(
+            {"_id": key},
+            {"$set": {"value": value, "updatedAt": datetime.utcnow()}},
+            upsert=True)
@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
 import logging
+import time
 import pymongo
 
 from typing import TypedDict
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
 from models.BaseModel import BaseModel
+from models.MetadataModel import MetadataModel
+
+# BSON date copy of the "datetime" string, added by migrate_created_at
+CREATED_AT_FIELD = "created_at"
+CREATED_AT_INDEX = CREATED_AT_FIELD + "_1"
+
+# fields read by the heatmap analysis, passed as projection so that the
+# message content is not fetched
+HEATMAP_FIELDS = ["datetime", "channelId", "author", "replied_user",
+                  "user_mentions", "reactions", "thread", "type"]
 
 
 class RawInfoModel(BaseModel):
@@ -15,6 +27,10 @@ class RawInfoModel(BaseModel):
         super().__init__(
             collection_name="rawinfos",
             database=database)
+        # None until index_information was checked once
+        self.created_at_indexed = None
+        # cache of the first and last dates
+        self.metadata = MetadataModel(database)
         self.validator = {
             "$jsonSchema": {
                 "bsonType": "object",
@@ -55,6 +71,9 @@ class RawInfoModel(BaseModel):
                     "datetime": {
                         "bsonType": "string",
                     },
+                    "created_at": {
+                        "bsonType": "date",
+                    },
                     "channelId": {
                         "bsonType": "string",
                     }
@@ -62,39 +81,253 @@ class RawInfoModel(BaseModel):
             }
         }
 
-    def get_first_date(self):
+    def get_first_date(self, use_cache=True):
         """
         Get's the date of the first document in the collection
         For determining the analysis date ranges
+        The date is cached in the metadata collection. Messages can
+        still be imported before it (a history import), so the cached
+        date is revalidated with a lookup of entries before it and
+        lowered if there are any. The lookup uses the created_at index
+        once migrated, before that it scans the datetime strings
         This is RawInfo specific method
         """
-        all_entries = self.database[self.collection_name].find(
-        )  # .sort([("created_at", pymongo.ASCENDING)]).limit(1)[0]["created_at"]
-        valid_entries = [x for x in all_entries if "datetime" in x.keys()]
+        cached_date = self.metadata.get_value("rawinfos_first_date") if use_cache else None
 
-        if len(valid_entries) == 0:
+        date_obj = self._get_edge_date(pymongo.ASCENDING, before=cached_date)
+        if date_obj is None:
+            date_obj = cached_date
+        if date_obj is None:
             raise Exception("RawInfo collection has no entries with 'datetime' value")
-        sorted_entries = sorted(valid_entries, key=lambda t: int(t["datetime"].replace("-","").replace(":","").replace(" ","")))
-        date_str = sorted_entries[0]["datetime"]
-        date_obj = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
 
+        if date_obj != cached_date:
+            self.metadata.set_value("rawinfos_first_date", date_obj)
         return date_obj
 
+    def get_last_date(self):
+        """
+        Get's the date of the last document in the collection and
+        stores it in the metadata collection
+        This is RawInfo specific method
+        """
+        date_obj = self._get_edge_date(pymongo.DESCENDING)
+        if date_obj is None:
+            raise Exception("RawInfo collection has no entries with 'datetime' value")
 
-    def get_day_entries(self, day):
+        self.metadata.set_value("rawinfos_last_date", date_obj)
+        return date_obj
+
+    def _get_edge_date(self, direction, before=None):
+        """
+        Returns the first (ASCENDING) or last (DESCENDING) date in the
+        collection with a sort+limit lookup, None if there are no dates
+        Only dates before the datetime before are considered if given
+        The "%Y-%m-%d %H:%M:%S" strings sort chronologically, the
+        created_at index is used when it exists. datetime has no index,
+        so without it the lookup is a collection scan
+        """
+        if self.has_created_at():
+            field = CREATED_AT_FIELD
+            query = {field: {"$type": "date"}}
+        else:
+            field = "datetime"
+            query = {field: {"$type": "string"}}
+            if before is not None:
+                before = before.strftime("%Y-%m-%d %H:%M:%S")
+        if before is not None:
+            query[field]["$lt"] = before
+
+        entries = list(self.database[self.collection_name].find(query, {field: 1})
+                       .sort([(field, direction)]).limit(1))
+        if len(entries) == 0:
+            return None
+
+        if field == CREATED_AT_FIELD:
+            return entries[0][field]
+        return datetime.strptime(entries[0][field], "%Y-%m-%d %H:%M:%S")
+
+    def get_day_entries(self, day, projection=None):
         """
         Gets the list of entries for the stated day
+        projection limits the returned fields, all fields if None
         This is RawInfo specific method
         """
 
-        start_day = day.replace(hour=0, minute=0, second=0)
+        start_day = day.replace(hour=0, minute=0, second=0, microsecond=0)
         end_day = start_day + timedelta(days=1)
 
         logging.info(
             f"Fetching the documents {self.database.name} | {self.collection_name}: {start_day} -> {end_day}")
 
+        if self.has_created_at():
+            # indexed range scan, restored to the insertion order of the
+            # regex query below
+            entries = list(self.database[self.collection_name].find(
+                {CREATED_AT_FIELD: {'$gte': start_day, '$lt': end_day}}, projection))
+            entries.sort(key=lambda x: x["_id"])
+            return entries
+
         date_str = day.strftime("%Y-%m-%d")
 
         entries = self.database[self.collection_name].find(
-            {'datetime': {'$regex': '^' + date_str}})
+            {'datetime': {'$regex': '^' + date_str}}, projection)
         return list(entries)
+
+    def get_range_entries(self, start_day, num_days, projection=None):
+        """
+        Streams the entries of num_days consecutive days starting with
+        start_day through one sorted cursor and yields them bucketed per
+        day as (day, entries) tuples, days without entries included.
+        Within a day the entries are kept in insertion (_id) order, the
+        same order get_day_entries returns them in.
+        projection is a list of the returned fields, all fields if None
+        This is RawInfo specific method
+        """
+        days = [start_day + timedelta(days=i) for i in range(num_days)]
+        if len(days) == 0:
+            return
+
+        if self.has_created_at():
+            # day bounds as dates on the indexed field
+            field = CREATED_AT_FIELD
+            day_starts = [x.replace(hour=0, minute=0, second=0, microsecond=0) for x in days]
+            bounds = [(x, x + timedelta(days=1)) for x in day_starts]
+        else:
+            # day bounds as prefixes of the datetime string
+            field = "datetime"
+            bounds = [(x.strftime("%Y-%m-%d"), (x + timedelta(days=1)).strftime("%Y-%m-%d")) for x in days]
+
+        if projection is not None:
+            # the sort field is needed to bucket the entries
+            projection = list(projection) + [field]
+
+        logging.info(
+            f"Streaming the documents {self.database.name} | {self.collection_name}: {bounds[0][0]} -> {bounds[-1][1]}")
+
+        # sorted on field only, so the created_at index returns the order
+        # and the results stream, the _id order is restored per day. The
+        # datetime field has no index, its sort may exceed the in-memory
+        # sort limit on long ranges and is allowed to use the disk
+        cursor = self.database[self.collection_name].find(
+            {field: {'$gte': bounds[0][0], '$lt': bounds[-1][1]}}, projection,
+            allow_disk_use=(field != CREATED_AT_FIELD)
+        ).sort([(field, pymongo.ASCENDING)])
+
+        fetch_time = 0
+        num_docs = 0
+        entry = None
+        for day, (lower, upper) in zip(days, bounds):
+            entries = []
+
+            start_time = time.perf_counter()
+            if entry is None:
+                entry = next(cursor, None)
+            while entry is not None and entry[field] < upper:
+                # strings that fall between two days would not match the
+                # per day regex either
+                if field == CREATED_AT_FIELD or entry[field].startswith(lower):
+                    entries.append(entry)
+                entry = next(cursor, None)
+            fetch_time += time.perf_counter() - start_time
+
+            num_docs += len(entries)
+            entries.sort(key=lambda x: x["_id"])
+            yield day, entries
+
+        logging.info(
+            f"Streamed {num_docs} documents from {self.database.name} | {self.collection_name} "
+            f"in {fetch_time:.2f}s ({num_docs / fetch_time if fetch_time > 0 else 0:.0f} docs/s)")
+
+    def get_latest_id(self):
+        """
+        Returns the _id of the last inserted entry, None if the
+        collection is empty
+        """
+        entries = list(self.database[self.collection_name].find({}, {"_id": 1})
+                       .sort([("_id", pymongo.DESCENDING)]).limit(1))
+        if len(entries) == 0:
+            return None
+        return entries[0]["_id"]
+
+    def get_entries_after(self, last_id, projection=None, limit=0):
+        """
+        Gets the entries inserted after the entry with _id last_id, all
+        entries if None, in insertion (_id) order
+        At most limit entries are returned, all of them if 0
+        Polling stand-in for watch_inserts
+        """
+        query = {} if last_id is None else {"_id": {"$gt": last_id}}
+        return list(self.database[self.collection_name].find(query, projection)
+                    .sort([("_id", pymongo.ASCENDING)]).limit(limit))
+
+    def watch_inserts(self, projection=None):
+        """
+        Opens a change stream on the entries inserted from now on, the
+        inserted entries are the "fullDocument" of its events
+        projection is a list of the returned entry fields, all fields
+        if None
+        Returns None if the server does not support change streams
+        (a standalone mongod), get_entries_after is polled instead
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        if projection is not None:
+            fields = ["fullDocument._id"] + ["fullDocument." + x for x in projection]
+            pipeline.append({"$project": dict.fromkeys(["operationType"] + fields, 1)})
+        try:
+            return self.database[self.collection_name].watch(pipeline)
+        except pymongo.errors.PyMongoError as e:
+            logging.warning(
+                f"Change streams are unavailable for {self.database.name} | {self.collection_name}: {e}")
+            return None
+
+    def has_created_at(self):
+        """
+        Returns True if the migration to the indexed created_at field
+        was completed for this collection
+        """
+        if self.created_at_indexed is None:
+            self.created_at_indexed = CREATED_AT_INDEX in \
+                self.database[self.collection_name].index_information()
+        return self.created_at_indexed
+
+    def migrate_created_at(self, batch_size=1000):
+        """
+        Adds the BSON date field created_at, parsed from the datetime
+        string, to every document that does not have it yet and creates
+        the index on it. Opt-in, once the index exists the day windows
+        are fetched with indexed range queries instead of regex scans.
+        Rerunning it only touches the documents inserted since, these
+        are found through the index (missing fields are indexed as null)
+        Returns the number of migrated documents
+        """
+        collection = self.database[self.collection_name]
+
+        logging.info(
+            f"Migrating {self.database.name} | {self.collection_name} to the '{CREATED_AT_FIELD}' field")
+
+        migrated = 0
+        failed = 0
+        batch = []
+        for entry in collection.find({CREATED_AT_FIELD: None, "datetime": {"$type": "string"}},
+                                     {"datetime": 1}):
+            try:
+                date_obj = datetime.strptime(entry["datetime"], "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                failed += 1
+                continue
+            batch.append(UpdateOne({"_id": entry["_id"]}, {"$set": {CREATED_AT_FIELD: date_obj}}))
+            if len(batch) >= batch_size:
+                migrated += collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if len(batch) > 0:
+            migrated += collection.bulk_write(batch, ordered=False).modified_count
+
+        if not self.has_created_at():
+            collection.create_index([(CREATED_AT_FIELD, pymongo.ASCENDING)])
+            self.created_at_indexed = True
+            # the first date is looked up on created_at from now on
+            self.metadata.set_value("rawinfos_first_date", None)
+
+        logging.info(
+            f"Migrated {migrated} documents, {failed} documents with unparsable 'datetime' skipped")
+        return migrated
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import asyncio
+import logging
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# marks the end of the items in the stage queues
+DONE = object()
+
+
+class PipelineStats:
+    """
+    Time spent and items handled per stage of run_pipeline and the
+    depths of the queues between the stages
+    The utilization of a stage is its busy time over the wall time
+    of the pipeline: a fetch stage near 1 with a compute stage well
+    below it means the run is I/O bound, more prefetch does not help
+    """
+
+    STAGES = ("fetch", "compute", "store")
+    QUEUES = ("fetched", "computed")
+
+    # define constructor
+    def __init__(self):
+
+        self.busy = dict.fromkeys(self.STAGES, 0.0)     # seconds per stage
+        self.items = dict.fromkeys(self.STAGES, 0)      # items per stage
+        # per queue: number of samples, sum and maximum of the depths,
+        # sampled whenever an item is put
+        self.depth_samples = dict.fromkeys(self.QUEUES, 0)
+        self.depth_sum = dict.fromkeys(self.QUEUES, 0)
+        self.depth_max = dict.fromkeys(self.QUEUES, 0)
+        self.wall_time = 0.0
+
+    def add_busy(self, stage, seconds):
+        self.busy[stage] += seconds
+        self.items[stage] += 1
+
+    def sample_depth(self, queue_name, queue):
+        depth = queue.qsize()
+        self.depth_samples[queue_name] += 1
+        self.depth_sum[queue_name] += depth
+        self.depth_max[queue_name] = max(self.depth_max[queue_name], depth)
+
+    def utilization(self, stage):
+        return self.busy[stage] / self.wall_time if self.wall_time > 0 else 0
+
+    def mean_depth(self, queue_name):
+        samples = self.depth_samples[queue_name]
+        return self.depth_sum[queue_name] / samples if samples > 0 else 0
+
+    def summary(self):
+        """
+        Returns a table with the utilization per stage and the depth
+        per queue
+        """
+        lines = [f"{'Stage':<8}  {'Items':>6}  {'Busy (s)':>9}  Utilization"]
+        for stage in self.STAGES:
+            lines.append(f"{stage:<8}  {self.items[stage]:>6}  {self.busy[stage]:>9.2f}  "
+                         f"{self.utilization(stage):>10.0%}")
+        for queue_name in self.QUEUES:
+            lines.append(f"queue {queue_name}: mean depth {self.mean_depth(queue_name):.1f}, "
+                         f"max depth {self.depth_max[queue_name]}")
+        lines.append(f"wall time {self.wall_time:.2f}s")
+        return "\n".join(lines)
+
+
+def timed_call(func, *args):
+    """
+    Returns func(*args) and the seconds it took, measured where it runs
+    (in a pool worker the time waiting for a free worker is left out)
+    """
+    start_time = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start_time
+
+
+def run_pipeline(items, compute, store, compute_executor, prefetch=2, compute_slots=1):
+    """
+    Runs fetch, compute and store of items as three asyncio stages
+    connected by bounded queues, so that fetching the next items, the
+    computation and the writes of earlier items overlap
+
+    Input:
+    items - iterable of (key, data) tuples, fetched lazily: every next()
+        may query the database and runs in a thread of the fetch stage
+    compute - function computing the result of one data, run in
+        compute_executor. Not called for empty data, the result is None
+    store - function store(key, result) run in a thread of the store
+        stage, in the order of items
+    compute_executor - Executor for compute, a ProcessPoolExecutor needs
+        a picklable compute
+    prefetch - number of fetched items waiting for the compute stage
+    compute_slots - number of computations in flight
+
+    Output:
+    stats - PipelineStats of the run
+    """
+    stats = PipelineStats()
+    start_time = time.perf_counter()
+    try:
+        asyncio.run(_pipeline(iter(items), compute, store, compute_executor,
+                              max(1, prefetch), max(1, compute_slots), stats))
+    finally:
+        stats.wall_time = time.perf_counter() - start_time
+    return stats
+
+
+async def _pipeline(items, compute, store, compute_executor, prefetch, compute_slots, stats):
+    loop = asyncio.get_running_loop()
+    fetched = asyncio.Queue(maxsize=prefetch)
+    computed = asyncio.Queue(maxsize=compute_slots)
+
+    async def fetch_stage(executor):
+        while True:
+            start_time = time.perf_counter()
+            item = await loop.run_in_executor(executor, next, items, DONE)
+            if item is DONE:
+                await fetched.put(DONE)
+                return
+            stats.add_busy("fetch", time.perf_counter() - start_time)
+            await fetched.put(item)
+            stats.sample_depth("fetched", fetched)
+
+    async def compute_stage():
+        while True:
+            item = await fetched.get()
+            if item is DONE:
+                await computed.put(DONE)
+                return
+            key, data = item
+            future = None
+            if len(data) > 0:
+                future = loop.run_in_executor(compute_executor, timed_call, compute, data)
+            # the store stage awaits the futures in order
+            await computed.put((key, future))
+            stats.sample_depth("computed", computed)
+
+    async def store_stage(executor):
+        while True:
+            item = await computed.get()
+            if item is DONE:
+                return
+            key, future = item
+            result = None
+            if future is not None:
+                result, seconds = await future
+                stats.add_busy("compute", seconds)
+            start_time = time.perf_counter()
+            await loop.run_in_executor(executor, store, key, result)
+            stats.add_busy("store", time.perf_counter() - start_time)
+
+    # one thread each, items are fetched and stored in order
+    with ThreadPoolExecutor(max_workers=1) as fetch_executor, \
+            ThreadPoolExecutor(max_workers=1) as store_executor:
+        tasks = [asyncio.ensure_future(x) for x in
+                 (fetch_stage(fetch_executor), compute_stage(), store_stage(store_executor))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # a failing stage stops the others instead of leaving them
+            # blocked on a queue
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
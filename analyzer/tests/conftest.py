@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+import os
+import sys
+
+# the analyzer imports its modules relative to the package directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "rndao_analyzer"))
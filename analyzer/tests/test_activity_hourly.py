@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import functools
+import json
+import os
+
+import numpy as np
+import pytest
+
+from analysis.activity_hourly import (AccountIndex, DayActivityRegistry, SparseCounts,
+                                      activity_hourly, activity_hourly_objects,
+                                      get_obj_list_i)
+from analysis.activity_hourly_vectorized import activity_hourly_vectorized
+
+# messages and ground truth of package/activity_hourly/activity_hourly_tests.py,
+# reactions converted to the comma separated strings of rawinfos
+DATA_PATH = os.path.join(os.path.dirname(__file__), "data", "test_discord_messages.json")
+ACC_NAMES = ["danielo#2815", "katerinabc#6667", "WaKa#6616", "Ene SS Rawa#0855"]
+
+GT_ALL = {
+    "lone_messages": [0,0,0,0,0,0,0,0,1,0,0,0,0,0,0,1,0,1,0,0,0,0,0,0],
+    "thr_messages": [0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,0,1,0,0,0],
+    "replier": [0,0,0,0,0,0,0,1,1,1,0,0,0,0,0,0,0,0,0,0,1,0,0,0],
+    "replied": [0,0,0,0,0,0,0,1,1,1,0,0,0,0,0,0,0,0,0,0,1,0,0,0],
+    "mentioner": [0,0,0,0,0,0,0,2,1,0,0,0,0,0,0,0,0,1,0,0,2,0,0,0],
+    "mentioned": [0,0,0,0,0,0,0,2,1,0,0,0,0,0,0,0,0,1,0,0,2,0,0,0],
+    "rep_mentioner": [0,0,0,0,0,0,0,1,1,1,0,0,0,0,0,0,0,0,0,0,1,0,0,0],
+    "rep_mentioned": [0,0,0,0,0,0,0,1,1,1,0,0,0,0,0,0,0,0,0,0,1,0,0,0],
+    "reacter": [0,0,0,0,0,0,0,3,1,1,0,0,0,0,0,1,0,0,0,0,2,0,0,0],
+    "reacted": [0,0,0,0,0,0,0,3,1,1,0,0,0,0,0,1,0,0,0,0,2,0,0,0],
+}
+GT_AUT = {
+    "lone_messages": [1,1,0,0,1],
+    "thr_messages": [0,0,1,0,0],
+    "replier": [2,0,0,1,1],
+    "replied": [1,0,2,0,1],
+    "mentioner": [4,0,0,2,0],
+    "mentioned": [1,3,1,0,1],
+    "rep_mentioner": [2,0,0,1,1],
+    "rep_mentioned": [1,0,2,0,1],
+    "reacter": [5,2,0,0,1],
+    "reacted": [2,1,1,3,1],
+}
+# warning counts 1, 3, 4, 5, 6 and 7 (the duplicate object count is not tested)
+GT_WARNINGS = {0: 2, 2: 1, 3: 1, 4: 1, 5: 2, 6: 1}
+
+
+def load_messages():
+    with open(DATA_PATH) as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize("engine", [activity_hourly, activity_hourly_vectorized,
+                                    functools.partial(activity_hourly, sparse=True),
+                                    functools.partial(activity_hourly_vectorized, sparse=True)])
+def test_ground_truth(engine):
+    warning_count, activity = engine(load_messages(), acc_names=list(ACC_NAMES))
+
+    assert len(activity) == 4
+    assert sum(x["date"][0] == "2022-07-02" for x in activity) == 2
+    assert sum(x["channel"][0] == "community-health" for x in activity) == 3
+    for field in GT_ALL:
+        total = np.sum([np.array(x[field]) for x in activity], axis=0)
+        assert np.sum(total, 0).tolist() == GT_ALL[field], field
+        assert np.sum(total, 1).tolist() == GT_AUT[field], field
+    for i, count in GT_WARNINGS.items():
+        assert warning_count[i] == count
+
+
+def test_warnings_logged_once(caplog):
+    with caplog.at_level("WARNING"):
+        warning_count, _ = activity_hourly(load_messages(), acc_names=list(ACC_NAMES))
+
+    assert len(caplog.records) == 1
+    assert warning_count == [2, 0, 1, 1, 1, 2, 1]
+    assert warning_count.samples[0] == ["Other_user#0145"]
+    assert len(warning_count.samples[5]) <= warning_count.max_samples
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_vectorized_matches_loop_engine(sparse):
+    acc_names = list(ACC_NAMES)
+    expected = activity_hourly(load_messages(), acc_names=list(ACC_NAMES))
+    result = activity_hourly_vectorized(load_messages(), acc_names=acc_names, sparse=sparse)
+
+    assert result == expected
+    assert result[0].samples == expected[0].samples
+    assert acc_names[-1] == "remainder"
+
+
+def test_account_index():
+    acc_index = AccountIndex(["a", "b", "a"])
+    assert acc_index.index("a") == 0
+    assert acc_index.add("c") == 3
+    assert acc_index.add("b") == 1
+    assert acc_index.acc_names == ["a", "b", "a", "c"]
+    with pytest.raises(ValueError):
+        acc_index.index("d")
+
+
+def test_sparse_counts_match_dense():
+    dense = activity_hourly(load_messages(), acc_names=list(ACC_NAMES), sparse=False)
+    sparse = activity_hourly(load_messages(), acc_names=list(ACC_NAMES), sparse=True)
+    assert sparse == dense
+
+    counts = SparseCounts(3)
+    counts[-1, 5] += 40000
+    counts[0, 23] += 1
+    assert sorted(counts.rows) == [0, 2]
+    assert counts[2, 5] == 40000
+    assert counts[1, 0] == 0
+    assert counts.tolist()[2][5] == 40000
+    assert counts.nbytes == 2 * 24 * counts.dtype().itemsize
+
+
+def make_message(date, hour, channel, author, mess_type="DEFAULT", replied_user=""):
+    return {
+        "datetime": "{} {:02d}:00:00".format(date, hour),
+        "channel": channel,
+        "author": author,
+        "replied_user": replied_user,
+        "user_mentions": [],
+        "reactions": [],
+        "thread": False,
+        "mess_type": mess_type,
+    }
+
+
+def test_day_activity_per_date_and_channel():
+    messages = [
+        make_message("2023-01-01", 1, "general", "a"),
+        make_message("2023-01-02", 2, "general", "b"),
+        make_message("2023-01-01", 3, "dev", "a"),
+        make_message("2023-01-01", 4, "general", "b", "REPLY", "a"),
+    ]
+    warnings, activity = activity_hourly(messages, acc_names=["a", "b"])
+
+    assert [(x["date"][0], x["channel"][0]) for x in activity] == [
+        ("2023-01-01", "general"), ("2023-01-02", "general"), ("2023-01-01", "dev")]
+    assert activity[0]["lone_messages"][0][1] == 1
+    assert activity[0]["replier"][1][4] == 1
+    assert activity[0]["replied"][0][4] == 1
+    assert activity[0]["replied_per_acc"] == [{"b": 1}, {}, {}]
+    assert warnings[1] == 0
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_active_rows(sparse):
+    messages = [
+        make_message("2023-01-01", 1, "general", "a"),
+        make_message("2023-01-01", 2, "general", "c", "REPLY", "a"),
+    ]
+    _, objs = activity_hourly_objects(messages, acc_names=["a", "b", "c"], sparse=sparse)
+
+    assert objs[0].active_rows().tolist() == [0, 2]
+    assert objs[0].active_rows(["replied"]).tolist() == [0]
+    assert objs[0].lone_messages[0].tolist()[1] == 1
+    assert objs[0].lone_messages[1].tolist() == [0] * 24
+
+
+def test_get_obj_list_i_warns_about_duplicates():
+    acc_names = ["a", "remainder"]
+    warning_count = [0] * 7
+    all_day_activity_obj = []
+    for _ in range(2):
+        all_day_activity_obj, _, warning_count = get_obj_list_i(
+            all_day_activity_obj, "2023-01-01", "general", acc_names, warning_count)
+    assert len(all_day_activity_obj) == 1
+
+    # a second object for the same (date, channel) added from outside
+    all_day_activity_obj.append(all_day_activity_obj[0])
+    obj_registry = DayActivityRegistry(all_day_activity_obj)
+    all_day_activity_obj, obj_list_i, warning_count = get_obj_list_i(
+        all_day_activity_obj, "2023-01-01", "general", acc_names, warning_count,
+        obj_registry=obj_registry)
+
+    assert obj_list_i == 0
+    assert warning_count[1] == 1
+    assert np.all(all_day_activity_obj[0].lone_messages == 0)
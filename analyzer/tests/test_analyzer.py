@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+import random
+from datetime import datetime, timedelta
+
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from analyzer import ACTION_FIELDS, RnDaoAnalyzer
+
+GUILD = "1234"
+ACCOUNTS = ["acc{}".format(i) for i in range(6)]
+CHANNELS = ["general", "dev"]
+
+
+def make_rawinfos(num_days=5, per_day=25, seed=0):
+    """
+    Synthetic rawinfos entries over the last num_days days, inserted in
+    a shuffled order so that insertion order differs from time order
+    """
+    rng = random.Random(seed)
+    first_day = datetime.now() - timedelta(days=num_days + 1)
+    entries = []
+    for d in range(num_days):
+        for _ in range(per_day):
+            time = first_day.replace(hour=rng.randrange(24), minute=rng.randrange(60),
+                                     second=rng.randrange(60)) + timedelta(days=d)
+            author = rng.choice(ACCOUNTS)
+            is_reply = rng.random() < 0.3
+            mentions = rng.sample(ACCOUNTS + ["outsider"], rng.randrange(3))
+            reactors = rng.sample(ACCOUNTS + ["lurker"], rng.randrange(3))
+            entries.append({
+                "datetime": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "channelId": rng.choice(CHANNELS),
+                "author": author,
+                "replied_user": rng.choice(ACCOUNTS) if is_reply else "",
+                "user_mentions": [",".join(mentions)],
+                "reactions": [",".join(reactors + [":+1:"])] if reactors else [],
+                "thread": rng.random() < 0.2,
+                "type": "REPLY" if is_reply else "DEFAULT",
+                "content": "message " * rng.randrange(1, 20),
+            })
+    rng.shuffle(entries)
+    return entries
+
+
+def run_analyzer(entries, backfill=False, migrate=False, batch_size=1000, day_workers=1,
+                 pipeline=False):
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    client[GUILD].create_collection("heatmaps")
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    analyzer.backfill = backfill
+    analyzer.migrate = migrate
+    analyzer.batch_size = batch_size
+    analyzer.day_workers = day_workers
+    analyzer.chunk_days = 2
+    analyzer.pipeline = pipeline
+    analyzer.analysis_heatmap(GUILD)
+
+    return list(client[GUILD]["heatmaps"].find({}, {"_id": 0}))
+
+
+@pytest.mark.parametrize("backfill, migrate, day_workers, pipeline",
+                         [(True, False, 1, False), (False, True, 1, False), (True, True, 1, False),
+                          (True, False, 2, False), (False, False, 1, True), (True, False, 2, True)])
+def test_heatmaps_match_day_by_day(backfill, migrate, day_workers, pipeline):
+    entries = make_rawinfos()
+
+    day_by_day = run_analyzer(entries)
+    heatmaps = run_analyzer(entries, backfill=backfill, migrate=migrate, batch_size=7,
+                            day_workers=day_workers, pipeline=pipeline)
+
+    assert len(day_by_day) > 0
+    assert heatmaps == day_by_day
+
+
+def test_migrate_created_at():
+    from models.RawInfoModel import RawInfoModel
+
+    entries = make_rawinfos(num_days=2)
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    rawinfo_c = RawInfoModel(client[GUILD])
+
+    assert not rawinfo_c.has_created_at()
+    assert rawinfo_c.migrate_created_at(batch_size=7) == len(entries)
+    assert rawinfo_c.has_created_at()
+
+    # only new entries are touched on later runs, the cached first date
+    # is kept once the index exists
+    first_date = rawinfo_c.get_first_date()
+    client[GUILD]["rawinfos"].insert_one(dict(entries[0]))
+    assert rawinfo_c.migrate_created_at() == 1
+    assert rawinfo_c.metadata.get_value("rawinfos_first_date") == first_date
+
+
+def test_first_and_last_date():
+    from models.RawInfoModel import RawInfoModel
+
+    entries = make_rawinfos(num_days=3)
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    rawinfo_c = RawInfoModel(client[GUILD])
+
+    dates = sorted(datetime.strptime(x["datetime"], "%Y-%m-%d %H:%M:%S") for x in entries)
+    assert rawinfo_c.get_first_date() == dates[0]
+    assert rawinfo_c.get_last_date() == dates[-1]
+
+    rawinfo_c.migrate_created_at()
+    assert rawinfo_c.get_first_date(use_cache=False) == dates[0]
+    assert rawinfo_c.get_last_date() == dates[-1]
+
+    # served from the metadata collection
+    client[GUILD]["rawinfos"].delete_many({})
+    assert rawinfo_c.get_first_date() == dates[0]
+
+    # older messages imported later lower the cached date
+    older = dict(entries[0])
+    older["datetime"] = (dates[0] - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    older["created_at"] = dates[0] - timedelta(days=30)
+    client[GUILD]["rawinfos"].insert_one(older)
+    assert rawinfo_c.get_first_date() == dates[0] - timedelta(days=30)
+    assert rawinfo_c.metadata.get_value("rawinfos_first_date") == dates[0] - timedelta(days=30)
+
+
+@pytest.mark.parametrize("migrate", [False, True])
+def test_projection(migrate):
+    from models.RawInfoModel import HEATMAP_FIELDS, RawInfoModel
+
+    entries = make_rawinfos(num_days=2)
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    rawinfo_c = RawInfoModel(client[GUILD])
+    if migrate:
+        rawinfo_c.migrate_created_at()
+
+    day = datetime.strptime(min(x["datetime"] for x in entries), "%Y-%m-%d %H:%M:%S")
+    full = rawinfo_c.get_day_entries(day)
+    projected = rawinfo_c.get_day_entries(day, HEATMAP_FIELDS)
+    assert len(projected) == len(full) > 0
+    assert all(set(x) <= set(HEATMAP_FIELDS) | {"_id"} for x in projected)
+    assert [x["_id"] for x in projected] == [x["_id"] for x in full]
+
+    (_, streamed), = rawinfo_c.get_range_entries(day, 1, HEATMAP_FIELDS)
+    assert [x["_id"] for x in streamed] == [x["_id"] for x in full]
+    assert all("content" not in x for x in streamed)
+
+
+def test_run_once_parallel_isolates_failures():
+    entries = make_rawinfos(num_days=2)
+    client = mongomock.MongoClient()
+    client["RnDAO"]["guilds"].insert_many([
+        {"guildId": guild, "isDisconnected": False} for guild in ["g1", "g2", "broken"]])
+    for guild in ["g1", "g2", "broken"]:
+        client[guild]["rawinfos"].insert_many([dict(x) for x in entries])
+        if guild != "broken":
+            # missing heatmaps collection makes the analysis raise
+            client[guild].create_collection("heatmaps")
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    analyzer.workers = 2
+    analyzer.pool = "thread"
+    analyzer.client_factory = lambda: client
+    results = analyzer.run_once(None)
+
+    status = {x["guild"]: x["status"] for x in results}
+    assert status["g1"] == "ok" and status["g2"] == "ok"
+    assert status["broken"].startswith("failed")
+    assert client["g1"]["heatmaps"].count_documents({}) > 0
+    assert list(client["g1"]["heatmaps"].find({}, {"_id": 0})) == \
+        list(client["g2"]["heatmaps"].find({}, {"_id": 0}))
+
+
+def test_backfill_in_slices_resumes_from_watermark():
+    from models.HeatMapModel import HeatMapModel
+
+    entries = make_rawinfos(num_days=5)
+    expected = run_analyzer(entries)
+
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    client[GUILD].create_collection("heatmaps")
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    analyzer.max_days = 2
+    analyzer.batch_size = 7
+    for _ in range(3):
+        analyzer.analysis_heatmap(GUILD)
+
+    heatmaps = list(client[GUILD]["heatmaps"].find({}, {"_id": 0}))
+    assert heatmaps == expected
+
+    # after a crash the checkpoint is behind the written heatmaps,
+    # rewriting those days does not duplicate them
+    heatmap_c = HeatMapModel(client[GUILD])
+    watermark = heatmap_c.get_watermark()
+    heatmap_c.set_watermark(watermark - timedelta(days=3))
+    analyzer.max_days = None
+    analyzer.analysis_heatmap(GUILD)
+
+    assert client[GUILD]["heatmaps"].count_documents({}) == len(expected)
+    assert heatmap_c.get_watermark() == watermark
+
+
+def test_key_index_removes_duplicates():
+    from models.HeatMapModel import HEATMAP_KEY_FIELDS, HeatMapModel
+
+    expected = run_analyzer(make_rawinfos(num_days=2))
+
+    # heatmaps inserted twice by a run that crashed before the upserts
+    client = mongomock.MongoClient()
+    client[GUILD]["heatmaps"].insert_many([dict(x) for x in expected])
+    client[GUILD]["heatmaps"].insert_many([dict(x) for x in expected])
+    heatmap_c = HeatMapModel(client[GUILD])
+    heatmap_c.create_key_index()
+
+    assert list(client[GUILD]["heatmaps"].find({}, {"_id": 0})) == expected
+    with pytest.raises(pymongo.errors.DuplicateKeyError):
+        client[GUILD]["heatmaps"].insert_one({key: expected[0][key] for key in HEATMAP_KEY_FIELDS})
+
+
+@pytest.mark.parametrize("day_workers, pipeline", [(1, False), (2, False), (1, True)])
+def test_rollups_match_heatmaps(day_workers, pipeline):
+    from models.HeatMapRollupModel import HeatMapRollupModel
+
+    entries = make_rawinfos(num_days=4)
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries])
+    client[GUILD].create_collection("heatmaps")
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    analyzer.day_workers = day_workers
+    analyzer.pipeline = pipeline
+    analyzer.chunk_days = 3
+    analyzer.batch_size = 5
+    analyzer.analysis_heatmap(GUILD)
+
+    expected = {}
+    accounts = {}
+    for heatmap in client[GUILD]["heatmaps"].find():
+        for channel in [heatmap["channelId"], None]:
+            key = (heatmap["date"], channel)
+            totals = expected.setdefault(key, {x: [0] * 24 for x in ACTION_FIELDS})
+            for field in ACTION_FIELDS:
+                totals[field] = [x + y for x, y in zip(totals[field], heatmap[field])]
+            accounts.setdefault(key, set()).add(heatmap["account_name"])
+
+    rollups = list(client[GUILD]["heatmaprollups"].find({}, {"_id": 0}))
+    assert len(rollups) == len(expected)
+    for rollup in rollups:
+        key = (rollup["date"], rollup["channelId"])
+        assert {x: rollup[x] for x in ACTION_FIELDS} == expected[key]
+        assert rollup["active_accounts"] == len(accounts[key])
+
+    dates = sorted({x[0] for x in expected})
+    chart = HeatMapRollupModel(client[GUILD]).get_range(
+        datetime.strptime(dates[0], "%Y-%m-%d"), datetime.strptime(dates[-1], "%Y-%m-%d"))
+    assert [x["date"] for x in chart] == dates
+
+
+def sum_per_acc(heatmap):
+    """
+    Per account lists of a heatmap as {(field, account): count}, the
+    daemon appends one entry per delta instead of one per account
+    """
+    counts = {}
+    for field in ["reacted_per_acc", "mentioner_per_acc", "replied_per_acc"]:
+        for (item,) in heatmap[field]:
+            key = (field, item["account"])
+            counts[key] = counts.get(key, 0) + item["count"]
+    return counts
+
+
+def test_daemon_applies_deltas():
+    from models.HeatMapModel import HeatMapModel
+
+    # messages come in in time order
+    entries = sorted(make_rawinfos(num_days=3), key=lambda x: x["datetime"])
+    expected = run_analyzer(entries)
+    first_day = datetime.strptime(entries[0]["datetime"][:10], "%Y-%m-%d")
+
+    client = mongomock.MongoClient()
+    client["RnDAO"]["guilds"].insert_one({"guildId": GUILD, "isDisconnected": False})
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries[:40]])
+    client[GUILD].create_collection("heatmaps")
+    heatmap_c = HeatMapModel(client[GUILD])
+    heatmap_c.set_watermark(first_day - timedelta(days=1))
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    analyzer.change_stream = False
+    analyzer.poll_interval = 0
+    analyzer.batch_size = 20
+    analyzer.run_daemon(GUILD, max_polls=2)
+
+    # a restart rebuilds the provisional documents, then polls
+    tail = {"stream": None, "accounts": {}}
+    tail["last_id"] = analyzer.realtime_catch_up(GUILD, tail)
+    for i in range(40, len(entries), 15):
+        client[GUILD]["rawinfos"].insert_many([dict(x) for x in entries[i:i + 15]])
+        assert analyzer.realtime_poll(GUILD, tail) == len(entries[i:i + 15])
+
+    heatmaps = list(client[GUILD]["heatmaps"].find({}, {"_id": 0}))
+    assert len(heatmaps) > 0 and all(x["provisional"] for x in heatmaps)
+    assert heatmap_c.get_last_date() is None
+
+    def totals(heatmaps):
+        # accounts that react before they are seen on a day count in
+        # the remainder row, the totals per date and channel are equal
+        counts = {}
+        for heatmap in heatmaps:
+            for field in ACTION_FIELDS:
+                for hour, count in enumerate(heatmap[field]):
+                    cell = (heatmap["date"], heatmap["channelId"], field, hour)
+                    counts[cell] = counts.get(cell, 0) + count
+        return {x: y for x, y in counts.items() if y != 0}
+
+    assert totals(heatmaps) == totals(expected)
+
+    def key(x):
+        return x["date"], x["channelId"], x["account_name"]
+
+    # the daily run replaces the provisional documents
+    analyzer.analysis_heatmap(GUILD)
+    heatmaps = list(client[GUILD]["heatmaps"].find({}, {"_id": 0}))
+    assert sorted(heatmaps, key=key) == sorted(expected, key=key)
+
+    # late entries of analyzed days are left to the daily run
+    client[GUILD]["rawinfos"].insert_one(dict(entries[0]))
+    assert analyzer.realtime_poll(GUILD, tail) == 1
+    assert list(client[GUILD]["heatmaps"].find({}, {"_id": 0})) == heatmaps
+
+
+def test_daemon_keeps_cutoff(monkeypatch):
+    import analyzer as analyzer_module
+    from models.HeatMapModel import HeatMapModel
+
+    entries = make_rawinfos(num_days=2)
+    yesterday = datetime.now() - timedelta(days=1)
+    today_entries = [dict(x, datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S")) for x in entries[:10]]
+
+    client = mongomock.MongoClient()
+    client[GUILD]["rawinfos"].insert_one(dict(entries[0]))
+    client[GUILD].create_collection("heatmaps")
+    heatmap_c = HeatMapModel(client[GUILD])
+    heatmap_c.set_watermark(yesterday - timedelta(days=2))
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    tail = {"stream": None, "accounts": {}}
+    tail["last_id"] = analyzer.realtime_catch_up(GUILD, tail)
+
+    reads = []
+    cutoff = analyzer_module.get_realtime_cutoff
+    monkeypatch.setattr(analyzer_module, "get_realtime_cutoff", lambda x: reads.append(1) or cutoff(x))
+
+    # entries of today never need the watermark
+    client[GUILD]["rawinfos"].insert_many([dict(x) for x in today_entries])
+    assert analyzer.realtime_poll(GUILD, tail) == len(today_entries)
+    assert reads == []
+
+    # the daily run advanced the watermark, late entries of that day are skipped
+    heatmap_c.set_watermark(yesterday)
+    late = dict(entries[1], datetime=yesterday.strftime("%Y-%m-%d %H:%M:%S"))
+    client[GUILD]["rawinfos"].insert_one(late)
+    assert analyzer.realtime_poll(GUILD, tail) == 1
+    assert reads == [1]
+    assert tail["cutoff"] == datetime.strptime(yesterday.strftime("%Y-%m-%d"), "%Y-%m-%d")
+    assert client[GUILD]["heatmaps"].count_documents({"date": yesterday.strftime("%Y-%m-%d")}) == 0
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+import pymongo
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from analyzer import RnDaoAnalyzer
+from connector.ConnectionManager import ConnectionManager
+from models.HeatMapModel import HeatMapModel
+from models.RawInfoModel import RawInfoModel
+from test_analyzer import make_rawinfos
+
+
+class CountingClient(mongomock.MongoClient):
+    """
+    mongomock client counting the database listings
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listings = 0
+
+    def list_database_names(self):
+        self.listings += 1
+        return super().list_database_names()
+
+
+def test_catalogs_are_cached():
+    client = CountingClient()
+    client["g1"].create_collection("heatmaps")
+    connection = ConnectionManager(client=client)
+
+    for _ in range(3):
+        assert "g1" in connection.database_names()
+        assert connection.collection_names("g1") == {"heatmaps"}
+    assert client.listings == 1
+    assert connection.catalog_requests == 2
+
+    # a model takes the presence of its collection from the catalog
+    assert connection.model(HeatMapModel, "g1").collection_exists()
+    assert not connection.model(RawInfoModel, "g1").collection_exists()
+    assert connection.catalog_requests == 2
+
+    client["g2"].create_collection("rawinfos")
+    assert "g2" not in connection.database_names()
+    assert "g2" in connection.database_names(refresh=True)
+
+    # expired catalogs are listed again
+    connection.catalog_ttl = 0
+    connection.database_names()
+    assert client.listings == 3
+
+
+def test_read_preference():
+    client = mongomock.MongoClient()
+    connection = ConnectionManager(client=client, read_preference="secondaryPreferred")
+    assert connection.model(RawInfoModel, "g1", analytic=True).database.read_preference == \
+        pymongo.ReadPreference.SECONDARY_PREFERRED
+    assert connection.model(HeatMapModel, "g1").database.read_preference == \
+        pymongo.ReadPreference.PRIMARY
+
+    with pytest.raises(ValueError):
+        ConnectionManager(client=client, read_preference="secondaries")
+
+
+def test_analysis_lists_databases_once():
+    client = CountingClient()
+    client["RnDAO"]["guilds"].insert_many([
+        {"guildId": guild, "isDisconnected": False} for guild in ["g1", "g2", "missing"]])
+    for guild in ["g1", "g2"]:
+        client[guild]["rawinfos"].insert_many(make_rawinfos(num_days=2))
+        client[guild].create_collection("heatmaps")
+
+    analyzer = RnDaoAnalyzer()
+    analyzer.db_client = client
+    results = analyzer.run_once(None)
+
+    assert [x["status"] for x in results] == ["ok", "ok", "ok"]
+    assert client["g1"]["heatmaps"].count_documents({}) > 0
+    assert client.listings == 1
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pipeline import PipelineStats, run_pipeline
+
+
+def slow_items(num_items, delay):
+    for i in range(num_items):
+        time.sleep(delay)
+        yield i, [i] * (i % 3)
+
+
+def square_sum(data):
+    time.sleep(0.01)
+    return sum(x * x for x in data)
+
+
+def test_results_are_stored_in_order():
+    stored = []
+    threads = set()
+
+    def store(key, result):
+        threads.add(threading.get_ident())
+        stored.append((key, result))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stats = run_pipeline(slow_items(12, 0.01), square_sum, store, executor,
+                             prefetch=3, compute_slots=2)
+
+    # empty data is not computed, its result is None
+    assert stored == [(i, None if i % 3 == 0 else (i % 3) * i * i) for i in range(12)]
+    assert len(threads) == 1
+    assert stats.items == {"fetch": 12, "compute": 8, "store": 12}
+    assert stats.depth_max["fetched"] <= 3 and stats.depth_max["computed"] <= 2
+    assert 0 < stats.utilization("fetch") <= 1
+    # fetch and compute overlap
+    assert stats.busy["fetch"] + stats.busy["compute"] > stats.wall_time
+    assert "compute" in stats.summary()
+
+
+def test_failing_stage_stops_the_pipeline():
+    def store(key, result):
+        if key == 4:
+            raise RuntimeError("write failed")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(RuntimeError):
+            run_pipeline(slow_items(1000, 0), square_sum, store, executor)
+
+
+def test_empty_items():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stats = run_pipeline([], square_sum, None, executor)
+    assert stats.items == {"fetch": 0, "compute": 0, "store": 0}
+    assert isinstance(stats, PipelineStats)
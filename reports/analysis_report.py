@@ -111,12 +111,12 @@ def main(args):
     # make temporary directory for all thread data
 	os.mkdir(TEMP_THREAD_DIR_PATH)
     
-    # load all data from specified channels into one data file
-	data = load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH)
+    # load all data from specified channels into one message table
+	data = load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH, True)
 		
 	# load arrival data
 	if ARR_CHANNELS != None:
-		arr_data = load_csv_data(ARR_CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH)
+		arr_data = load_csv_data(ARR_CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH, True)
 		
     		
 	# # # DEFINE SLIDING WINDOW RANGE # # #
@@ -189,6 +189,19 @@ def main(args):
 	date_tick_labels = []
 	
 	
+	# # # SLIDING WINDOW NETWORKS # # #
+	
+	# determine selection range of every window
+	window_ranges = [[(start_dt + relativedelta(days=STEP_D*w_i)).strftime('%y/%m/%d %H:%M:%S'), \
+		(start_dt + relativedelta(days=STEP_D*w_i) + relativedelta(days=WINDOW_D)).strftime('%y/%m/%d %H:%M:%S')] \
+		for w_i in range(int(np.floor(last_start.days/STEP_D)+1))]
+	
+	# compute networks of consecutive windows by adding and subtracting days
+	window_networks = compute_network.compute_sliding_networks(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, \
+		window_ranges, EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING, \
+		INTERACTION_WEIGHTS, TEMP_THREAD_DIR_PATH)
+	
+	
 	# # # ACTUAL ANALYSIS # # # 
 		
 	# for every window index
@@ -237,11 +250,9 @@ def main(args):
 				
 		# # # NETWORK # # #
 	
-		# compute network for this time window
+		# obtain network for this time window
 		total_graph, men_graph, react_graph, reply_graph, thread_graph, acc_names = \
-			compute_network.compute_network(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, \
-			t_sel_range_str, EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING, \
-			INTERACTION_WEIGHTS, TEMP_THREAD_DIR_PATH)	
+			next(window_networks)
 			
 		# if random network edges should be removed or added
 		if EDGE_REM > 0 or EDGE_ADD > 0:
@@ -14,13 +14,16 @@ import shutil
 import numpy as np
 from datetime import datetime
 
+from message_table import as_message_table
+
 
 def assess_arrivals(arr_data, SEL_RANGE):
 	"""
 	Assess number of new members based on arrival data
 	
 	Input:
-	arr_data - np array : loaded contents of arrival csv file(s)
+	arr_data - MessageTable or np array : loaded contents of arrival csv
+		file(s)
 	SEL_RANGE - [str,str] : list of two strings indicating start and 
 		end time to include in analysis ('yy/mm/dd HH:MM:SS')
 		
@@ -31,6 +34,12 @@ def assess_arrivals(arr_data, SEL_RANGE):
 		server in specified period
 	"""
 	
+	# # # BUILD MESSAGE TABLE # # #
+	
+	# build columnar message table if arr_data is a loaded csv array
+	arr_data = as_message_table(arr_data)
+	
+	
 	# # # MAKE SELECTION OF MESSAGES BASED ON TIME # # #
 	
 	mess_indices = select_messages_time(arr_data, SEL_RANGE)
@@ -38,17 +47,11 @@ def assess_arrivals(arr_data, SEL_RANGE):
 	
 	# # # ASSESS NEW ARRIVALS IN TIME RANGE # # #
 	
-	# create empty result list
-	arrived_list = []
+	# select member join messages
+	join_indices = mess_indices[arr_data.type[mess_indices] == arr_data.type_code("GUILD_MEMBER_JOIN")]
 	
-	# loop over each message from main channels
-	for mess_i in mess_indices:
-		
-		# if message is member join message
-		if arr_data[mess_i,np.where(arr_data[0,:]=="Type")] == "GUILD_MEMBER_JOIN":
-			
-			# obtain account name of member that joins
-			arrived_list.append(arr_data[mess_i, np.where(arr_data[0,:]=="Author")][0][0])
+	# obtain account names of members that join
+	arrived_list = list(arr_data.accounts[arr_data.author[join_indices]])
 			
 			
 	return len(arrived_list), arrived_list
@@ -60,7 +63,8 @@ def assess_arrivals_bot(arr_data, SEL_RANGE, BOT_NAME):
 	Assess number of new members based on arrival data bot messages
 	
 	Input:
-	arr_data - np array : loaded contents of arrival csv file(s)
+	arr_data - MessageTable or np array : loaded contents of arrival csv
+		file(s)
 	SEL_RANGE - [str,str] : list of two strings indicating start and 
 		end time to include in analysis ('yy/mm/dd HH:MM:SS')
 	BOT_NAME - str : bot account name
@@ -72,6 +76,12 @@ def assess_arrivals_bot(arr_data, SEL_RANGE, BOT_NAME):
 		server in specified period
 	"""
 	
+	# # # BUILD MESSAGE TABLE # # #
+	
+	# build columnar message table if arr_data is a loaded csv array
+	arr_data = as_message_table(arr_data)
+	
+	
 	# # # MAKE SELECTION OF MESSAGES BASED ON TIME # # #
 	
 	mess_indices = select_messages_time(arr_data, SEL_RANGE)
@@ -82,14 +92,12 @@ def assess_arrivals_bot(arr_data, SEL_RANGE, BOT_NAME):
 	# create empty result list
 	arrived_list = []
 	
-	# loop over each message from main channels
-	for mess_i in mess_indices:
+	# loop over each message sent by bot
+	for mess_i in mess_indices[np.isin(arr_data.author[mess_indices], arr_data.account_codes([BOT_NAME]))]:
 		
-		# if message is sent by bot
-		if arr_data[mess_i,np.where(arr_data[0,:]=="Author")] == BOT_NAME:
-			
-			# obtain account name of member that's mentioned
-			arrived_list.append(arr_data[mess_i, np.where(arr_data[0,:]=="User_Mentions")][0][0])
+		# obtain account name(s) of member that's mentioned
+		arrived_list.append(",".join(arr_data.accounts[arr_data.mentions[ \
+			arr_data.mention_offsets[mess_i]:arr_data.mention_offsets[mess_i+1]]]))
 			
 			
 	return len(arrived_list), arrived_list
@@ -102,42 +110,15 @@ def select_messages_time(data, SEL_RANGE):
 	Makes selection of messages based on time they were sent
 	
 	Input:
-	data - np array : loaded contents of (combined) csv file(s)
+	data - MessageTable : messages of (combined) csv file(s)
 	SEL_RANGE - [str,str] : list of two strings indicating start and 
 		end time to include in analysis ('yy/mm/dd HH:MM:SS')
 	
 	Output:
-	mess_indices - [int] : list of index values for messages to be 
+	mess_indices - 1D np.array [int] : index values of messages to be 
 		considered for downstream analysis (messages sent during times
 		outside of SEL_RANGE are removed)
 	"""
-		
-	# extract message creation times
-	# mess_times = data[1:,np.where(data[0,:]=="Created_At")].astype(int)
-	mess_times = data[1:,np.where(data[0,:]=="Created_At")[0][0]]
-	
-	# convert selection range dates to time
-	sel_start = datetime.strptime(SEL_RANGE[0], '%y/%m/%d %H:%M:%S')
-	sel_end = datetime.strptime(SEL_RANGE[1], '%y/%m/%d %H:%M:%S')
-	
-	# make empty result array
-	mess_indices = np.asarray([])
-	
-	# for each message time
-	for i,t in enumerate(mess_times):
-		
-		# convert to date time format and add to list
-		# mess_date_time = datetime.fromtimestamp(t[0][0]/1000)
-		mess_date_time = datetime.strptime(t, '%d %b %Y %H:%M:%S')
-		
-		# if message was sent within specified range
-		if (mess_date_time >= sel_start) & (mess_date_time < sel_end):
-			
-			# store index of message for analysis
-			mess_indices = np.append(mess_indices, i+1)
-	
-	# change to integer array
-	mess_indices = mess_indices.astype('int')
 	
-	return mess_indices
+	return data.select_time(SEL_RANGE)
 	
@@ -16,6 +16,8 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 import compute_network
+from load_data import load_table
+from message_table import as_message_table, datetime_epoch
 
 
 # # # # # main function # # # # #
@@ -26,7 +28,8 @@ def compute_community_activity(data, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE,
 	Counts community interaction based on discord data in csv file
 	
 	Input:
-	data - np array : loaded contents of (combined) csv file(s)
+	data - MessageTable or np array : loaded contents of (combined) csv
+		file(s)
 	REMOVE_ACCOUNTS - [str] : list of account names that should be 
 		removed from the analysis
 	MERGE_ACCOUNTS - [(str,str)] : list of tuples with account names 
@@ -54,6 +57,12 @@ def compute_community_activity(data, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE,
 		*_per_account
 	"""
 	
+	# # # BUILD MESSAGE TABLE # # #
+	
+	# build columnar message table if data is a loaded csv array
+	data = as_message_table(data)
+	
+	
 	# # # MAKE SELECTION OF MESSAGES BASED ON TIME # # #
 	
 	mess_indices = compute_network.select_messages_time(data, SEL_RANGE)
@@ -61,22 +70,13 @@ def compute_community_activity(data, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE,
 	
 	# # # MAKE SELECTION OF MESSAGES BASED ON EXCLUDED AUTHORS # # #
 	
-	mess_indices, mess_authors = compute_network.exclude_specific_authors(data, mess_indices, REMOVE_ACCOUNTS)
+	mess_indices, mess_authors = data.exclude_authors(mess_indices, REMOVE_ACCOUNTS)
 	
 	
 	# # # MAKE SELECTION OF ALL ACTIVE AUTHORS # # #
-		
-	# extract emoji react authors for each message within time range (only first function output is used)
-	emoji_authors = compute_network.extract_unique_reactors(data[mess_indices,np.where(data[0,:]=="Reactions")])[0]
 	
-	# extract mentioned accounts (only first function output is used)
-	men_accounts = compute_network.extract_unique_mentioned(data[mess_indices, np.where(data[0,:]=="User_Mentions")])[0]
-	
-	# select all account names that have sent a message or emoji or are mentioned
-	all_active = set(np.unique(mess_authors)).union(set(emoji_authors).union(set(men_accounts)))
-			
-	# remove account names in REMOVE_ACCOUNTS and sort remaining accounts alphabetically
-	acc_names = np.sort(np.array(list(all_active - set(REMOVE_ACCOUNTS))))
+	# select all accounts that have sent a message or emoji or are mentioned (sorted alphabetically, without REMOVE_ACCOUNTS)
+	acc_names = data.accounts[data.active_accounts(mess_authors, mess_indices, REMOVE_ACCOUNTS)]
 	
 	
 	# # # DEFINE ANALYSIS RANGE # # #
@@ -132,31 +132,11 @@ def compute_community_activity(data, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE,
 	# for each thread file
 	for thr_file in thread_files:
 		
-		# load channel data into numpy array
-		with open(TEMP_THREAD_DIR_PATH + "/" + thr_file, 'r') as x:
-			chan_data_obj = csv.reader(x, delimiter=",")
-				
-			# add content to array in less efficient way (TEMPORARY SOLUTION UNTILL DATABASE)
-			for i, line in enumerate(chan_data_obj):
-				
-				# if line is the header
-				if i == 0:
-					
-					# extract data
-					thr_data = np.array(line)
-						
-					# extract number of columns for appending data
-					num_col = len(thr_data)
-																
-				# if the line is the right size (likely "," in messages cause errors) and not the header
-				elif len(line) == num_col and i != 0:
-							
-					# store data of line
-					thr_data = np.vstack((thr_data, np.array(line)))
+		# load thread data from cache or csv file
+		thr_data = load_table(TEMP_THREAD_DIR_PATH + "/" + thr_file, False)
 		
-			
-		# if data only contains header
-		if len(thr_data.shape) < 2:
+		# if data contains no messages
+		if len(thr_data) == 0:
 						
 			# skip this itteration
 			continue
@@ -171,7 +151,7 @@ def compute_community_activity(data, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE,
 		# # # MAKE SELECTION OF MESSAGES BASED ON EXCLUDED AUTHORS # # #
 		
 		# remove messages from accounts in REMOVE_ACCOUNTS
-		thr_mess_indices, thr_mess_authors = compute_network.exclude_specific_authors(thr_data, thr_mess_indices, REMOVE_ACCOUNTS)
+		thr_mess_indices, thr_mess_authors = thr_data.exclude_authors(thr_mess_indices, REMOVE_ACCOUNTS)
 			
 		
 		# # # ANALYSIS THREAD CHANNELS DATA   # # #			
@@ -210,187 +190,83 @@ def analyse_mess_times(mess_range, int_range, emoji_range, mess_hourly, int_hour
 	 
 	"""
 	
-	# loop over each message in mess_indices
-	for mess_i in mess_indices:
-		
-		
-		# # # CHECK FOR SPECIFIC CONTENT (OPTIONAL) # # #
-		
-		# extract content of message
-		mess_cont = data[mess_i,np.where(data[0,:]=="Content")][0]
+	# # # CHECK FOR SPECIFIC CONTENT (OPTIONAL) # # #
+	
+	# select messages that contain specified substring (or None are specified)
+	mess_indices = compute_network.select_substring(data, mess_indices, MESS_SUBSTRING)
+	
+	
+	# # # ASSESS DATE AND TIME # # #
+	
+	# extract message creation times
+	mess_times = data.created_at[mess_indices]
+	
+	# obtain day since start of analysis, weekday and hour of each message
+	days_since_start = (mess_times - datetime_epoch(start_dt)) // 86400
+	weekdays = (mess_times // 86400 + 3) % 7 # 1 Jan 1970 was a thursday
+	hours = (mess_times // 3600) % 24
+	
+	# select messages sent within hourly history range
+	store_hourly = (mess_times >= datetime_epoch(last_hourly_hist)) & (mess_times < datetime_epoch(end_dt))
+	
+	
+	# # # ASSESS MESSAGE AUTHOR # # #
+	
+	# obtain index in acc_names of every account in data
+	acc_index = compute_network.account_index(data, acc_names)
+	
+	# determine index of author in acc_names (-1 if author is not in acc_names)
+	aut_i = acc_index[data.author[mess_indices]]
+	
+	
+	# # # COUNT MENTIONS, EMOJIS AND REPLIES # # #
+	
+	# determine which messages are default messages or replies
+	is_default = data.type[mess_indices] == data.type_code("DEFAULT")
+	is_reply = data.type[mess_indices] == data.type_code("REPLY")
+	
+	# count mentions of default messages and replies (reply interactor is excluded)
+	men_rows = compute_network.mention_edges(data, mess_indices, acc_index)[0]
+	n_men = np.bincount(men_rows[(is_default | is_reply)[men_rows]], minlength=len(mess_indices))
+	
+	# count emoji reactions to default messages and replies
+	react_rows = compute_network.reaction_edges(data, mess_indices, acc_index, EMOJI_TYPES)[0]
+	n_react = np.bincount(react_rows[(is_default | is_reply)[react_rows]], minlength=len(mess_indices))
+	
+	# count replies
+	reply_rows = compute_network.reply_edges(data, mess_indices, acc_index)[0]
+	n_reply = np.bincount(reply_rows[is_reply[reply_rows]], minlength=len(mess_indices))
+	
+	# count interactions (messages in a thread are interactions, mentions 
+	# in a thread are not)
+	if thr_bool:
+		n_int = 1 + n_react + n_reply
+	else:
+		n_int = n_men + n_react + n_reply
 		
-		# if message contains specified substring (or None are specified)
-		if (MESS_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in MESS_SUBSTRING])):
-			
-			
-			# # # ASSESS DATE AND TIME # # #
-				
-			# set STORE_HOURLY boolean to False
-			STORE_HOURLY = False
-			
-			# extract message creation time
-			#mess_time = data[mess_i,np.where(data[0,:]=="Created_At")].astype(int)
-			mess_time = data[mess_i,np.where(data[0,:]=="Created_At")[0][0]]
-						
-			# convert to date time format
-			#mess_date_time = datetime.fromtimestamp(mess_time[0][0]/1000)
-			mess_date_time = datetime.strptime(mess_time, '%d %b %Y %H:%M:%S')
-			
-			# subtract start time of analysis
-			date_since_start = mess_date_time - start_dt
-			
-			
-			# # # ASSESS MESSAGE AUTHOR # # #
-			
-			# extract author of message
-			mess_aut = data[mess_i,np.where(data[0,:]=="Author")][0]
-					
-			# determine index of author in acc_names
-			aut_i = np.where(acc_names == mess_aut)[0]
-			
-			
-			# # # COUNT MESSAGE # # #
-			
-			# add 1 to corresponding day in mess_range
-			mess_range[date_since_start.days] += 1
-					
-			# if message was sent within specified range
-			if (mess_date_time >= last_hourly_hist) & (mess_date_time < end_dt):
-				
-				# set STORE_HOURLY boolean to False
-				STORE_HOURLY = True
-					
-				# store time of message in hourly history		
-				mess_hourly[mess_date_time.weekday(), mess_date_time.hour] += 1	
-				
-				# count for author
-				mess_per_acc[aut_i] += 1
-				
-				
-			# if message was sent in thread
-			if thr_bool:
-				
-				# add interaction to corresponding day in int_range
-				int_range[date_since_start.days] += 1
-					
-				# if message was sent within specified range
-				if STORE_HOURLY:
-					
-					# store time of message in hourly history		
-					int_hourly[mess_date_time.weekday(), mess_date_time.hour] += 1	
-					
-					# count for author
-					mess_per_acc[aut_i] += 1
-					thr_per_acc[aut_i] += 1
-					int_per_acc[aut_i] += 1
-			
-			
-			# # # COUNT MENTIONS AND EMOJIS # # #
 		
-			# if message is default message
-			if data[mess_i,np.where(data[0,:]=="Type")] == "DEFAULT":
-				
-				# count mentions
-				_, n_men = compute_network.update_mention_matrix(np.zeros((len(acc_names), len(acc_names))), \
-					aut_i, data[mess_i,np.where(data[0,:]=="User_Mentions")], acc_names, True) 
-						
-				# count emoji reactions
-				_, n_react = compute_network.update_react_matrix(np.zeros((len(acc_names), len(acc_names))), \
-					aut_i, data[mess_i,np.where(data[0,:]=="Reactions")], acc_names, True, EMOJI_TYPES) 
-			
-				# if analysis is done for a thread
-				if thr_bool:
-					
-					# update result arrays
-					int_range[date_since_start.days] += n_react
-					emoji_range[date_since_start.days] += n_react
-			
-					# if results should also be included in hourly arrays
-					if STORE_HOURLY:
-					
-						# update hourly results arrays
-						int_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react	
-						emoji_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react	
-						
-						# count for author
-						emoji_per_acc[aut_i] += n_react
-						int_per_acc[aut_i] += n_react
-						men_per_acc[aut_i] += n_men
-						
-				else:
-				
-					# update result arrays
-					int_range[date_since_start.days] += n_men + n_react
-					emoji_range[date_since_start.days] += n_react
-			
-					# if results should also be included in hourly arrays
-					if STORE_HOURLY:
-					
-						# update hourly results arrays
-						int_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_men + n_react	
-						emoji_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react	
-						
-						# count for author
-						emoji_per_acc[aut_i] += n_react
-						int_per_acc[aut_i] += n_react + n_men
-						men_per_acc[aut_i] += n_men
-						
-						
-			# # # COUNT REPLIES # # #			
-						
-			# if message is reply
-			if data[mess_i,np.where(data[0,:]=="Type")] == "REPLY":
-			
-				# update reply matrix
-				_, n_reply = compute_network.update_reply_matrix(np.zeros((len(acc_names), len(acc_names))), \
-					aut_i, data[mess_i,np.where(data[0,:]=="Replied_User")][0][0], acc_names, True) 
-			
-				# update mention matrix (reply interactor is excluded)
-				_, n_men = compute_network.update_mention_matrix(np.zeros((len(acc_names), len(acc_names))), \
-					aut_i, data[mess_i,np.where(data[0,:]=="User_Mentions")], acc_names, True, data[mess_i,np.where(data[0,:]=="Replied_User")][0][0]) 
-				
-				# update emoji reaction matrix
-				_, n_react = compute_network.update_react_matrix(np.zeros((len(acc_names), len(acc_names))), \
-					aut_i, data[mess_i,np.where(data[0,:]=="Reactions")], acc_names, True, EMOJI_TYPES)
-	
-				# if analysis is not done for thread
-				if thr_bool:
-					
-					# update result arrays
-					int_range[date_since_start.days] += n_react + n_reply
-					emoji_range[date_since_start.days] += n_react
-			
-					# if results should also be included in hourly arrays
-					if STORE_HOURLY:
-					
-						# update hourly results arrays
-						int_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react + n_reply
-						emoji_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react
-						
-						# count for author
-						emoji_per_acc[aut_i] += n_react
-						int_per_acc[aut_i] += n_react + n_reply
-						men_per_acc[aut_i] += n_men
-						rep_per_acc[aut_i] += n_reply
-						
-				else:
-										
-					# update result arrays
-					int_range[date_since_start.days] += n_men + n_react + n_reply
-					emoji_range[date_since_start.days] += n_react
-			
-					# if results should also be included in hourly arrays
-					if STORE_HOURLY:
-					
-						# update hourly results arrays
-						int_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_men + n_react + n_reply
-						emoji_hourly[mess_date_time.weekday(), mess_date_time.hour] += n_react	
-						
-						# count for author
-						emoji_per_acc[aut_i] += n_react
-						int_per_acc[aut_i] += n_men + n_react + n_reply
-						men_per_acc[aut_i] += n_men
-						rep_per_acc[aut_i] += n_reply	
+	# # # COUNT MESSAGES AND INTERACTIONS # # #
+	
+	# add counts to corresponding day in range arrays
+	np.add.at(mess_range, days_since_start, 1)
+	np.add.at(int_range, days_since_start, n_int)
+	np.add.at(emoji_range, days_since_start, n_react)
+	
+	# store times of messages within hourly history range in hourly arrays
+	np.add.at(mess_hourly, (weekdays[store_hourly], hours[store_hourly]), 1)
+	np.add.at(int_hourly, (weekdays[store_hourly], hours[store_hourly]), n_int[store_hourly])
+	np.add.at(emoji_hourly, (weekdays[store_hourly], hours[store_hourly]), n_react[store_hourly])
+	
+	# select messages within hourly history range from authors in acc_names
+	store_acc = store_hourly & (aut_i >= 0)
+	
+	# count for author (messages in a thread are counted twice)
+	np.add.at(mess_per_acc, aut_i[store_acc], 2 if thr_bool else 1)
+	np.add.at(men_per_acc, aut_i[store_acc], n_men[store_acc])
+	np.add.at(rep_per_acc, aut_i[store_acc], n_reply[store_acc])
+	np.add.at(emoji_per_acc, aut_i[store_acc], n_react[store_acc])
+	np.add.at(thr_per_acc, aut_i[store_acc], 1 if thr_bool else 0)
+	np.add.at(int_per_acc, aut_i[store_acc], n_int[store_acc])
 	
 	return mess_range, int_range, emoji_range, mess_hourly, int_hourly, emoji_hourly, \
 		mess_per_acc, men_per_acc, rep_per_acc, emoji_per_acc, thr_per_acc, int_per_acc
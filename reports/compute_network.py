@@ -16,6 +16,9 @@ import networkx as nx
 import random
 from datetime import datetime
 
+from load_data import load_table
+from message_table import as_message_table, range_epochs
+
 
 # # # # # main function # # # # #
 
@@ -26,7 +29,8 @@ def compute_network(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE, \
 	Computes interaction network based on discord data in csv file
 	
 	Input:
-	data - np array : loaded contents of (combined) csv file(s)
+	data - MessageTable or np array : loaded contents of (combined) csv
+		file(s)
 	DIR - bool : whether a directed network should be constructed
 	REMOVE_ACCOUNTS - [str] : list of account names that should be 
 		removed from the analysis
@@ -56,6 +60,12 @@ def compute_network(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE, \
 	acc_names - [str] : all active accounts
 	"""
 	
+	# # # BUILD MESSAGE TABLE # # #
+	
+	# build columnar message table if data is a loaded csv array
+	data = as_message_table(data)
+	
+	
 	# # # MAKE SELECTION OF MESSAGES BASED ON TIME # # #
 	
 	mess_indices = select_messages_time(data, SEL_RANGE)
@@ -63,231 +73,205 @@ def compute_network(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGE, \
 	
 	# # # MAKE SELECTION OF MESSAGES BASED ON EXCLUDED AUTHORS # # #
 	
-	mess_indices, mess_authors = exclude_specific_authors(data, mess_indices, REMOVE_ACCOUNTS)
+	mess_indices, mess_authors = data.exclude_authors(mess_indices, REMOVE_ACCOUNTS)
 	
 	
 	# # # MAKE SELECTION OF ALL ACTIVE AUTHORS # # #
-		
-	# extract emoji react authors for each message within time range (only first function output is used)
-	emoji_authors = extract_unique_reactors(data[mess_indices,np.where(data[0,:]=="Reactions")])[0]
 	
-	# extract mentioned accounts (only first function output is used)
-	men_accounts = extract_unique_mentioned(data[mess_indices, np.where(data[0,:]=="User_Mentions")])[0]
+	# select all accounts that have sent a message or emoji or are mentioned (sorted alphabetically, without REMOVE_ACCOUNTS)
+	acc_names = data.accounts[data.active_accounts(mess_authors, mess_indices, REMOVE_ACCOUNTS)]
 	
-	# select all account names that have sent a message or emoji or are mentioned
-	all_active = set(np.unique(mess_authors)).union(set(emoji_authors).union(set(men_accounts)))
-			
-	# remove account names in REMOVE_ACCOUNTS and sort remaining accounts alphabetically
-	acc_names = np.sort(np.array(list(all_active - set(REMOVE_ACCOUNTS))))
+	# obtain index in acc_names of every account in data
+	acc_index = account_index(data, acc_names)
 		
 		
 	# # # CONSTRUCT MATRICES FOR MENTIONS, REACTIONS AND REPLIES # # #
 	
-	# create empty result matrices
-	men_mat = np.zeros((len(acc_names), len(acc_names)))
-	react_mat = np.zeros((len(acc_names), len(acc_names)))
-	reply_mat = np.zeros((len(acc_names), len(acc_names)))
+	# add mentions, reactions and replies to empty result matrices
+	men_mat, react_mat, reply_mat = [add_edges(np.zeros((len(acc_names), len(acc_names))), \
+		from_i, to_i, DIR) for from_i, to_i in interaction_edges(data, mess_indices, acc_index, \
+		EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING)]
+	
+	
+	# # # CONSTRUCT MATRIX FOR THREADS # # #
+	
+	# load messages of all threads
+	thr_tables = load_thread_tables(TEMP_THREAD_DIR_PATH)
+	
+	# compute thread interactions within SEL_RANGE
+	thread_mat = thread_matrix(acc_names, thr_tables, SEL_RANGE, REMOVE_ACCOUNTS)
+	
 	
-	# loop over each message from main channels
-	for mess_i in mess_indices:
+	# # # MERGE ACCOUNTS, SUM NETWORKS AND COUNT INTERACTIONS # # #
+	
+	return combine_networks(men_mat, react_mat, reply_mat, thread_mat, acc_names, \
+		DIR, MERGE_ACCOUNTS, INTERACTION_WEIGHTS)
+
+# # #
+
+def compute_sliding_networks(data, DIR, REMOVE_ACCOUNTS, MERGE_ACCOUNTS, SEL_RANGES, \
+	EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING, \
+	INTERACTION_WEIGHTS, TEMP_THREAD_DIR_PATH):
+	"""
+	Computes the interaction networks of a series of (overlapping) time
+	windows, giving the same results as compute_network for each window
+	
+	Input:
+	data - MessageTable or np array : loaded contents of (combined) csv
+		file(s)
+	SEL_RANGES - [[str,str]] : list of selection ranges, one per window
+		('yy/mm/dd HH:MM:SS')
+	all other inputs - see compute_network
+	
+	Output (generator):
+	for each window in SEL_RANGES the output of compute_network
 		
-		# extract author of message
-		mess_aut = data[mess_i,np.where(data[0,:]=="Author")][0]
-				
-		# determine index of author in acc_names
-		aut_i = np.where(acc_names == mess_aut)[0]
+	Notes:
+	the messages are split into blocks at the start and end times of all
+	windows (days for a sliding window with a step of one day). Mentions,
+	reactions and replies are counted once per block as edges between
+	accounts and every window adds the blocks that enter it and subtracts
+	the blocks that leave it. Thread interactions are normalized per 
+	window and are computed for every window, from thread data that is
+	loaded once
+	"""
+	
+	# # # BUILD MESSAGE TABLE # # #
+	
+	# build columnar message table if data is a loaded csv array
+	data = as_message_table(data)
+	
+	
+	# # # SPLIT MESSAGES INTO BLOCKS # # #
+	
+	# obtain start and end time of each window in seconds since epoch
+	window_epochs = np.array([range_epochs(sel_range) for sel_range in SEL_RANGES], dtype=np.int64).reshape(-1, 2)
+	
+	# obtain all start and end times as block boundaries
+	boundaries = np.unique(window_epochs)
+	
+	# obtain first and last block of each window
+	window_blocks = np.searchsorted(boundaries, window_epochs)
+	
+	# obtain first message of each block (messages are sorted by time)
+	block_starts = np.searchsorted(data.created_at, boundaries, side="left")
+	
+	
+	# # # COUNT ACTIVITY AND INTERACTIONS PER BLOCK # # #
+	
+	# obtain index of removed accounts
+	remove_codes = data.account_codes(REMOVE_ACCOUNTS)
+	
+	# index all accounts by their own index, except removed accounts
+	acc_index = np.arange(len(data.accounts))
+	acc_index[remove_codes] = -1
+	
+	# make empty result lists for active accounts and edges (per interaction type) per block
+	block_active = []
+	block_keys = [[], [], []]
+	
+	# for each block
+	for first, last in zip(block_starts[:-1], block_starts[1:]):
 		
-		# extract content of message
-		mess_cont = data[mess_i,np.where(data[0,:]=="Content")][0]
+		# select messages of block and remove messages from accounts in REMOVE_ACCOUNTS
+		mess_indices, mess_authors = data.exclude_authors(np.arange(first, last), REMOVE_ACCOUNTS)
 		
-		# if message is default message
-		if data[mess_i,np.where(data[0,:]=="Type")] == "DEFAULT":
+		# store all accounts that have sent a message or emoji or are mentioned
+		block_active.append(np.concatenate((mess_authors, data.reaction_entries(mess_indices)[1], \
+			data.mentioned_accounts(mess_indices))).astype(int))
 		
-			# if message contains specified substring (or None are specified)
-			if (MEN_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in MEN_SUBSTRING])):
-				
-				# update mention matrix
-				men_mat, _ = update_mention_matrix(men_mat, aut_i, data[mess_i,np.where(data[0,:]=="User_Mentions")], acc_names, DIR) 
-			
-			# if message contains specified substring (or None are specified)
-			if (REACT_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in REACT_SUBSTRING])):
-						
-				# update emoji reaction matrix
-				react_mat, _ = update_react_matrix(react_mat, aut_i, data[mess_i,np.where(data[0,:]=="Reactions")], acc_names, DIR, EMOJI_TYPES) 
-			
-		# if message is reply
-		if data[mess_i,np.where(data[0,:]=="Type")] == "REPLY":
+		# store mention, reaction and reply edges between all accounts as one number per edge
+		for int_i, (from_i, to_i) in enumerate(interaction_edges(data, mess_indices, acc_index, \
+			EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING)):
+			block_keys[int_i].append(from_i * len(data.accounts) + to_i)
 			
-			# if message contains specified substring (or None are specified)
-			if (REPLY_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in REPLY_SUBSTRING])):
-				
-				# update reply matrix
-				reply_mat, _ = update_reply_matrix(reply_mat, aut_i, data[mess_i,np.where(data[0,:]=="Replied_User")][0][0], acc_names, DIR) 
-			
-			# if message contains specified substring (or None are specified)
-			if (MEN_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in MEN_SUBSTRING])):
-				
-				# update mention matrix (reply interactor is excluded)
-				men_mat, _ = update_mention_matrix(men_mat, aut_i, data[mess_i,np.where(data[0,:]=="User_Mentions")], acc_names, DIR, data[mess_i,np.where(data[0,:]=="Replied_User")][0][0]) 
-				
-			# if message contains specified substring (or None are specified)
-			if (REACT_SUBSTRING == None) or (any([ss in mess_cont[0] for ss in REACT_SUBSTRING])):
-					
-				# update emoji reaction matrix
-				react_mat, _ = update_react_matrix(react_mat, aut_i, data[mess_i,np.where(data[0,:]=="Reactions")], acc_names, DIR)
+	# make empty result lists for accounts of distinct edges and edge numbers per block
+	edge_accounts = []
+	block_edges = []
 	
+	# for each interaction type
+	for keys in block_keys:
 		
-	# # # CONSTRUCT MATRIX FOR THREADS # # #
+		# number each distinct edge
+		unique_keys, edge_ids = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] + keys), return_inverse=True)
+		
+		# store accounts of each distinct edge and distinct edge of each interaction per block
+		edge_accounts.append((unique_keys // len(data.accounts), unique_keys % len(data.accounts)))
+		block_edges.append(np.split(edge_ids, np.cumsum([len(block) for block in keys])[:-1]))
 	
-	# make empty temporary result matrix
-	thread_mat = np.zeros((len(acc_names), len(acc_names)))
-			
-	# obtain all file names in thread folder
-	dir_names = os.listdir(TEMP_THREAD_DIR_PATH)
 	
-	# obtain file names of all csv files
-	thread_files = [j for j in dir_names if ".csv" in j]
+	# # # LOAD THREAD DATA # # #
 	
+	# load messages of all threads once for all windows
+	thr_tables = load_thread_tables(TEMP_THREAD_DIR_PATH)
 	
-	# for each thread file
-	for thr_file in thread_files:
-				
-		# # load thread data into numpy array
-		# with open(TEMP_THREAD_DIR_PATH + "/" + thr_file, 'r') as x:
-			# thr_data = np.array(list(csv.reader(x, delimiter=",")))
-		
+	
+	# # # SLIDE WINDOW OVER BLOCKS # # #
+	
+	# make empty activity and edge counts of current window
+	n_active = np.zeros(len(data.accounts), dtype=np.int64)
+	n_edges = [np.zeros(len(edge_accounts[int_i][0]), dtype=np.int64) for int_i in range(3)]
+	
+	# set current window to no blocks
+	win_first, win_last = 0, 0
+	
+	
+	def update_window(block_i, sign):
+		"""
+		Adds (sign = 1) or subtracts (sign = -1) the counts of a block to
+		the counts of the current window
+		"""
 		
-		# load channel data into numpy array
-		with open(TEMP_THREAD_DIR_PATH + "/" + thr_file, 'r') as x:
-			chan_data_obj = csv.reader(x, delimiter=",")
-							
-			# add content to array in less efficient way (TEMPORARY SOLUTION)
-			for i, line in enumerate(chan_data_obj):
-								
-				# if line is the header
-				if i == 0:
-					
-					# extract data
-					thr_data = np.array(line)
-						
-					# extract number of columns for appending data
-					num_col = len(thr_data)
-				
-				else:
-																
-					# if the line is the right size (likely "," in messages cause errors) and not the header
-					if len(line) == num_col and i != 0:
-							
-						# store data of line
-						thr_data = np.vstack((thr_data, np.array(line)))
-		
-					else:
-						
-						line = line[0].split(",")
-						
-						# if the line is the right size (likely "," in messages cause errors) and not the header
-						if len(line) == num_col and i != 0:
-							
-							# store data of line
-							thr_data = np.vstack((thr_data, np.array(line)))
-						
-			
-		# if data only contains one message 
-		if len(thr_data.shape) < 2:
-			
-			print("Thread had no data")
-			
-			# skip this itteration
-			continue
-			
-		# select messages within SEL_RANGE		
-		thr_mess_indices = select_messages_time(thr_data, SEL_RANGE)
-			
-		# remove messages from accounts in REMOVE_ACCOUNTS
-		thr_mess_indices, thr_mess_authors = exclude_specific_authors(thr_data, thr_mess_indices, REMOVE_ACCOUNTS)
-			
-			
-		# if data only contains one message or less
-		if len(thr_mess_indices) < 2:
-			
-			# skip this itteration
-			continue
-			
-			
-		# extract emoji react authors for each message within time range (only first function output is used)
-		thr_emoji_authors, thr_reacts_per_acc = extract_unique_reactors(thr_data[thr_mess_indices,np.where(thr_data[0,:]=="Reactions")])
+		np.add.at(n_active, block_active[block_i], sign)
+		for int_i in range(3):
+			np.add.at(n_edges[int_i], block_edges[int_i][block_i], sign)
 	
-		# extract mentioned accounts (only first function output is used)
-		thr_men_accounts, thr_mens_per_acc = extract_unique_mentioned(thr_data[thr_mess_indices, np.where(thr_data[0,:]=="User_Mentions")])
 	
-		# select all account names that have sent a message or emoji or are mentioned
-		thr_all_active = set(np.unique(thr_mess_authors)).union(set(thr_emoji_authors).union(set(thr_men_accounts)))
-			
-		# remove account names in REMOVE_ACCOUNTS and sort remaining accounts alphabetically
-		thr_acc_names = np.sort(np.array(list(thr_all_active - set(REMOVE_ACCOUNTS))))
+	# for each window
+	for w_i, sel_range in enumerate(SEL_RANGES):
 		
+		# obtain first and last (exclusive) block of window
+		first, last = window_blocks[w_i]
 		
-		# update thread matrix
-		thread_mat = update_thread_matrix(thread_mat, acc_names, thr_acc_names, \
-			thr_mess_authors, thr_reacts_per_acc, thr_emoji_authors, thr_mens_per_acc, thr_men_accounts)
+		# add blocks that enter the window before removing blocks that leave it
+		for block_i in range(win_last, last):
+			update_window(block_i, 1)
+		for block_i in range(first, win_first):
+			update_window(block_i, 1)
+		for block_i in range(win_first, first):
+			update_window(block_i, -1)
+		for block_i in range(last, win_last):
+			update_window(block_i, -1)
 			
-									
-	# # # MERGE SPECIFIED ACCOUNTS # # #
-	
-	# for each merge
-	for mer in MERGE_ACCOUNTS:
-				
-		# merge account names
-		men_mat, all_merged = merge_accounts_mat(men_mat, acc_names, mer)
-		react_mat, all_merged = merge_accounts_mat(react_mat, acc_names, mer)
-		reply_mat, all_merged = merge_accounts_mat(reply_mat, acc_names, mer)
-		thread_mat, all_merged = merge_accounts_mat(thread_mat, acc_names, mer)
+		# store current window
+		win_first, win_last = first, last
 		
-		# make mask to remove merged accounts
-		mask = np.ones_like(acc_names, dtype=bool)
-		mask[all_merged] = False
 		
-		# remove merged accounts from acc_names
-		acc_names = acc_names[mask]
-
-
-	# # # print account names in order # # #
-	
-	# # for each account name
-	# for i, name in enumerate(acc_names):
+		# # # MAKE SELECTION OF ALL ACTIVE AUTHORS # # #
 		
-		# # # split account number of name
-		# # [split_name, account_num] = name.split("#")
+		# select all accounts that are active in window (sorted alphabetically, without REMOVE_ACCOUNTS)
+		acc_codes = np.flatnonzero((n_active > 0) & (acc_index >= 0))
+		acc_names = data.accounts[acc_codes]
 		
-		# # print("{} = {}".format(i, split_name))
-		# print(name)	
+		# obtain index in acc_names of every account in data
+		win_acc_index = np.full(len(data.accounts), -1)
+		win_acc_index[acc_codes] = np.arange(len(acc_codes))
 		
-	# # # SUM DIFFERENT NETWORK TYPES AND STORE AS GRAPH # # #
-	
-	# make weighted sum of all matrices (mentions, reactions, replies and threads)
-	total_mat = INTERACTION_WEIGHTS[0] * men_mat + INTERACTION_WEIGHTS[1] \
-		* react_mat + INTERACTION_WEIGHTS[2] * reply_mat + INTERACTION_WEIGHTS[3] * thread_mat
 		
-	# store all matrices as graphs
-	men_graph = make_graph(men_mat,DIR)
-	react_graph = make_graph(react_mat,DIR)
-	reply_graph = make_graph(reply_mat,DIR)
-	thread_graph = make_graph(thread_mat,DIR)
-	total_graph = make_graph(total_mat,DIR)
-	
+		# # # CONSTRUCT MATRICES FOR MENTIONS, REACTIONS, REPLIES AND THREADS # # #
 		
-	# # # COUNT NUMBER OF INTERACTIONS PER ACCOUNT # # #
+		# add edges with interactions in window between active accounts
+		men_mat, react_mat, reply_mat = [window_matrix(len(acc_names), win_acc_index, \
+			*edge_accounts[int_i], n_edges[int_i], DIR) for int_i in range(3)]
 		
-	# count number of interactions per account for each network
-	[sum_men, in_frac_men] = in_out_dir(men_mat,DIR)
-	[sum_react, in_frac_react] = in_out_dir(react_mat,DIR)
-	[sum_reply, in_frac_reply] = in_out_dir(reply_mat,DIR)
-	[sum_thread, in_frac_thread] = in_out_dir(thread_mat,DIR)
-	[sum_total, in_frac_total] = in_out_dir(total_mat,DIR)
-			
-	return [[total_graph, sum_total, in_frac_total], [men_graph, sum_men, in_frac_men], \
-		[react_graph, sum_react, in_frac_react], [reply_graph, sum_reply, in_frac_reply], \
-		[thread_graph, sum_thread, in_frac_thread], acc_names]
+		# compute thread interactions within window
+		thread_mat = thread_matrix(acc_names, thr_tables, sel_range, REMOVE_ACCOUNTS)
+		
+		
+		# # # MERGE ACCOUNTS, SUM NETWORKS AND COUNT INTERACTIONS # # #
+		
+		yield combine_networks(men_mat, react_mat, reply_mat, thread_mat, acc_names, \
+			DIR, MERGE_ACCOUNTS, INTERACTION_WEIGHTS)
 
 
 # # # # # nested functions # # # # #
@@ -297,319 +281,441 @@ def select_messages_time(data, SEL_RANGE):
 	Makes selection of messages based on time they were sent
 	
 	Input:
-	data - np array : loaded contents of (combined) csv file(s)
+	data - MessageTable : messages of (combined) csv file(s)
 	SEL_RANGE - [str,str] : list of two strings indicating start and 
 		end time to include in analysis ('yy/mm/dd HH:MM:SS')
 	
 	Output:
-	mess_indices - [int] : list of index values for messages to be 
+	mess_indices - 1D np.array [int] : index values of messages to be 
 		considered for downstream analysis (messages sent during times
 		outside of SEL_RANGE are removed)
 	"""
 	
-	# extract message creation times
-	# mess_times = data[1:,np.where(data[0,:]=="Created_At")[0][0]].astype(int)
-	mess_times = data[1:,np.where(data[0,:]=="Created_At")[0][0]]
-		
-	# convert selection range dates to time
-	sel_start = datetime.strptime(SEL_RANGE[0], '%y/%m/%d %H:%M:%S')
-	sel_end = datetime.strptime(SEL_RANGE[1], '%y/%m/%d %H:%M:%S')
+	return data.select_time(SEL_RANGE)
 	
-	# make empty result array
-	mess_indices = np.asarray([])
+# # #
+
+def select_substring(data, mess_indices, SUBSTRING):
+	"""
+	Makes selection of messages based on their content
 	
-	# for each message time
-	for i,t in enumerate(mess_times):
-			
-		# convert to date time format and add to list
-		# mess_date_time = datetime.fromtimestamp(t/1000)
-		mess_date_time = datetime.strptime(t, '%d %b %Y %H:%M:%S')
+	Input:
+	data - MessageTable : messages of (combined) csv file(s)
+	mess_indices - 1D np.array [int] : index values of messages to be 
+		considered
+	SUBSTRING - [str] or None : only messages with a substring in this
+		list are selected (None = all messages)
 		
-		# if message was sent within specified range
-		if (mess_date_time >= sel_start) & (mess_date_time < sel_end):
-			
-			# store index of message for analysis
-			mess_indices = np.append(mess_indices, i+1) # +1 to account for header row in data
+	Output:
+	mess_indices - 1D np.array [int] : index values of messages in 
+		mess_indices that contain a substring in SUBSTRING
+	"""
 	
-	# change to integer array
-	mess_indices = mess_indices.astype('int')
+	# if no substrings are specified
+	if SUBSTRING == None:
+		return mess_indices
+		
+	# make mask for messages that contain any of the substrings
+	mask = [any([ss in data.content[mess_i] for ss in SUBSTRING]) for mess_i in mess_indices]
 	
-	return mess_indices
+	return mess_indices[np.array(mask, dtype=bool)]
 	
 # # #
 
-def exclude_specific_authors(data, mess_indices, REMOVE_ACCOUNTS):
+def account_index(data, acc_names):
 	"""
-	Makes selection of messages based authors that should be removed
+	Maps the accounts of a message table to their index in acc_names
 	
 	Input:
-	data - np array : loaded contents of (combined) csv file(s)
-	mess_indices - [int] : list of index values for messages to be 
-		considered for downstream analysis
-	REMOVE_ACCOUNTS - [str] : list of account names that should be 
-		removed from the analysis
-		
+	data - MessageTable : messages of (combined) csv file(s)
+	acc_names - [str] : all active account names
+	
 	Output:
-	mess_indices - [int] : list of index values for messages to be 
-		considered for downstream analysis (messages from authors in
-		REMOVE_ACCOUNTS are removed)
-	mess_authors - [str] : authors of all messages
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (-1 for accounts that are not in acc_names)
 	"""
 	
-	# extract message authors for each message within time range
-	mess_authors = data[mess_indices,np.where(data[0,:]=="Author")]
-	
-	# make mask for messages that were sent from accounts not in REMOVE_ACCOUNTS
-	mask = [x not in REMOVE_ACCOUNTS for x in mess_authors[0]]
+	# find accounts of data in acc_names
+	codes = data.find_accounts(acc_names)
 	
-	# select message indices that were sent within time range from accounts not in REMOVE_ACCOUNTS
-	mess_indices = mess_indices[mask]
+	# make index array
+	acc_index = np.full(len(data.accounts), -1)
+	acc_index[codes[codes >= 0]] = np.flatnonzero(codes >= 0)
 	
-	return mess_indices, mess_authors
+	return acc_index
 	
 # # #
 
-def extract_unique_reactors(react_data):
+def interaction_edges(data, mess_indices, acc_index, EMOJI_TYPES, \
+	MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING):
 	"""
-	Parses all unique account names from discord emoji reaction data
+	Lists the mention, reaction and reply interactions of messages
 	
 	Input:
-	react_data - [str] : discord emoji reaction data (from csv file)
+	data - MessageTable : messages of (combined) csv file(s)
+	mess_indices - 1D np.array [int] : index values of messages
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (see account_index)
+	EMOJI_TYPES, MEN_SUBSTRING, REACT_SUBSTRING, REPLY_SUBSTRING - see 
+		compute_network
 	
 	Output:
-	unique_acc_names - [str] : all unique account names that reacted 
-		with an emoji
-	reacts_per_acc - [float] : number of emoji reactions per account
+	[(from_i, to_i)] - [(1D np.array [int], 1D np.array [int])] : index
+		in acc_names of the accounts of each mention, reaction and reply
 	"""
 	
-	# make empty result lists
-	unique_acc_names = []
-	reacts_per_acc = []
+	# select default messages and replies
+	default_indices = mess_indices[data.type[mess_indices] == data.type_code("DEFAULT")]
+	reply_indices = mess_indices[data.type[mess_indices] == data.type_code("REPLY")]
 	
-	# for each response
-	for resp in react_data[0]:
-		
-		# split data of different emoji responses
-		resp_split = resp.split("&")
+	# obtain mentions in default messages and replies containing specified substring (or None are specified)
+	men_edges = mention_edges(data, select_substring(data, \
+		np.sort(np.concatenate((default_indices, reply_indices))), MEN_SUBSTRING), acc_index)[1:]
+	
+	# obtain emoji reactions (emoji types are only considered for default messages)
+	default_react_edges = reaction_edges(data, select_substring(data, default_indices, \
+		REACT_SUBSTRING), acc_index, EMOJI_TYPES)[1:]
+	reply_react_edges = reaction_edges(data, select_substring(data, reply_indices, \
+		REACT_SUBSTRING), acc_index)[1:]
+	react_edges = tuple(np.concatenate(acc_i) for acc_i in zip(default_react_edges, reply_react_edges))
+	
+	# obtain replies
+	replied_edges = reply_edges(data, select_substring(data, reply_indices, REPLY_SUBSTRING), acc_index)[1:]
+	
+	return [men_edges, react_edges, replied_edges]
+	
+# # #
+
+def mention_edges(data, mess_indices, acc_index):
+	"""
+	Lists the mention interactions of messages
+	
+	Input:
+	data - MessageTable : messages of (combined) csv file(s)
+	mess_indices - 1D np.array [int] : index values of messages
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (see account_index)
+	
+	Output:
+	rows - 1D np.array [int] : row in mess_indices of each interaction
+	author_i, mentioned_i - 1D np.array [int] : index in acc_names of
+		the message author and the mentioned account
 		
-		# for each emoji
-		for emoji in resp_split:
-			
-			# split different accounts that responded with emoji
-			emoji_split = emoji.split(",")
-			
-			# for each account
-			for acc in emoji_split[:-1]:
-				
-				# if account is not in result list yet
-				if not acc in unique_acc_names:
-					
-					# add account to result lists
-					unique_acc_names.append(acc)
-					reacts_per_acc.append(1)
-					
-				else:
-					
-					# find index of account in list
-					acc_i = unique_acc_names.index(acc)
-									
-					# add 1 to number of reactions per account
-					reacts_per_acc[acc_i] += 1
-					
-	return unique_acc_names, reacts_per_acc
+	Notes:
+	only accounts in acc_names are considered and mentions of the author
+	are not counted. In replies, mentioned accounts whose name is part of
+	the replied user name are not counted (reply interactor is excluded)
+	"""
+	
+	# obtain all mentions of the messages
+	rows, mentioned = data.mention_entries(mess_indices)
+	
+	# determine index of author and mentioned account in acc_names
+	author_i = acc_index[data.author[mess_indices[rows]]]
+	mentioned_i = acc_index[mentioned]
+	
+	# select mentions between different accounts in acc_names
+	valid = (author_i >= 0) & (mentioned_i >= 0) & (author_i != mentioned_i)
+	
+	# for each mention in a reply
+	for k in np.flatnonzero(valid & (data.type[mess_indices[rows]] == data.type_code("REPLY"))):
 		
+		# exclude mention if it is part of the replied user name
+		if data.accounts[mentioned[k]] in data.accounts[data.replied[mess_indices[rows[k]]]]:
+			valid[k] = False
+	
+	return rows[valid], author_i[valid], mentioned_i[valid]
+	
 # # #
 
-def extract_unique_mentioned(mention_data):
+def reaction_edges(data, mess_indices, acc_index, emoji_types=None):
 	"""
-	Parses all unique account names from discord mention data
+	Lists the emoji reaction interactions of messages
 	
 	Input:
-	mention_data - [str] : discord account mention data (from csv file)
+	data - MessageTable : messages of (combined) csv file(s)
+	mess_indices - 1D np.array [int] : index values of messages
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (see account_index)
+	emoji_types - [str] or None : list of strings indicating which emoji types to consider (None = all emojis = default)
 	
 	Output:
-	unique_acc_names - [str] : all unique account names that are
-		mentioned in a message
-	mens_per_acc - [float] : number of emoji reactions per account
+	rows - 1D np.array [int] : row in mess_indices of each interaction
+	reactor_i, author_i - 1D np.array [int] : index in acc_names of the
+		reacting account and the message author
 	"""
 	
-	# make empty result lists
-	unique_acc_names = []
-	mens_per_acc = []
+	# obtain all reactions to the messages
+	rows, reactors, emojis = data.reaction_entries(mess_indices)
+	
+	# determine index of author and reacting account in acc_names
+	author_i = acc_index[data.author[mess_indices[rows]]]
+	reactor_i = acc_index[reactors]
+	
+	# select reactions between different accounts in acc_names
+	valid = (author_i >= 0) & (reactor_i >= 0) & (author_i != reactor_i)
 	
-	# for each mention
-	for men in mention_data[0]:
+	# if emoji types are specified
+	if emoji_types != None:
 		
-		# if an account is mentioned
-		if len(men) > 0:
-			
-			# split data of different mentioned accounts
-			men_split = men.split(",")
-			
-			# for each mentioned account
-			for acc in men_split:
-			
-				# if account is not in result list yet
-				if not acc in unique_acc_names:
-					
-					# add account to result lists
-					unique_acc_names.append(acc)
-					mens_per_acc.append(1)
-						
-				else:
-						
-					# find index of account in list
-					acc_i = unique_acc_names.index(acc)
-										
-					# add 1 to number of reactions per account
-					mens_per_acc[acc_i] += 1
+		# select reactions with emoji in emoji_types
+		valid &= np.array([emoji in emoji_types for emoji in data.emojis], dtype=bool)[emojis]
 	
-	return unique_acc_names, mens_per_acc
+	return rows[valid], reactor_i[valid], author_i[valid]
+
 # # #
 
-def update_mention_matrix(mat, author_i, all_mentioned, acc_names, directed, not_valid=None):
+def reply_edges(data, mess_indices, acc_index):
 	"""
-	Updates the mention interaction matrix
+	Lists the reply interactions of messages
 	
 	Input:
-	mat - np.array : interaction matrix that needs to be updated
-	author_i - int : index of message author in acc_names
-	all_mentioned - str : all mentioned account names in a message (from csv file)
-	acc_names - [str] : all active account names 
-	directed - bool : whether a directed network should be constructed
-	not_valid - [str] or None : list of account names that should not be considered (default = None)
+	data - MessageTable : messages of (combined) csv file(s)
+	mess_indices - 1D np.array [int] : index values of replies
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (see account_index)
 	
 	Output:
-	mat - np.array: updated interaction matrix
-	n_int - int: number of interactions added to matrix
+	rows - 1D np.array [int] : row in mess_indices of each interaction
+	replied_i, author_i - 1D np.array [int] : index in acc_names of the
+		replied user and the message author
 	"""
 	
-	# set number of interactions to 0
-	n_int = 0
+	# determine index of author and replied user in acc_names
+	author_i = acc_index[data.author[mess_indices]]
+	replied_i = acc_index[data.replied[mess_indices]]
 	
-	# split interactors (comma separated)
-	mentioned_split = all_mentioned[0][0].split(",")
-
-	# for each interaction
-	for mentioned in mentioned_split:
-				
-		# if mentioned account is acc_names and not in not_valid
-		if (mentioned in acc_names) & ((not_valid == None) or (mentioned not in not_valid)): 
-									
-			# determine index of interactor in acc_names
-			mentioned_i = np.where(acc_names == mentioned)[0]
-			
-			# if the author is not the interactor
-			if author_i != mentioned_i:
-									
-				# add 1 to corresponding edge in matrix
-				if directed == False:
-					mat[max([author_i, mentioned_i]), min([author_i, mentioned_i])] += 1
-				else:
-					mat[author_i, mentioned_i] += 1
-				
-				# add 1 to number of interactions
-				n_int += 1
-				
-	return mat, n_int
+	# select replies between different accounts in acc_names
+	valid = (author_i >= 0) & (replied_i >= 0) & (author_i != replied_i)
+	
+	return np.flatnonzero(valid), replied_i[valid], author_i[valid]
 	
 # # #
 
-def update_react_matrix(mat, author_i, all_reactors, acc_names, directed, emoji_types=None):
+def add_edges(mat, from_i, to_i, directed, counts=1):
 	"""
-	Updates the reaction interaction matrix
+	Adds interactions to an interaction matrix
 	
 	Input:
 	mat - np.array : interaction matrix that needs to be updated
-	author_i - int : index of message author in acc_names
-	all_reactors - str : all accounts that reacted with an emoji and which emoji they reacted with (from csv file)
-	acc_names - [str] : all active account names 
+	from_i, to_i - 1D np.array [int] : index in acc_names of the 
+		accounts of each interaction
 	directed - bool : whether a directed network should be constructed
-	emoji_types - [str] or None : list of strings indicating which emoji types to consider (None = all emojis = default)
+	counts - int or 1D np.array [int] : number of interactions per 
+		(from_i, to_i) pair (default = 1)
 	
 	Output:
 	mat - np.array: updated interaction matrix
-	n_int - int: number of interactions added to matrix
 	"""
+	
+	# add counts to corresponding edge in matrix for each interaction
+	if directed == False:
+		np.add.at(mat, (np.maximum(from_i, to_i), np.minimum(from_i, to_i)), counts)
+	else:
+		np.add.at(mat, (from_i, to_i), counts)
 		
-	# set number of interactions to 0
-	n_int = 0
+	return mat
+	
+# # #
+
+def window_matrix(n_acc, acc_index, edge_from, edge_to, edge_counts, directed):
+	"""
+	Makes an interaction matrix from counted edges
+	
+	Input:
+	n_acc - int : number of accounts in acc_names
+	acc_index - 1D np.array [int] : index in acc_names of every account
+		in data.accounts (see account_index)
+	edge_from, edge_to - 1D np.array [int] : index in data.accounts of
+		the accounts of each edge
+	edge_counts - 1D np.array [int] : number of interactions per edge
+	directed - bool : whether a directed network should be constructed
+	
+	Output:
+	mat - np.array : interaction matrix of accounts in acc_names
+	"""
+	
+	# determine index of accounts in acc_names
+	from_i = acc_index[edge_from]
+	to_i = acc_index[edge_to]
+	
+	# select edges with interactions between accounts in acc_names
+	sel = (edge_counts > 0) & (from_i >= 0) & (to_i >= 0)
+	
+	return add_edges(np.zeros((n_acc, n_acc)), from_i[sel], to_i[sel], directed, edge_counts[sel])
+	
+# # #
+
+def load_thread_tables(TEMP_THREAD_DIR_PATH):
+	"""
+	Loads the messages of all threads
+	
+	Input:
+	TEMP_THREAD_DIR_PATH - str : path to directory with thread data
+	
+	Output:
+	thr_tables - [MessageTable] : messages of each thread that has data
+	"""
+	
+	# make empty result list
+	thr_tables = []
 	
-	# split interactors (& separated)
-	first_split = all_reactors[0][0].split("&")
+	# obtain file names of all csv files in thread folder
+	thread_files = [j for j in os.listdir(TEMP_THREAD_DIR_PATH) if ".csv" in j]
 	
-	for spl in first_split:
+	# for each thread file
+	for thr_file in thread_files:
+				
+		# load thread data from cache or csv file
+		thr_data = load_table(TEMP_THREAD_DIR_PATH + "/" + thr_file, True)
 		
-		# if spl is not empty
-		if spl:
+		# if data contains no messages
+		if len(thr_data) == 0:
 			
-			# split interactor(s) and emoji (comma separated)
-			second_split = spl.split(",")
-			emoji = second_split[-1]
-			reactors = second_split[:-1]
-				
-			for reactor in reactors:
-						
-				# if reacting account is in acc_names and reacted emoji is part of emoji_types if defined
-				if (reactor in acc_names) & ((emoji_types == None) or (emoji in emoji_types)):
-									
-					# determine index of interactor in acc_names
-					reactor_i = np.where(acc_names == reactor)[0]
-						
-					# if the author is not the interactor
-					if author_i != reactor_i:
-						
-						# add 1 to corresponding edge in matrix
-						if directed == False:
-							mat[max([author_i, reactor_i]), min([author_i, reactor_i])] += 1
-						else:
-							mat[reactor_i, author_i] += 1
-							
-						# add 1 to number of interactions
-						n_int += 1	
+			print("Thread had no data")
 			
-	return mat, n_int
-
+			# skip this itteration
+			continue
+			
+		thr_tables.append(thr_data)
+		
+	return thr_tables
+	
 # # #
 
-def update_reply_matrix(mat, author_i, replier, acc_names, directed):
+def thread_matrix(acc_names, thr_tables, SEL_RANGE, REMOVE_ACCOUNTS):
 	"""
-	Updates the reply interaction matrix
+	Computes the thread interaction matrix of a time window
 	
 	Input:
-	mat - np.array : interaction matrix that needs to be updated
-	author_i - int : index of message author in acc_names
-	replier - str : account that replied to a message (from csv file)
-	acc_names - [str] : all active account names 
-	directed - bool : whether a directed network should be constructed
+	acc_names - [str] : all active account names
+	thr_tables - [MessageTable] : messages of each thread (see 
+		load_thread_tables)
+	SEL_RANGE - [str,str] : list of two strings indicating start and 
+		end time to include in analysis ('yy/mm/dd HH:MM:SS')
+	REMOVE_ACCOUNTS - [str] : list of account names that should be 
+		removed from the analysis
 	
 	Output:
-	mat - np.array: updated interaction matrix
-	n_int - int: number of interactions added to matrix
+	thread_mat - np.array : thread interaction matrix
 	"""
 	
-	# set number of interactions to 0
-	n_int = 0
+	# make empty result matrix
+	thread_mat = np.zeros((len(acc_names), len(acc_names)))
 	
-	# determine index of interactor in acc_names
-	replier_i = np.where(acc_names == replier)[0]
+	# for each thread
+	for thr_data in thr_tables:
+		
+		# select messages within SEL_RANGE
+		thr_mess_indices = select_messages_time(thr_data, SEL_RANGE)
+		
+		# remove messages from accounts in REMOVE_ACCOUNTS
+		thr_mess_indices, thr_mess_authors = thr_data.exclude_authors(thr_mess_indices, REMOVE_ACCOUNTS)
+		
+		
+		# if data only contains one message or less
+		if len(thr_mess_indices) < 2:
 			
-	# if the author is not the interactor
-	if author_i != replier_i:
-									
-		# add 1 to corresponding edge in matrix
-		if directed == False:
-			mat[max([author_i, replier_i]), min([author_i, replier_i])] += 1
-		else:
-			mat[replier_i, author_i] += 1
+			# skip this itteration
+			continue
 			
-		# add 1 to number of interactions
-		n_int += 1
 			
-	return mat, n_int
+		# count emoji reactions per reacting account (all emoji types)
+		thr_emoji_authors, thr_reacts_per_acc = thr_data.account_counts(thr_data.reaction_entries(thr_mess_indices)[1])
+	
+		# count mentions per mentioned account
+		thr_men_accounts, thr_mens_per_acc = thr_data.account_counts(thr_data.mentioned_accounts(thr_mess_indices))
+	
+		# select all account names that have sent a message or emoji or are mentioned
+		thr_acc_names = thr_data.accounts[thr_data.active_accounts(thr_mess_authors, thr_mess_indices, REMOVE_ACCOUNTS)]
+		
+		# obtain author names of all messages
+		thr_mess_authors = thr_data.accounts[thr_mess_authors]
+		
+		
+		# update thread matrix
+		thread_mat = update_thread_matrix(thread_mat, acc_names, thr_acc_names, \
+			thr_mess_authors, thr_reacts_per_acc, thr_emoji_authors, thr_mens_per_acc, thr_men_accounts)
+			
+	return thread_mat
 	
 # # #
 
+def combine_networks(men_mat, react_mat, reply_mat, thread_mat, acc_names, \
+	DIR, MERGE_ACCOUNTS, INTERACTION_WEIGHTS):
+	"""
+	Merges accounts, sums the interaction matrices and stores them as
+	graphs
+	
+	Input:
+	men_mat, react_mat, reply_mat, thread_mat - np.array : interaction 
+		matrices of mentions, reactions, replies and threads
+	acc_names - [str] : all active account names
+	DIR, MERGE_ACCOUNTS, INTERACTION_WEIGHTS - see compute_network
+	
+	Output:
+	see compute_network
+	"""
+	
+	# # # MERGE SPECIFIED ACCOUNTS # # #
+	
+	# for each merge
+	for mer in MERGE_ACCOUNTS:
+				
+		# merge account names
+		men_mat, all_merged = merge_accounts_mat(men_mat, acc_names, mer)
+		react_mat, all_merged = merge_accounts_mat(react_mat, acc_names, mer)
+		reply_mat, all_merged = merge_accounts_mat(reply_mat, acc_names, mer)
+		thread_mat, all_merged = merge_accounts_mat(thread_mat, acc_names, mer)
+		
+		# make mask to remove merged accounts
+		mask = np.ones_like(acc_names, dtype=bool)
+		mask[all_merged] = False
+		
+		# remove merged accounts from acc_names
+		acc_names = acc_names[mask]
+
+
+	# # # print account names in order # # #
+	
+	# # for each account name
+	# for i, name in enumerate(acc_names):
+		
+		# # # split account number of name
+		# # [split_name, account_num] = name.split("#")
+		
+		# # print("{} = {}".format(i, split_name))
+		# print(name)	
+		
+	# # # SUM DIFFERENT NETWORK TYPES AND STORE AS GRAPH # # #
+	
+	# make weighted sum of all matrices (mentions, reactions, replies and threads)
+	total_mat = INTERACTION_WEIGHTS[0] * men_mat + INTERACTION_WEIGHTS[1] \
+		* react_mat + INTERACTION_WEIGHTS[2] * reply_mat + INTERACTION_WEIGHTS[3] * thread_mat
+		
+	# store all matrices as graphs
+	men_graph = make_graph(men_mat,DIR)
+	react_graph = make_graph(react_mat,DIR)
+	reply_graph = make_graph(reply_mat,DIR)
+	thread_graph = make_graph(thread_mat,DIR)
+	total_graph = make_graph(total_mat,DIR)
+	
+		
+	# # # COUNT NUMBER OF INTERACTIONS PER ACCOUNT # # #
+		
+	# count number of interactions per account for each network
+	[sum_men, in_frac_men] = in_out_dir(men_mat,DIR)
+	[sum_react, in_frac_react] = in_out_dir(react_mat,DIR)
+	[sum_reply, in_frac_reply] = in_out_dir(reply_mat,DIR)
+	[sum_thread, in_frac_thread] = in_out_dir(thread_mat,DIR)
+	[sum_total, in_frac_total] = in_out_dir(total_mat,DIR)
+			
+	return [[total_graph, sum_total, in_frac_total], [men_graph, sum_men, in_frac_men], \
+		[react_graph, sum_react, in_frac_react], [reply_graph, sum_reply, in_frac_reply], \
+		[thread_graph, sum_thread, in_frac_thread], acc_names]
+
+# # #
+
 def update_thread_matrix(mat, acc_names, thr_acc_names, thr_mess_authors, \
 	thr_reacts_per_acc, thr_emoji_authors, thr_mens_per_acc, thr_men_accounts):
 	"""
@@ -627,38 +733,10 @@ def update_thread_matrix(mat, acc_names, thr_acc_names, thr_mess_authors, \
 	# make empty temporary result matrix
 	temp_mat = np.zeros_like(mat)
 				
-	# make empty result arrays for interactions per member for all acc_names (including those not active in specific thread)
-	n_mess_mem = np.zeros(len(acc_names))
-	n_react_mem = np.zeros(len(acc_names))
-	n_men_mem = np.zeros(len(acc_names))
-		
-	# for each member
-	for i, mem in enumerate(acc_names):
-			
-		# count number of messages sent by member and store
-		n_mess_mem[i] = int((thr_mess_authors==mem).sum())
-			
-		# if member has sent at least one emoji reaction
-		if mem in thr_emoji_authors:
-				
-			# find number of reactions sent by member and store
-			n_react_mem[i] = int(thr_reacts_per_acc[thr_emoji_authors.index(mem)])
-				
-		else:
-				
-			# set number of reactions sent by member to 0
-			n_react_mem[i] = 0
-				
-		# if member is at least mentioned once
-		if mem in thr_men_accounts:
-				
-			# find number of mentions for member and store
-			n_men_mem[i] = int(thr_mens_per_acc[thr_men_accounts.index(mem)])
-				
-		else:
-				
-			# set number of reactions sent by member to 0
-			n_men_mem[i] = 0
+	# count interactions per member for all acc_names (including those not active in specific thread)
+	n_mess_mem = count_per_account(acc_names, thr_mess_authors, np.ones(len(thr_mess_authors)))
+	n_react_mem = count_per_account(acc_names, thr_emoji_authors, thr_reacts_per_acc)
+	n_men_mem = count_per_account(acc_names, thr_men_accounts, thr_mens_per_acc)
 				
 			
 	# # compute metrics to assign connections for thread mat
@@ -681,33 +759,20 @@ def update_thread_matrix(mat, acc_names, thr_acc_names, thr_mess_authors, \
 	# compute total member interactions (mentions are considered as additional member interactions)
 	total_mem_int = np.sum(n_int_mem)
 	
-	# make copy of all account names
-	copy_acc_names = acc_names
-		
-	# for each account name
-	for acc_A_i, acc_A in enumerate(acc_names):
-			
-		# remove from copy
-		copy_acc_names = np.delete(copy_acc_names, np.where(copy_acc_names==acc_A)[0])
-			
-		# for each comparison account name
-		for acc_B in copy_acc_names:
-				
-			# obtain index of acc_B in acc_names
-			acc_B_i = np.where(acc_names==acc_B)[0]
-				
-			# compute relative weight of total edge
-			rel_edge = (n_int_mem[acc_A_i] / total_mem_int) * (n_int_mem[acc_B_i] / total_mem_int)
+	# compute relative weight of total edge for every pair of accounts
+	n_frac_mem = n_int_mem / total_mem_int
+	rel_edge = np.multiply.outer(n_frac_mem, n_frac_mem)
+	
+	# select pairs (acc_A before acc_B in acc_names) with relative edge larger than 0
+	acc_A_i, acc_B_i = np.nonzero(np.triu(rel_edge > 0, 1))
+	rel_edge = rel_edge[acc_A_i, acc_B_i]
 				
-			# if relative edge is larger than 0
-			if rel_edge > 0:
-					
-				# compute ratio between activity account A compared to B
-				ratio_AB = n_int_mem[acc_A_i]/n_int_mem[acc_B_i]
+	# compute ratio between activity account A compared to B
+	ratio_AB = n_int_mem[acc_A_i]/n_int_mem[acc_B_i]
 					
-				# update matrix with activity
-				temp_mat[acc_A_i, acc_B_i] = rel_edge - (rel_edge/(ratio_AB+1)) 
-				temp_mat[acc_B_i, acc_A_i] = rel_edge/(ratio_AB+1)
+	# update matrix with activity
+	temp_mat[acc_A_i, acc_B_i] = rel_edge - (rel_edge/(ratio_AB+1)) 
+	temp_mat[acc_B_i, acc_A_i] = rel_edge/(ratio_AB+1)
 					
 	# obtain sum of all edges
 	edge_sum = np.sum(temp_mat, axis=None)
@@ -727,6 +792,37 @@ def update_thread_matrix(mat, acc_names, thr_acc_names, thr_mess_authors, \
 	
 # # #
 
+def count_per_account(acc_names, names, counts):
+	"""
+	Sums counts per account name for all acc_names
+	
+	Input:
+	acc_names - [str] : all active account names
+	names - [str] : account name of each count
+	counts - [int] : counts to sum
+	
+	Output:
+	n_per_acc - 1D np.array [float] : summed counts of each account in
+		acc_names (0 for accounts that are not in names)
+	"""
+	
+	# make empty result array
+	n_per_acc = np.zeros(len(acc_names))
+	
+	# obtain index in acc_names of every account name
+	acc_index = {name: i for i, name in enumerate(acc_names)}
+	
+	# for each name in acc_names
+	for name, count in zip(names, counts):
+		if name in acc_index:
+			
+			# add count to account
+			n_per_acc[acc_index[name]] += int(count)
+			
+	return n_per_acc
+	
+# # #
+
 def merge_accounts_mat(mat, acc_names, mer):
 	"""
 	sums the data from two or more selected account names
@@ -801,17 +897,8 @@ def make_graph(mat,directed):
 	# if matrix is directed
 	if directed == True:
 		
-		# make empty result matrix (for undirected matrix)
-		new_mat = np.zeros_like(mat)
-				
-		# for each row
-		for r in range(np.shape(mat)[0]):
-			
-			# for each column
-			for c in range(r):
-				
-				# sum (r,c) and (c,r) values and store
-				new_mat[r,c] = mat[r,c] + mat[c,r]
+		# sum (r,c) and (c,r) values and store below the diagonal (for undirected matrix)
+		new_mat = np.tril(mat + mat.T, -1)
 				
 		# turn matrix into graph	
 		graph = nx.from_numpy_array(new_mat)
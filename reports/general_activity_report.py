@@ -97,8 +97,8 @@ def main(args):
 		# make temporary directory for all thread data
 		os.mkdir(TEMP_THREAD_DIR_PATH)
 			
-		# load all data from specified channels into one data file
-		data = load_csv_data([chan], DATA_DIR_PATH, TEMP_THREAD_DIR_PATH)
+		# load all data from specified channels into one message table
+		data = load_csv_data([chan], DATA_DIR_PATH, TEMP_THREAD_DIR_PATH, True)
 						
 						
 		# # # ANALYSE ACTIVITY # # #	
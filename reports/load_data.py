@@ -10,12 +10,28 @@
 
 import os
 import csv
+import time
+import json
 import shutil
+import hashlib
 import numpy as np
 from datetime import datetime
 
+from message_table import MessageTable
 
-def load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH):
+# number of columns of the message csv files
+NUM_COLUMNS = 10
+
+# directory where the message tables parsed from csv files are cached
+# (None = always parse the csv files). The content column is stored as
+# a pickle, only load caches written by these scripts
+CACHE_DIR_PATH = "./table_cache"
+
+# version of the cache format, cached tables of other versions are parsed again
+CACHE_VERSION = 2
+
+
+def load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH, AS_TABLE=False):
 	"""
 	Merges data from different channels and combines thread data in dir
 	
@@ -26,14 +42,32 @@ def load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH):
 	DATA_DIR_PATH - str : path to directory where data is stored
 	TEMP_THREAD_DIR_PATH - str : path to directory where thread data 
 		from different channels should be combined
+	AS_TABLE - bool : whether the data should be returned as MessageTable
+		(default = False). The table of each channel is cached in 
+		CACHE_DIR_PATH (see load_table)
 		
 	Output:
-	data - np array : loaded contents of (combined) csv files
+	data - np array or MessageTable : loaded contents of (combined) csv
+		files (with the channel of every message if AS_TABLE is True)
 	all thread .csv files are stored in TEMP_THREAD_DIR_PATH
 	"""
 	
 	print("Loading data from:")
 	
+	# set start time of loading
+	load_start_time = time.perf_counter()
+	
+	# rows of all channels (header of the first channel first), stacked
+	# into one array at the end instead of once per row
+	rows = []
+	
+	# message table of each channel (if AS_TABLE is True)
+	tables = []
+	
+	# whether a channel was added as object array (see below), which
+	# makes the stacked data an object array
+	as_object = False
+	
 	# for each channel
 	for i, channel in enumerate(CHANNELS):
 		
@@ -53,104 +87,213 @@ def load_csv_data(CHANNELS, DATA_DIR_PATH, TEMP_THREAD_DIR_PATH):
 			print("ERROR more than one .csv file in {}. Only using first entry: {}".format(DATA_DIR_PATH + channel, file_name[0]))
 		
 		
-		# set error count to 0
-		error_count = 0		
-							
-		# if this is the first channel that is loaded
-		if i == 0:
-					
-			# load channel data into numpy array
-			with open(DATA_DIR_PATH + channel + "/" + file_name[0], 'r') as x:
-				
-				# # store results
-				# data = np.array(list(csv.reader(x, delimiter=",")),dtype=object)
-				
-				chan_data_obj = csv.reader(x, delimiter=",")
-				
-				# add content to array in less efficient way (TEMPORARY SOLUTION)
-				for j, line in enumerate(chan_data_obj):
-																												
-					# if the line is not the right size, split it at comma separation
-					if len(line) != 10:
-						line = line[0].split(",")
-					
-					if len(line) == 10:	
-					
-						# if this is the header	
-						if j == 0:
-						
-							# intiate data array with line
-							data = np.array(line)
-													
-						else:
+		# if there is thread data for this channel
+		if os.path.exists(DATA_DIR_PATH + channel + "/threads"):
+			
+			# obtain all file names in thread folder
+			thread_names = os.listdir(DATA_DIR_PATH + channel + "/threads")
 								
-							# add line to data array
-							data = np.vstack((data, np.array(line)))
-							
-					else:
-						
-						error_count += 1
+			# for each thread file
+			for thr_file in thread_names:
 			
+				# copy thread file to temporary directory (with its modification time for the cache key)
+				shutil.copy2(DATA_DIR_PATH + channel + "/threads/" + thr_file, TEMP_THREAD_DIR_PATH)
+		
+		
+		# if data should be returned as table
+		if AS_TABLE:
+			
+			# load table of channel from cache or csv file
+			tables.append(load_table(DATA_DIR_PATH + channel + "/" + file_name[0], True, True))
+			continue
+		
+		
+		# set error count to 0
+		error_count = 0
+		
+		start_time = time.perf_counter()
+		num_rows = len(rows)
+		
+		# read all lines of the channel in one pass
+		with open(DATA_DIR_PATH + channel + "/" + file_name[0], 'r') as x:
+			chan_lines = list(csv.reader(x, delimiter=","))
+		
+		# if this is not the first channel and all lines have the right size
+		if i > 0 and len(chan_lines) > 0 and all(len(line) == NUM_COLUMNS for line in chan_lines):
+			
+			# add lines without header to the data
+			rows.extend(chan_lines[1:])
+			as_object = True
+			
+		# if data in csv file is depricated or this is the first channel
 		else:
 			
-			# try to load the data and add to the existing numpy array
-			try:
+			# check the lines one by one
+			for j, line in enumerate(chan_lines):
 				
-				# load channel data into numpy array
-				with open(DATA_DIR_PATH + channel + "/" + file_name[0], 'r') as x:
-					chan_data = np.array(list(csv.reader(x, delimiter=",")),dtype=object)
-							
-				# append chan_data without header to data numpy array
-				data = np.vstack((data, chan_data[1:,:]))
-							
-			# if data in csv file is depricated
-			except:
+				# if the line is not the right size (likely "," in messages cause errors), split it at comma separation
+				if len(line) != NUM_COLUMNS and len(line) > 0:
+					line = line[0].split(",")
 				
-				# load channel data into numpy array
-				with open(DATA_DIR_PATH + channel + "/" + file_name[0], 'r') as x:
+				# if the line is the right size
+				if len(line) == NUM_COLUMNS:
 					
-					chan_data_obj = csv.reader(x, delimiter=",")
-				
-					# add content to array in less efficient way (TEMPORARY SOLUTION)
-					for j, line in enumerate(chan_data_obj):
-						
-						# if the line is not the right size (likely "," in messages cause errors)
-						if len(line) != data.shape[1]:
-							line = line[0].split(",")
-						
-						# if the line is the right size (likely "," in messages cause errors)
-						if len(line) == data.shape[1]:	
-						
-							# if this is not the header	
-							if j != 0:
-							
-								# add line to data array
-								data = np.vstack((data, np.array(line)))
-								
-						else:
-							
-							error_count += 1
+					# the header is only kept for the first channel
+					if i == 0 or j != 0:
+						rows.append(line)
 						
+				else:
+					
+					error_count += 1
 		
 		
-		# print error count
+		# print error count and loading speed
+		load_time = time.perf_counter() - start_time
 		print("{} messages could not be loaded".format(error_count))
+		print("{} rows loaded in {:.2f} s ({:.0f} rows/s)".format(len(rows) - num_rows, load_time, \
+			(len(rows) - num_rows) / load_time if load_time > 0 else 0))
 		
 		
-		# if there is thread data for this channel
-		if os.path.exists(DATA_DIR_PATH + channel + "/threads"):
-			
-			# obtain all file names in thread folder
-			thread_names = os.listdir(DATA_DIR_PATH + channel + "/threads")
-								
-			# for each thread file
-			for thr_file in thread_names:
-			
-				# copy thread file to temporary directory
-				shutil.copy(DATA_DIR_PATH + channel + "/threads/" + thr_file, TEMP_THREAD_DIR_PATH)
-		
 	print("")
+	
+	# combine tables of all channels
+	if AS_TABLE:
+		data = MessageTable.concatenate(tables, CHANNELS)
+		print("{} messages loaded in {:.2f} s\n".format(len(data), time.perf_counter() - load_start_time))
+		return data
+	
+	# stack rows into one array, a single header row stays one dimensional
+	if len(rows) == 1:
+		data = np.array(rows[0])
+	else:
+		data = np.array(rows, dtype=object if as_object else str)
 		
 	return data
 
+# # #
 
+def load_table(FILE_PATH, SPLIT_LINES, VERBOSE=False):
+	"""
+	Loads a csv file as MessageTable, from the cache if the file did not
+	change since it was parsed
+	
+	Input:
+	FILE_PATH - str : path to csv file (header in first line)
+	SPLIT_LINES - bool : whether lines with the wrong number of columns
+		should be split at "," (see read_csv_rows)
+	VERBOSE - bool : whether the loading time should be printed
+		(default = False)
+		
+	Output:
+	table - MessageTable : messages in the csv file
+	
+	Notes:
+	the table is cached in CACHE_DIR_PATH, keyed on the path, size and 
+	modification time of the csv file. Copies of csv files should keep 
+	the modification time (shutil.copy2). Cached columns are memory 
+	mapped instead of read. The content column is unpickled, so 
+	CACHE_DIR_PATH must not point to a directory from untrusted sources
+	"""
+	
+	start_time = time.perf_counter()
+	
+	# make cache key of csv file
+	file_stat = os.stat(FILE_PATH)
+	key = {"path" : os.path.abspath(FILE_PATH), "size" : file_stat.st_size, "mtime" : \
+		file_stat.st_mtime_ns, "split_lines" : SPLIT_LINES, "version" : CACHE_VERSION}
+	
+	# if tables should be cached
+	if CACHE_DIR_PATH != None:
+		
+		# obtain cache directory of csv file (a changed file replaces its cache)
+		cache_path = os.path.join(CACHE_DIR_PATH, hashlib.sha1("{}:{}".format(key["path"], \
+			SPLIT_LINES).encode()).hexdigest())
+		key_path = os.path.join(cache_path, "key.json")
+		
+		# if the cached table was parsed from the same file
+		if os.path.exists(key_path):
+			with open(key_path, 'r') as x:
+				cached_key = json.load(x)
+				
+			if cached_key == key:
+				
+				# load cached table
+				table = MessageTable.load(cache_path)
+				
+				# print loading time
+				if VERBOSE:
+					print("{} rows loaded from cache in {:.3f} s".format(len(table), time.perf_counter() - start_time))
+					
+				return table
+				
+	
+	# parse csv file
+	rows, error_count = read_csv_rows(FILE_PATH, SPLIT_LINES)
+	table = MessageTable.from_array(np.array(rows, dtype=object))
+	
+	# if tables should be cached
+	if CACHE_DIR_PATH != None:
+		
+		# remove old key so that a partly written cache is not used
+		if os.path.exists(key_path):
+			os.remove(key_path)
+		
+		# store table and key
+		table.save(cache_path)
+		with open(key_path, 'w') as x:
+			json.dump(key, x)
+	
+	# print error count and loading time
+	if VERBOSE:
+		load_time = time.perf_counter() - start_time
+		print("{} messages could not be loaded".format(error_count))
+		print("{} rows parsed in {:.2f} s ({:.0f} rows/s)".format(len(table), load_time, \
+			len(table) / load_time if load_time > 0 else 0))
+		
+	return table
+	
+# # #
+
+def read_csv_rows(FILE_PATH, SPLIT_LINES):
+	"""
+	Reads the lines of a csv file that have as many columns as the header
+	
+	Input:
+	FILE_PATH - str : path to csv file (header in first line)
+	SPLIT_LINES - bool : whether lines with the wrong number of columns
+		should be split at "," (likely "," in messages cause errors)
+		
+	Output:
+	rows - [[str]] : header and all lines with the right size
+	error_count - int : number of lines that could not be loaded
+	"""
+	
+	# read all lines in one pass
+	with open(FILE_PATH, 'r') as x:
+		lines = list(csv.reader(x, delimiter=","))
+		
+	# if file is empty
+	if len(lines) == 0:
+		return [], 0
+		
+	# extract number of columns from header
+	num_col = len(lines[0])
+	
+	# make result list with header and set error count to 0
+	rows = [lines[0]]
+	error_count = 0
+	
+	# for each line after the header
+	for line in lines[1:]:
+		
+		# if the line is not the right size, split it at comma separation
+		if SPLIT_LINES and len(line) != num_col and len(line) > 0:
+			line = line[0].split(",")
+			
+		# if the line is the right size
+		if len(line) == num_col:
+			rows.append(line)
+		else:
+			error_count += 1
+			
+	return rows, error_count
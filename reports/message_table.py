@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  message_table.py
+#
+#  Author Ene SS Rawa / Tjitse van der Molen
+
+
+# # # # # import libraries # # # # #
+
+import os
+import numpy as np
+from datetime import datetime
+
+# time format of the Created_At column
+CREATED_AT_FORMAT = '%d %b %Y %H:%M:%S'
+
+# time format of selection ranges
+SEL_RANGE_FORMAT = '%y/%m/%d %H:%M:%S'
+
+# columns stored by MessageTable.save (in order of the constructor
+# arguments). content is stored as pickled object array, all other
+# columns are memory mapped by MessageTable.load
+TABLE_COLUMNS = ["created_at", "author", "replied", "channel", "type", "content", \
+	"mention_offsets", "mentions", "reaction_offsets", "reactors", "reaction_emojis", \
+	"accounts", "channels", "types", "emojis"]
+
+
+# # # # # message table # # # # #
+
+class MessageTable:
+	"""
+	Columnar table of discord messages, built once from the loaded csv
+	data so that the analysis does not look up columns by header name
+	and compare account names as strings for every message
+
+	The messages are sorted by creation time (messages sent at the same
+	time stay in csv order), so that the messages of a time range are
+	one slice of the table (see select_time)
+
+	Columns (one entry per message, without header row):
+	created_at - 1D np.array [int64] : creation time in seconds since
+		epoch (Created_At), sorted
+	author - 1D np.array [int] : index in accounts of the author
+	replied - 1D np.array [int] : index in accounts of the replied user
+		(Replied_User, "" for messages that are no reply)
+	channel - 1D np.array [int] : index in channels of the channel
+	type - 1D np.array [int] : index in types of the message type
+	content - 1D np.array [object] : message content (object array, a
+		fixed width string array would take the size of the longest
+		message for every message)
+
+	List columns (offset encoded, the entries of message i are
+	entries[offsets[i]:offsets[i+1]]):
+	mention_offsets, mentions - index in accounts of every account in
+		User_Mentions split at ",". An empty User_Mentions gives one
+		entry for the account name "" (as the csv parsing did)
+	reaction_offsets, reactors, reaction_emojis - index in accounts of
+		every account that reacted and index in emojis of its emoji
+		(Reactions split at "&" per emoji, then at "," with the emoji
+		last)
+
+	Categories:
+	accounts - 1D np.array [str] : sorted names of all accounts in
+		author, replied, mentions and reactors
+	channels, types, emojis - 1D np.array [str] : names of the channels,
+		message types and emojis
+	"""
+
+	def __init__(self, created_at, author, replied, channel, type, content, \
+		mention_offsets, mentions, reaction_offsets, reactors, reaction_emojis, \
+		accounts, channels, types, emojis):
+
+		self.created_at = created_at
+		self.author = author
+		self.replied = replied
+		self.channel = channel
+		self.type = type
+		self.content = content
+		self.mention_offsets = mention_offsets
+		self.mentions = mentions
+		self.reaction_offsets = reaction_offsets
+		self.reactors = reactors
+		self.reaction_emojis = reaction_emojis
+		self.accounts = accounts
+		self.channels = channels
+		self.types = types
+		self.emojis = emojis
+
+	def __len__(self):
+		return len(self.created_at)
+
+	@classmethod
+	def from_array(cls, data, channel=None, channels=None):
+		"""
+		Builds the table from loaded csv data
+
+		Input:
+		data - np array : loaded contents of (combined) csv file(s),
+			header in the first row
+		channel - [int] or None : index in channels of the channel of
+			each message (None = all messages in one unnamed channel)
+		channels - [str] or None : channel names
+
+		Output:
+		table - MessageTable : table of all messages in data
+		"""
+
+		# a header without messages is one dimensional
+		if len(data.shape) < 2:
+			header = list(data)
+			rows = data[:0].reshape((0, len(header)))
+		else:
+			header = list(data[0,:])
+			rows = data[1:,:]
+
+		# obtain column by name, empty strings if it is not in the data
+		def column(name):
+			if name in header:
+				return [str(x) for x in rows[:,header.index(name)]]
+			return [""] * len(rows)
+
+		authors = column("Author")
+		replied = column("Replied_User")
+
+		# split list columns
+		mention_lists = [men.split(",") for men in column("User_Mentions")]
+		reaction_lists = [parse_reactions(resp) for resp in column("Reactions")]
+		mentioned = [acc for men in mention_lists for acc in men]
+		reacting = [acc for react in reaction_lists for acc, _ in react]
+
+		# make categories and codes
+		accounts, codes = np.unique(np.array(authors + replied + mentioned + reacting, dtype=str), \
+			return_inverse=True)
+		emojis, emoji_codes = np.unique(np.array([emoji for react in reaction_lists \
+			for _, emoji in react], dtype=str), return_inverse=True)
+		types, type_codes = np.unique(np.array(column("Type"), dtype=str), return_inverse=True)
+
+		# split account codes in the different columns
+		n_mess = len(rows)
+		author_codes = codes[:n_mess]
+		replied_codes = codes[n_mess:2*n_mess]
+		mention_codes = codes[2*n_mess:2*n_mess+len(mentioned)]
+		reactor_codes = codes[2*n_mess+len(mentioned):]
+
+		# parse creation times once per distinct time string
+		times, time_codes = np.unique(np.array(column("Created_At"), dtype=str), return_inverse=True)
+		epochs = np.array([datetime.strptime(t, CREATED_AT_FORMAT) for t in times], \
+			dtype="datetime64[s]").astype(np.int64)
+
+		# set channel of all messages if it is not specified
+		if channel is None:
+			channel = np.zeros(n_mess, dtype=int)
+			channels = [""]
+
+		return cls(epochs[time_codes].reshape(-1), author_codes, replied_codes, \
+			np.asarray(channel, dtype=int), type_codes.reshape(-1), np.array(column("Content"), dtype=object), \
+			list_offsets([len(men) for men in mention_lists]), mention_codes, \
+			list_offsets([len(react) for react in reaction_lists]), reactor_codes, emoji_codes.reshape(-1), \
+			accounts, np.asarray(channels, dtype=str), types, emojis).sort_by_time()
+
+	@classmethod
+	def concatenate(cls, tables, channels):
+		"""
+		Combines the tables of different channels into one table
+
+		Input:
+		tables - [MessageTable] : messages of each channel
+		channels - [str] : channel name of each table
+
+		Output:
+		table - MessageTable : messages of all tables sorted by time, with
+			the index in channels of their table as channel
+		"""
+
+		# keep the columns of a single table (they can be memory mapped)
+		if len(tables) == 1:
+			columns = {name: getattr(tables[0], name) for name in TABLE_COLUMNS}
+			columns["channel"] = np.zeros(len(tables[0]), dtype=int)
+			columns["channels"] = np.asarray(channels, dtype=str)
+			return cls(**columns)
+
+		# make combined categories
+		accounts = np.unique(np.concatenate([t.accounts for t in tables]).astype(str))
+		types = np.unique(np.concatenate([t.types for t in tables]).astype(str))
+		emojis = np.unique(np.concatenate([t.emojis for t in tables]).astype(str))
+
+		# map the codes of a column of each table to the combined categories
+		def recode(categories, name, column):
+			return np.concatenate([np.searchsorted(categories, getattr(t, name))[getattr(t, column)] \
+				for t in tables]).astype(int)
+
+		return cls(np.concatenate([t.created_at for t in tables]).astype(np.int64), \
+			recode(accounts, "accounts", "author"), recode(accounts, "accounts", "replied"), \
+			np.repeat(np.arange(len(tables)), [len(t) for t in tables]), recode(types, "types", "type"), \
+			np.concatenate([t.content for t in tables]).astype(object), \
+			concatenate_offsets([t.mention_offsets for t in tables]), recode(accounts, "accounts", "mentions"), \
+			concatenate_offsets([t.reaction_offsets for t in tables]), recode(accounts, "accounts", "reactors"), \
+			recode(emojis, "emojis", "reaction_emojis"), accounts, np.asarray(channels, dtype=str), \
+			types, emojis).sort_by_time()
+
+	def sort_by_time(self):
+		"""
+		Returns the table with the messages sorted by creation time
+		(stable, the table itself if it is sorted already)
+		"""
+
+		# keep sorted table
+		if np.all(self.created_at[1:] >= self.created_at[:-1]):
+			return self
+
+		return self.take(np.argsort(self.created_at, kind="stable"))
+
+	def take(self, mess_indices):
+		"""
+		Returns a table with the messages in mess_indices in that order
+		(with the same categories)
+		"""
+
+		# collect list column entries of the messages
+		men_rows, mentions = self.mention_entries(mess_indices)
+		react_rows, reactors, reaction_emojis = self.reaction_entries(mess_indices)
+
+		return MessageTable(self.created_at[mess_indices], self.author[mess_indices], \
+			self.replied[mess_indices], self.channel[mess_indices], self.type[mess_indices], \
+			self.content[mess_indices], list_offsets(np.bincount(men_rows, minlength=len(mess_indices))), \
+			mentions, list_offsets(np.bincount(react_rows, minlength=len(mess_indices))), reactors, \
+			reaction_emojis, self.accounts, self.channels, self.types, self.emojis)
+
+	def save(self, CACHE_PATH):
+		"""
+		Stores all columns as .npy files in directory CACHE_PATH
+		"""
+
+		# make directory
+		os.makedirs(CACHE_PATH, exist_ok=True)
+
+		# store each column
+		for name in TABLE_COLUMNS:
+			np.save(os.path.join(CACHE_PATH, name + ".npy"), getattr(self, name), allow_pickle=(name == "content"))
+
+	@classmethod
+	def load(cls, CACHE_PATH):
+		"""
+		Loads a table stored by save, the columns are memory mapped
+		(except content, which is a pickle and must only be loaded from
+		trusted directories)
+		"""
+
+		return cls(*[np.load(os.path.join(CACHE_PATH, name + ".npy"), allow_pickle=(name == "content"), \
+			mmap_mode=None if name == "content" else "r") for name in TABLE_COLUMNS])
+
+	def find_accounts(self, names):
+		"""
+		Returns the index in accounts of each name, -1 for names that do
+		not appear in the table
+		"""
+
+		# find position of each name in the sorted account names
+		names = np.asarray(list(names), dtype=str)
+		codes = np.searchsorted(self.accounts, names)
+		
+		# set names that are not in accounts to -1
+		found = codes < len(self.accounts)
+		found[found] = self.accounts[codes[found]] == names[found]
+		codes[~found] = -1
+		
+		return codes
+
+	def account_codes(self, names):
+		"""
+		Returns the indices in accounts of the names that appear in the
+		table
+		"""
+
+		codes = self.find_accounts(names)
+		return codes[codes >= 0]
+
+	def account_counts(self, codes):
+		"""
+		Counts how often each account appears in codes
+
+		Output:
+		unique_acc_names - [str] : names of the accounts in codes
+		counts - [int] : number of times each account appears
+		"""
+
+		unique_codes, counts = np.unique(codes, return_counts=True)
+		return list(self.accounts[unique_codes]), list(counts)
+
+	def type_code(self, name):
+		"""
+		Returns the index in types of a message type, -1 if no message
+		has this type
+		"""
+
+		code = np.where(self.types == name)[0]
+		return code[0] if len(code) > 0 else -1
+
+	def select_time(self, SEL_RANGE):
+		"""
+		Returns the indices of the messages sent within SEL_RANGE
+		(['yy/mm/dd HH:MM:SS', 'yy/mm/dd HH:MM:SS'], end excluded)
+		"""
+
+		sel_start, sel_end = range_epochs(SEL_RANGE)
+
+		# find first message at or after start and end (created_at is sorted)
+		first, last = np.searchsorted(self.created_at, [sel_start, sel_end], side="left")
+
+		return np.arange(first, max(first, last))
+
+	def exclude_authors(self, mess_indices, REMOVE_ACCOUNTS):
+		"""
+		Removes the messages of accounts in REMOVE_ACCOUNTS
+
+		Output:
+		mess_indices - 1D np.array [int] : messages in mess_indices that
+			were not sent by accounts in REMOVE_ACCOUNTS
+		mess_authors - 1D np.array [int] : index in accounts of the
+			authors of all messages in mess_indices before removal
+		"""
+
+		mess_authors = self.author[mess_indices]
+		return mess_indices[~np.isin(mess_authors, self.account_codes(REMOVE_ACCOUNTS))], mess_authors
+
+	def mention_entries(self, mess_indices):
+		"""
+		Returns the row in mess_indices and the account index of every
+		mention of the messages in mess_indices
+		"""
+
+		return gather(self.mention_offsets, self.mentions, mess_indices)
+
+	def reaction_entries(self, mess_indices):
+		"""
+		Returns the row in mess_indices, the account index and the emoji
+		index of every reaction to the messages in mess_indices
+		"""
+
+		rows, positions = gather(self.reaction_offsets, np.arange(len(self.reactors)), mess_indices)
+		return rows, self.reactors[positions], self.reaction_emojis[positions]
+
+	def mentioned_accounts(self, mess_indices):
+		"""
+		Returns the index in accounts of every mentioned account of the
+		messages in mess_indices, leaving out empty User_Mentions
+		"""
+
+		rows, mentioned = self.mention_entries(mess_indices)
+		
+		# messages with an empty User_Mentions have one entry for ""
+		counts = np.bincount(rows, minlength=len(mess_indices))
+		empty = (counts[rows] == 1) & np.isin(mentioned, self.account_codes([""]))
+		
+		return mentioned[~empty]
+
+	def active_accounts(self, mess_authors, mess_indices, REMOVE_ACCOUNTS):
+		"""
+		Returns the sorted indices in accounts of all accounts that sent
+		a message (mess_authors), reacted to or were mentioned in the
+		messages in mess_indices, except accounts in REMOVE_ACCOUNTS
+		"""
+
+		all_active = np.unique(np.concatenate((mess_authors, self.reaction_entries(mess_indices)[1], \
+			self.mentioned_accounts(mess_indices))).astype(int))
+		return all_active[~np.isin(all_active, self.account_codes(REMOVE_ACCOUNTS))]
+
+
+# # # # # nested functions # # # # #
+
+def as_message_table(data):
+	"""
+	Returns data as MessageTable, building it if data is a loaded csv
+	array
+	"""
+
+	if isinstance(data, MessageTable):
+		return data
+	return MessageTable.from_array(data)
+
+# # #
+
+def parse_reactions(resp):
+	"""
+	Splits discord emoji reaction data into (account, emoji) tuples
+
+	Input:
+	resp - str : emoji reactions to a message (from csv file)
+
+	Output:
+	reactions - [(str, str)] : account name and emoji of every reaction
+	"""
+
+	# make empty result list
+	reactions = []
+
+	# for each emoji
+	for emoji in resp.split("&"):
+
+		# split different accounts that responded with emoji (emoji is last)
+		emoji_split = emoji.split(",")
+
+		# store every account with emoji
+		for acc in emoji_split[:-1]:
+			reactions.append((acc, emoji_split[-1]))
+
+	return reactions
+
+# # #
+
+def list_offsets(counts):
+	"""
+	Turns the number of entries per message into offsets of a list
+	column (len(counts)+1 values starting at 0)
+	"""
+
+	return np.concatenate(([0], np.cumsum(counts, dtype=np.int64))).astype(np.int64)
+
+# # #
+
+def concatenate_offsets(all_offsets):
+	"""
+	Combines the offsets of list columns of different tables into the
+	offsets of the concatenated list column
+	"""
+
+	# obtain number of entries before each table
+	starts = np.cumsum([0] + [offsets[-1] for offsets in all_offsets])
+
+	return np.concatenate([offsets[:-1] + start for offsets, start in zip(all_offsets, starts)] \
+		+ [starts[-1:]]).astype(np.int64)
+
+# # #
+
+def gather(offsets, values, mess_indices):
+	"""
+	Collects the entries of a list column for the messages in
+	mess_indices
+
+	Input:
+	offsets - 1D np.array [int] : offsets of the list column
+	values - 1D np.array : entries of the list column
+	mess_indices - 1D np.array [int] : messages to collect
+
+	Output:
+	rows - 1D np.array [int] : row in mess_indices of every entry
+	entries - 1D np.array : the entries in message order
+	"""
+
+	# obtain first entry and number of entries per message
+	starts = offsets[mess_indices]
+	counts = offsets[mess_indices+1] - starts
+
+	# repeat row and first entry for each entry
+	rows = np.repeat(np.arange(len(mess_indices)), counts)
+	first = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+
+	return rows, values[first + np.arange(len(rows))]
+
+# # #
+
+def range_epochs(SEL_RANGE):
+	"""
+	Converts a selection range to seconds since epoch
+
+	Input:
+	SEL_RANGE - [str,str] : list of two strings indicating start and
+		end time ('yy/mm/dd HH:MM:SS')
+
+	Output:
+	sel_start, sel_end - int : start and end in seconds since epoch
+	"""
+
+	return [datetime_epoch(datetime.strptime(t, SEL_RANGE_FORMAT)) for t in SEL_RANGE]
+
+# # #
+
+def datetime_epoch(date_time):
+	"""
+	Converts a datetime to seconds since epoch (without time zone, the
+	same as created_at)
+	"""
+
+	return int(np.datetime64(date_time, "s").astype(np.int64))